@@ -1,50 +1,46 @@
 import asyncio
 import click
-from pyppeteer import launch
 import platform
 import sys
 import os
 import re
+import math
 import importlib
 import inspect
 from urllib.parse import urlparse
 import json
+import logging
 from datetime import datetime
 
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.test_with_mongo.database import AccessibilityDB
+from src.test_with_mongo.database import AccessibilityDB, DEFAULT_FLUSH_INTERVAL
+from src.test_with_mongo.async_database import AsyncAccessibilityDB, maybe_await, maybe_aiter
+from src.test_with_mongo.browser_pool import BrowserPool, DEFAULT_POOL_SIZE, DEFAULT_PAGES_PER_BROWSER
+from src.test_with_mongo.sharded_crawler import ShardCoordinator
+from src.test_with_mongo.domain_scheduler import (
+    DomainScheduler, DEFAULT_MAX_PER_DOMAIN, group_by_domain, effective_parallelism
+)
 from src.test_with_mongo.analyze_structure import analyze_common_structure
+from src.test_with_mongo.js_runtime import install_js_runtime, ensure_js_runtime
+from src.test_with_mongo.dom_snapshot import set_snapshot_engine, SNAPSHOT_ENGINES, DEFAULT_SNAPSHOT_ENGINE
+from src.test_with_mongo.layout_stability import wait_for_layout_stable
+from src.test_with_mongo.page_fingerprint import get_page_fingerprint
+from src.test_with_mongo.result_export import EXPORT_FORMATS, EXPORT_COMPRESSIONS
 
-# Import test modules with absolute paths
-from src.test_with_mongo.test_media_queries import test_media_queries, TEST_DOCUMENTATION as MEDIA_QUERIES_DOCS
-from src.test_with_mongo.test_document_links import test_document_links
-from src.test_with_mongo.test_fonts import test_fonts
-from src.test_with_mongo.test_html_structure import test_html_structure
-from src.test_with_mongo.test_focus_management import test_focus_management, TEST_DOCUMENTATION as FOCUS_MANAGEMENT_DOCS
-from src.test_with_mongo.test_accessible_names import test_accessible_names, TEST_DOCUMENTATION as ACCESSIBLE_NAMES_DOCS
-from src.test_with_mongo.test_images import test_images, TEST_DOCUMENTATION as IMAGES_DOCS
-from src.test_with_mongo.test_videos import test_videos
-from src.test_with_mongo.test_landmarks import test_landmarks
-from src.test_with_mongo.test_forms import test_forms
-from src.test_with_mongo.test_headings import test_headings, TEST_DOCUMENTATION as HEADINGS_DOCS
-from src.test_with_mongo.test_read_more_links import test_read_more_links
-from src.test_with_mongo.test_tabindex import test_tabindex
-from src.test_with_mongo.test_timers import test_timers
-from src.test_with_mongo.test_animations import test_animations
-from src.test_with_mongo.test_maps import test_maps
-from src.test_with_mongo.test_colors import test_colors
-from src.test_with_mongo.test_tables import test_tables, TEST_DOCUMENTATION as TABLES_DOCS
-from src.test_with_mongo.test_modals import test_modals
-from src.test_with_mongo.test_event_handlers import test_event_handlers
-from src.test_with_mongo.test_title_attribute import test_title_attribute
-from src.test_with_mongo.test_lists import test_lists
-from src.test_with_mongo.test_menus import test_menus
-from src.test_with_mongo.test_floating_dialogs import test_floating_dialogs
-from src.test_with_mongo.test_text_resize import test_text_resize, TEST_DOCUMENTATION as TEXT_RESIZE_DOCS
-from src.test_with_mongo.test_page_structure import test_page_structure, TEST_DOCUMENTATION as PAGE_STRUCTURE_DOCS
-from src.test_with_mongo.test_responsive_accessibility import test_responsive_accessibility, consolidate_responsive_results, TEST_DOCUMENTATION as RESPONSIVE_DOCS
+# Test modules are imported on first use, only when enabled
+from src.test_with_mongo.test_registry import (
+    TEST_MODULES, DEFAULT_TESTS, available_tests, parse_test_selection, load_test, load_test_module,
+    collect_test_documentation
+)
+from src.test_with_mongo.test_pipeline import run_test_pipeline
+from src.test_with_mongo.instrumentation import PageTimings, summarize_timings
+from src.test_with_mongo.log_config import (
+    get_logger, configure_logging, parse_module_levels, LOG_LEVELS, DEFAULT_LOG_LEVEL
+)
+
+logger = get_logger(__name__)
 
 def clean_filename(url):
     """
@@ -57,449 +53,490 @@ def clean_filename(url):
     clean = re.sub(r'_+', '_', clean)
     return f"{clean}.png"
 
-async def test_page_accessibility(page):
+async def test_breakpoint(page, breakpoint, original_viewport):
     """
-    Test accessibility features of the page
+    Run the per-breakpoint responsive suite on a page
+
+    Args:
+        page: The Puppeteer page object, already loaded
+        breakpoint: Viewport width to test at
+        original_viewport: Viewport the page was loaded with; its height is kept
+
+    Returns:
+        dict: The results for this breakpoint, as stored under
+            results['responsive_testing']['breakpoint_results']
     """
     try:
-        print(f"Testing accessibility for: {page.url}")
-        results = {
-            'url': page.url,
-            'tests': {},
-            'page_structure': None  # Will store page structure for section analysis
+        # Set viewport width to the breakpoint
+        logger.debug("Setting viewport width to %spx", breakpoint)
+        await page.setViewport({
+            'width': breakpoint,
+            'height': original_viewport['height'] 
+        })
+
+        # Wait for layout to stabilize
+        await wait_for_layout_stable(page)
+
+        # Initialize results for this breakpoint
+        breakpoint_results = {
+            'breakpoint': breakpoint,
+            'viewport': {
+                'width': breakpoint,
+                'height': original_viewport['height']
+            },
+            'tests': {}
         }
-        
-        # Test for media queries first
-        print("Testing for CSS media queries and responsive breakpoints...")
-        media_queries_results = await test_media_queries(page)
-        results['tests']['media_queries'] = media_queries_results
 
-        # Get responsive breakpoints for later viewport testing
-        responsive_breakpoints = []
-        
-        # DEBUGGING: Print the complete media queries results structure
-        print("\nDEBUG: Media query results structure:")
-        print(f"Type: {type(media_queries_results)}")
-        print(f"Keys: {media_queries_results.keys() if isinstance(media_queries_results, dict) else 'Not a dict'}")
-        if isinstance(media_queries_results, dict) and 'media_queries' in media_queries_results:
-            print(f"media_queries keys: {media_queries_results['media_queries'].keys() if isinstance(media_queries_results['media_queries'], dict) else 'Not a dict'}")
-        
-        # Extract breakpoints from the media queries results
-        try:
-            # First try the direct 'breakpoints' property that's in the new data structure
-            if 'breakpoints' in media_queries_results:
-                all_breakpoints = media_queries_results['breakpoints']
-                if all_breakpoints:
-                    print(f"Found {len(all_breakpoints)} responsive breakpoints: {all_breakpoints}")
-                    responsive_breakpoints = sorted([int(bp) for bp in all_breakpoints])
-                else:
-                    print("No responsive breakpoints found in direct breakpoints")
-            
-            # Backward compatibility check for older structure
-            elif 'media_queries' in media_queries_results and 'responsiveBreakpoints' in media_queries_results['media_queries']:
-                all_breakpoints = media_queries_results['media_queries']['responsiveBreakpoints'].get('allBreakpoints', [])
-                if all_breakpoints:
-                    print(f"Found {len(all_breakpoints)} responsive breakpoints (legacy format): {all_breakpoints}")
-                    responsive_breakpoints = sorted([int(bp) for bp in all_breakpoints])
-                else:
-                    print("No responsive breakpoints found in media queries results")
-            
-            # DEBUGGING: Try to find any breakpoints anywhere in the structure
-            print("\nDEBUG: Looking for breakpoints in any part of the structure...")
-            if isinstance(media_queries_results, dict):
-                for key, value in media_queries_results.items():
-                    print(f"Checking key: {key}")
-                    if isinstance(value, dict) and 'breakpoints' in value:
-                        print(f"Found breakpoints in {key}: {value['breakpoints']}")
-                    elif isinstance(value, dict) and 'responsiveBreakpoints' in value:
-                        print(f"Found responsiveBreakpoints in {key}: {value['responsiveBreakpoints']}")
-            
-            # If no breakpoints were found, add default breakpoints for testing
-            if not responsive_breakpoints:
-                print("No responsive breakpoints found in CSS media queries.")
-                print("ADDING DEFAULT BREAKPOINTS for testing purposes: [320, 768, 1024, 1440]")
-                responsive_breakpoints = [320, 768, 1024, 1440]
-        except Exception as bp_error:
-            print(f"Error extracting breakpoints: {str(bp_error)}")
-            # Add default breakpoints for testing purposes
-            print("Adding default breakpoints after error: [320, 768, 1024, 1440]")
-            responsive_breakpoints = [320, 768, 1024, 1440]
-            
-        # Store the original viewport to restore later
-        original_viewport = page.viewport
-        print(f"Original viewport: {original_viewport}")
-        
-        # Comment out all other tests except media_queries and responsive test loop
+        # Commented out text_resize test as requested
         """
-        # Test for document links
-        print("Testing for electronic documents...")
-        document_results = await test_document_links(page)
-        results['tests']['documents'] = document_results
-
-        # Add summary of documents found
-        if 'document_links' in document_results:
-            docs = document_results['document_links']
-            print(f"Found {docs['total_documents']} electronic documents:")
-            for doc_type, count in docs['by_type'].items():
-                print(f"  - {doc_type.upper()}: {count}")
+        # First, run the text resize test to test our viewport restoration fix
+        print("  Testing text resize at this breakpoint...")
+        text_resize_results = await test_text_resize(page)
 
-        try:
-            # Add font testing
-            print("Testing fonts and text styles...")
-            font_results = await test_fonts(page)
-            results['tests']['fonts'] = font_results
-
-            if font_results and 'font_analysis' in font_results:
-                analysis = font_results['font_analysis']
-                if 'summary' in analysis:
-                    print(f"\nFont Analysis Summary:")
-                    print(f"Total text elements: {analysis['summary'].get('totalTextElements', 0)}")
-                    print(f"Unique fonts found: {len(analysis['summary'].get('uniqueFonts', []))}")
-        except Exception as font_error:
-            print(f"Error in font testing: {str(font_error)}")
-            results['tests']['fonts'] = {
-                'error': str(font_error),
+        # DEBUGGING: Check the structure of text_resize_results
+        print(f"\n  DEBUG: Text resize results structure:")
+        print(f"  Type: {type(text_resize_results)}")
+        print(f"  Keys: {text_resize_results.keys() if isinstance(text_resize_results, dict) else 'Not a dict'}")
+        if isinstance(text_resize_results, dict) and 'textResize' in text_resize_results:
+            resize_data = text_resize_results['textResize']
+            print(f"  Text resize issues detected: {resize_data.get('pageFlags', {}).get('hasResizeIssues', False)}")
+            print(f"  Viewports tested: {resize_data.get('pageFlags', {}).get('details', {}).get('totalViewportsTested', 0)}")
+
+        breakpoint_results['tests']['text_resize'] = text_resize_results
+        """
+
+        # Add empty placeholder for text_resize test results
+        breakpoint_results['tests']['text_resize'] = {
+            'textResize': {
+                'pageFlags': {
+                    'hasResizeIssues': False,
+                    'details': {
+                        'totalViewportsTested': 0,
+                        'viewportsWithIssues': 0,
+                    }
+                },
+                'results': [],
                 'timestamp': datetime.now().isoformat()
             }
+        }
 
-        # Determine if this is the homepage
-        url = page.url
-        is_homepage = url.endswith('/') or url.endswith('.com') or url.endswith('.ca') or \
-                     not any(x in url.split('?')[0].split('/')[-1] for x in ['.', '_', '-'])
+        # Check viewport directly without running text_resize test
+        current_viewport = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
+        logger.debug("Current viewport: %s", current_viewport)
 
-        # Run page structure test first and store it for other tests to use
-        print("Testing page structure for common elements...")
-        page_structure_results = await test_page_structure(page)
-        results['tests']['page_structure'] = page_structure_results
-        
-        # Store page structure data separately for easy access by other tests
-        results['page_structure'] = page_structure_results.get('page_structure', {})
-        
-        # Store page structure data on the page object itself so test functions can access it
-        # This is a clean way to pass context between test functions without changing all function signatures
-        page._accessibility_context = {
-            'page_structure': page_structure_results.get('page_structure', {})
-        }
+        # If viewport doesn't match breakpoint, reset it
+        if current_viewport['width'] != breakpoint:
+            logger.warning("Viewport doesn't match breakpoint. Resetting to %spx", breakpoint)
+            await page.setViewport({
+                'width': breakpoint,
+                'height': original_viewport['height']
+            })
+            await wait_for_layout_stable(page)
 
-        print("Testing HTML structure...")
-        html_results = await test_html_structure(page, is_homepage)
-        results['tests']['html_structure'] = html_results
+        # Ensure page has _accessibility_context initialized (normally done by page_structure test)
+        if not hasattr(page, '_accessibility_context'):
+            logger.debug("Initializing page _accessibility_context for section reporting")
+            page._accessibility_context = {
+                'page_structure': {}
+            }
 
-        print("Testing focus management...")
-        focus_results = await test_focus_management(page)
-        results['tests']['focus_management'] = focus_results
+        # Run comprehensive responsive accessibility tests at this breakpoint
+        logger.info("Running responsive accessibility tests at %spx", breakpoint)
+        test_responsive_accessibility = load_test('responsive_accessibility')
+        responsive_results = await test_responsive_accessibility(page, breakpoint)
 
-        print("Testing accessible names...")
-        names_results = await test_accessible_names(page)
-        results['tests']['accessible_names'] = names_results
+        # Only describe the structure of the results when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Responsive accessibility results at %spx: type %s, keys %s", breakpoint,
+                         type(responsive_results).__name__,
+                         list(responsive_results) if isinstance(responsive_results, dict) else 'not a dict')
+            if isinstance(responsive_results, dict) and isinstance(responsive_results.get('tests'), dict):
+                logger.debug("Contains test results: %s", list(responsive_results['tests']))
 
-        print("Testing images...")
-        images_results = await test_images(page)
-        results['tests']['images'] = images_results
+        # Store the results - check for different possible formats from test_responsive_accessibility
+        if isinstance(responsive_results, dict):
+            # Store the responsive results in the correct structure
+            breakpoint_results['tests']['responsive'] = responsive_results
 
-        print("Testing for videos...")
-        video_results = await test_videos(page)
-        results['tests']['videos'] = video_results
+            # DEBUGGING: Add section data for better issue reporting
+            # Check if there are issues in the responsive results
+            for test_name in ['overflow', 'touchTargets', 'fontScaling', 'fixedPosition', 'contentStacking']:
+                # Check if we can find issues in the result structure
+                issues = None
 
-        print("Testing landmarks...")
-        landmarks_results = await test_landmarks(page)
-        results['tests']['landmarks'] = landmarks_results
+                # Try several possible structure paths
+                if test_name in responsive_results:
+                    # Direct test result
+                    test_data = responsive_results[test_name]
+                    if isinstance(test_data, dict) and 'issues' in test_data:
+                        issues = test_data['issues']
+                elif 'tests' in responsive_results and test_name in responsive_results['tests']:
+                    # Nested under tests
+                    test_data = responsive_results['tests'][test_name]
+                    if isinstance(test_data, dict) and 'issues' in test_data:
+                        issues = test_data['issues']
 
-        print("Testing forms...")
-        forms_results = await test_forms(page)
-        results['tests']['forms'] = forms_results
+                # If we found issues, add section data for reporting
+                if issues and isinstance(issues, list):
+                    logger.debug("Found %d issues in %s test at %spx", len(issues), test_name, breakpoint)
 
-        print("Testing headings...")
-        headings_results = await test_headings(page)
-        results['tests']['headings'] = headings_results
+            # DEBUGGING: Force a simple structure if responsive_results looks empty or wrong
+            if not responsive_results or (len(responsive_results) <= 2 and ('error' in responsive_results or 'timestamp' in responsive_results)):
+                logger.warning("Responsive results at %spx may be incomplete - adding forced test data", breakpoint)
+                # Add forced test data for debugging
+                breakpoint_results['tests']['responsive']['forced_data'] = {
+                    'tests': {
+                        'overflow': {'issues': []},
+                        'touchTargets': {'issues': []},
+                        'fontScaling': {'issues': []},
+                        'contentStacking': {'issues': []}
+                    },
+                    'timestamp': datetime.now().isoformat()
+                }
+        else:
+            # Create a proper structure if something went wrong
+            logger.warning("Unexpected responsive results type at %spx: %s", breakpoint, type(responsive_results).__name__)
+            breakpoint_results['tests']['responsive'] = {
+                'error': 'Invalid results structure',
+                'timestamp': datetime.now().isoformat(),
+                'tests': {
+                    'overflow': {'issues': []},
+                    'touchTargets': {'issues': []},
+                    'fontScaling': {'issues': []},
+                    'contentStacking': {'issues': []}
+                }
+            }
 
-        print("Testing read more links...")
-        read_more_results = await test_read_more_links(page)
-        results['tests']['read_more_links'] = read_more_results
+        return breakpoint_results
 
-        print("Testing tabindex attributes...")
-        tabindex_results = await test_tabindex(page)
-        results['tests']['tabindex'] = tabindex_results
+    except Exception as bp_error:
+        logger.error("Error at breakpoint %spx: %s", breakpoint, bp_error)
+        return {
+            'breakpoint': breakpoint,
+            'error': str(bp_error)
+        }
 
-        print("Testing timers...")
-        timer_results = await test_timers(page)
-        results['tests']['timers'] = timer_results
+async def test_breakpoints_in_parallel(page, breakpoints, original_viewport, concurrency, scheduler=None,
+                                      timings=None):
+    """
+    Run the per-breakpoint responsive suite at several widths at once. The
+    already loaded URL is opened in one extra page per breakpoint, in the same
+    browser context as `page` so cookies and the HTTP cache are shared, and
+    each page is created at its breakpoint width.
 
-        print("Testing CSS animations...")
-        animation_results = await test_animations(page)
-        results['tests']['animations'] = animation_results
+    The extra page loads keep the domain's minimum interval through the
+    scheduler. They are not counted against --max-per-domain, since the page
+    being tested already holds the domain's slot; at most `concurrency` of
+    them are open at once.
 
-        print("Testing for digital maps...")
-        maps_results = await test_maps(page)
-        results['tests']['maps'] = maps_results
+    Args:
+        page: The Puppeteer page object the URL was loaded in
+        breakpoints: Viewport widths to test at
+        original_viewport: Viewport the page was loaded with; its height is kept
+        concurrency: Maximum number of breakpoint pages open at the same time
+        scheduler: DomainScheduler the page was handed out by, if any
+        timings: PageTimings of the tested page; the evaluate calls of the
+            breakpoint pages are counted with it
 
-        print("Testing colors...")
-        color_results = await test_colors(page)
-        results['tests']['colors'] = color_results
+    Returns:
+        dict: Breakpoint results keyed by str(breakpoint), in the same format
+            as the sequential loop in test_page_accessibility
+    """
+    url = page.url
+    user_agent = await page.evaluate('() => navigator.userAgent')
+    page_structure = getattr(page, '_accessibility_context', {}).get('page_structure', {})
+    semaphore = asyncio.Semaphore(max(1, concurrency))
 
-        print("Testing tables...")
-        tables_results = await test_tables(page)
-        results['tests']['tables'] = tables_results
+    async def run(i, breakpoint):
+        async with semaphore:
+            logger.info("Testing breakpoint %d/%d in its own page: %spx", i + 1, len(breakpoints), breakpoint)
+            breakpoint_page = None
+            try:
+                breakpoint_page = await page.target.browserContext.newPage()
+                if timings is not None:
+                    timings.attach(breakpoint_page)
+                breakpoint_page.setDefaultNavigationTimeout(60000)
+                await breakpoint_page.setUserAgent(user_agent)
+                await breakpoint_page.setViewport({
+                    'width': breakpoint,
+                    'height': original_viewport['height']
+                })
+                await install_js_runtime(breakpoint_page)
+                if scheduler is not None:
+                    await scheduler.wait_for_interval(url)
+                await breakpoint_page.goto(url, {
+                    'waitUntil': ['load', 'networkidle0', 'domcontentloaded'],
+                    'timeout': 60000
+                })
+                breakpoint_page._accessibility_context = {
+                    'page_structure': page_structure
+                }
+                return await test_breakpoint(breakpoint_page, breakpoint, original_viewport)
+            except Exception as bp_error:
+                logger.error("Error at breakpoint %spx: %s", breakpoint, bp_error)
+                return {
+                    'breakpoint': breakpoint,
+                    'error': str(bp_error)
+                }
+            finally:
+                if breakpoint_page is not None:
+                    PageTimings.detach(breakpoint_page)
+                    try:
+                        await asyncio.wait_for(breakpoint_page.close(), timeout=5.0)
+                    except Exception as e:
+                        logger.warning("Error closing breakpoint page: %s", e)
 
-        print("Testing modal dialogs...")
-        modals_results = await test_modals(page)
-        results['tests']['modals'] = modals_results
+    logger.info("Testing %d breakpoints in parallel, %d at a time", len(breakpoints), concurrency)
+    breakpoint_results = await asyncio.gather(*(run(i, breakpoint) for i, breakpoint in enumerate(breakpoints)))
+    return {str(breakpoint): result for breakpoint, result in zip(breakpoints, breakpoint_results)}
 
-        print("Testing event handlers...")
-        event_results = await test_event_handlers(page)
-        results['tests']['events'] = event_results
+async def run_page_test(page, test_name, context):
+    """
+    Run one registered test on the page, recording an error result instead of
+    failing the page when the test raises
 
-        print("Testing title attribute...")
-        title_results = await test_title_attribute(page)
-        results['tests']['title'] = title_results
+    Args:
+        page: The Puppeteer page object
+        test_name: Name of the test in TEST_MODULES
+        context: Values the test may take after the page, by argument name
+    """
+    spec = TEST_MODULES[test_name]
+    logger.info("Testing %s...", spec['description'])
+    try:
+        test_function = load_test(test_name)
+        return await test_function(page, *(context[argument] for argument in spec.get('arguments', ())))
+    except Exception as test_error:
+        logger.error("Error in %s testing: %s", test_name, test_error)
+        return {
+            'error': str(test_error),
+            'timestamp': datetime.now().isoformat()
+        }
 
-        print("Testing lists...")
-        lists_results = await test_lists(page)
-        results['tests']['lists'] = lists_results
+def get_responsive_breakpoints(media_queries_results):
+    """
+    Extract the responsive breakpoints to test from the media_queries results,
+    falling back to common device widths when none are found
 
-        print("Testing menus...")
-        menus_results = await test_menus(page)
-        results['tests']['menus'] = menus_results
+    Returns:
+        list: Sorted breakpoint widths in pixels
+    """
+    responsive_breakpoints = []
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Media query results: type %s, keys %s", type(media_queries_results).__name__,
+                     list(media_queries_results) if isinstance(media_queries_results, dict) else 'not a dict')
 
-        # Test floating dialogs which handles its own breakpoint iteration
-        print("Testing floating dialogs...")
-        floating_results = await test_floating_dialogs(page)
-        results['tests']['floating_dialogs'] = floating_results
+    # Extract breakpoints from the media queries results
+    try:
+        # First try the direct 'breakpoints' property that's in the new data structure
+        if 'breakpoints' in media_queries_results:
+            all_breakpoints = media_queries_results['breakpoints']
+            if all_breakpoints:
+                logger.info("Found %d responsive breakpoints: %s", len(all_breakpoints), all_breakpoints)
+                responsive_breakpoints = sorted([int(bp) for bp in all_breakpoints])
+            else:
+                logger.debug("No responsive breakpoints found in direct breakpoints")
 
-        print("Testing text resize...")
-        resize_results = await test_text_resize(page)
-        results['tests']['text_resize'] = resize_results
-        """
-        
-        # Add responsive breakpoint testing structure
-        # Using our comprehensive responsive accessibility tests
-        results['responsive_testing'] = {
-            'breakpoints': responsive_breakpoints,
-            'breakpoint_results': {}
-        }
-        
-        # Only proceed with responsive testing if breakpoints were found
-        if responsive_breakpoints:
-            print("\n=== STARTING RESPONSIVE BREAKPOINT TESTING ===")
-            print(f"Testing {len(responsive_breakpoints)} breakpoints: {responsive_breakpoints}")
-            
+        # Backward compatibility check for older structure
+        elif 'media_queries' in media_queries_results and 'responsiveBreakpoints' in media_queries_results['media_queries']:
+            all_breakpoints = media_queries_results['media_queries']['responsiveBreakpoints'].get('allBreakpoints', [])
+            if all_breakpoints:
+                logger.info("Found %d responsive breakpoints (legacy format): %s", len(all_breakpoints), all_breakpoints)
+                responsive_breakpoints = sorted([int(bp) for bp in all_breakpoints])
+            else:
+                logger.debug("No responsive breakpoints found in media queries results")
+
+        # Report breakpoints stored anywhere else in the structure when debugging
+        if logger.isEnabledFor(logging.DEBUG) and isinstance(media_queries_results, dict):
+            for key, value in media_queries_results.items():
+                if isinstance(value, dict) and 'breakpoints' in value:
+                    logger.debug("Found breakpoints in %s: %s", key, value['breakpoints'])
+                elif isinstance(value, dict) and 'responsiveBreakpoints' in value:
+                    logger.debug("Found responsiveBreakpoints in %s: %s", key, value['responsiveBreakpoints'])
+
+        # If no breakpoints were found, add default breakpoints for testing
+        if not responsive_breakpoints:
+            logger.info("No responsive breakpoints found in CSS media queries, using defaults: [320, 768, 1024, 1440]")
+            responsive_breakpoints = [320, 768, 1024, 1440]
+    except Exception as bp_error:
+        logger.warning("Error extracting breakpoints, using defaults [320, 768, 1024, 1440]: %s", bp_error)
+        responsive_breakpoints = [320, 768, 1024, 1440]
+
+    return responsive_breakpoints
+
+async def test_responsive_breakpoints(page, responsive_breakpoints, original_viewport, breakpoint_concurrency=1,
+                                      scheduler=None, timings=None):
+    """
+    Run the responsive accessibility suite at every breakpoint and consolidate
+    the results
+
+    Returns:
+        dict: The results stored under results['responsive_testing']
+    """
+    # Add responsive breakpoint testing structure
+    # Using our comprehensive responsive accessibility tests
+    responsive_testing = {
+        'breakpoints': responsive_breakpoints,
+        'breakpoint_results': {}
+    }
+
+    # Only proceed with responsive testing if breakpoints were found
+    if responsive_breakpoints:
+        logger.info("Testing %d breakpoints: %s", len(responsive_breakpoints), responsive_breakpoints)
+
+        if breakpoint_concurrency > 1:
+            # Each breakpoint gets its own page, so the widths are tested at the same time
+            responsive_testing['breakpoint_results'] = await test_breakpoints_in_parallel(
+                page, responsive_breakpoints, original_viewport, breakpoint_concurrency, scheduler, timings
+            )
+        else:
             # Test at each breakpoint
             for i, breakpoint in enumerate(responsive_breakpoints):
-                print(f"\n--- Testing breakpoint {i+1}/{len(responsive_breakpoints)}: {breakpoint}px ---")
-                
-                try:
-                    # Set viewport width to the breakpoint
-                    print(f"  Setting viewport width to {breakpoint}px")
-                    await page.setViewport({
-                        'width': breakpoint,
-                        'height': original_viewport['height'] 
-                    })
-                    
-                    # Wait for layout to stabilize
-                    await asyncio.sleep(0.5)  # 500ms pause
-                    
-                    # Initialize results for this breakpoint
-                    breakpoint_results = {
-                        'breakpoint': breakpoint,
-                        'viewport': {
-                            'width': breakpoint,
-                            'height': original_viewport['height']
-                        },
-                        'tests': {}
-                    }
-                    
-                    # Commented out text_resize test as requested
-                    """
-                    # First, run the text resize test to test our viewport restoration fix
-                    print("  Testing text resize at this breakpoint...")
-                    text_resize_results = await test_text_resize(page)
-                    
-                    # DEBUGGING: Check the structure of text_resize_results
-                    print(f"\n  DEBUG: Text resize results structure:")
-                    print(f"  Type: {type(text_resize_results)}")
-                    print(f"  Keys: {text_resize_results.keys() if isinstance(text_resize_results, dict) else 'Not a dict'}")
-                    if isinstance(text_resize_results, dict) and 'textResize' in text_resize_results:
-                        resize_data = text_resize_results['textResize']
-                        print(f"  Text resize issues detected: {resize_data.get('pageFlags', {}).get('hasResizeIssues', False)}")
-                        print(f"  Viewports tested: {resize_data.get('pageFlags', {}).get('details', {}).get('totalViewportsTested', 0)}")
-                    
-                    breakpoint_results['tests']['text_resize'] = text_resize_results
-                    """
-                    
-                    # Add empty placeholder for text_resize test results
-                    breakpoint_results['tests']['text_resize'] = {
-                        'textResize': {
-                            'pageFlags': {
-                                'hasResizeIssues': False,
-                                'details': {
-                                    'totalViewportsTested': 0,
-                                    'viewportsWithIssues': 0,
-                                }
-                            },
-                            'results': [],
-                            'timestamp': datetime.now().isoformat()
-                        }
-                    }
-                    
-                    # Check viewport directly without running text_resize test
-                    current_viewport = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
-                    print(f"  Current viewport: {current_viewport}")
-                    
-                    # If viewport doesn't match breakpoint, reset it
-                    if current_viewport['width'] != breakpoint:
-                        print(f"  WARNING: Viewport doesn't match breakpoint. Resetting to {breakpoint}px")
-                        await page.setViewport({
-                            'width': breakpoint,
-                            'height': original_viewport['height']
-                        })
-                        await asyncio.sleep(0.5)
-                    
-                    # Ensure page has _accessibility_context initialized (normally done by page_structure test)
-                    if not hasattr(page, '_accessibility_context'):
-                        print("  Initializing page _accessibility_context for section reporting")
-                        page._accessibility_context = {
-                            'page_structure': {}
-                        }
-                    
-                    # Run comprehensive responsive accessibility tests at this breakpoint
-                    print("  Running responsive accessibility tests at this breakpoint...")
-                    responsive_results = await test_responsive_accessibility(page, breakpoint)
-                    
-                    # DEBUGGING: Check the structure of responsive_results
-                    print(f"\n  DEBUG: Responsive accessibility results structure:")
-                    print(f"  Type: {type(responsive_results)}")
-                    print(f"  Keys: {responsive_results.keys() if isinstance(responsive_results, dict) else 'Not a dict'}")
-                    if isinstance(responsive_results, dict):
-                        if 'tests' in responsive_results:
-                            print(f"  Contains test results: {list(responsive_results['tests'].keys())}")
-                        elif 'breakpoint' in responsive_results:
-                            print(f"  Contains breakpoint: {responsive_results.get('breakpoint')}")
-                            if 'tests' in responsive_results:
-                                print(f"  Contains tests: {list(responsive_results['tests'].keys())}")
-                    
-                    # Store the results - check for different possible formats from test_responsive_accessibility
-                    if isinstance(responsive_results, dict):
-                        # Store the responsive results in the correct structure
-                        breakpoint_results['tests']['responsive'] = responsive_results
-                        
-                        # DEBUGGING: Add section data for better issue reporting
-                        # Check if there are issues in the responsive results
-                        for test_name in ['overflow', 'touchTargets', 'fontScaling', 'fixedPosition', 'contentStacking']:
-                            # Check if we can find issues in the result structure
-                            issues = None
-                            
-                            # Try several possible structure paths
-                            if test_name in responsive_results:
-                                # Direct test result
-                                test_data = responsive_results[test_name]
-                                if isinstance(test_data, dict) and 'issues' in test_data:
-                                    issues = test_data['issues']
-                            elif 'tests' in responsive_results and test_name in responsive_results['tests']:
-                                # Nested under tests
-                                test_data = responsive_results['tests'][test_name]
-                                if isinstance(test_data, dict) and 'issues' in test_data:
-                                    issues = test_data['issues']
-                            
-                            # If we found issues, add section data for reporting
-                            if issues and isinstance(issues, list):
-                                print(f"  Found {len(issues)} issues in {test_name} test")
-                        
-                        # DEBUGGING: Force a simple structure if responsive_results looks empty or wrong
-                        if not responsive_results or (len(responsive_results) <= 2 and ('error' in responsive_results or 'timestamp' in responsive_results)):
-                            print("  WARNING: Responsive results may be incomplete - adding forced test data")
-                            # Add forced test data for debugging
-                            breakpoint_results['tests']['responsive']['forced_data'] = {
-                                'tests': {
-                                    'overflow': {'issues': []},
-                                    'touchTargets': {'issues': []},
-                                    'fontScaling': {'issues': []},
-                                    'contentStacking': {'issues': []}
-                                },
-                                'timestamp': datetime.now().isoformat()
-                            }
-                    else:
-                        # Create a proper structure if something went wrong
-                        print(f"  Warning: Unexpected responsive results type: {type(responsive_results)}")
-                        breakpoint_results['tests']['responsive'] = {
-                            'error': 'Invalid results structure',
-                            'timestamp': datetime.now().isoformat(),
-                            'tests': {
-                                'overflow': {'issues': []},
-                                'touchTargets': {'issues': []},
-                                'fontScaling': {'issues': []},
-                                'contentStacking': {'issues': []}
-                            }
-                        }
-                    
-                    # Store results for this breakpoint
-                    results['responsive_testing']['breakpoint_results'][str(breakpoint)] = breakpoint_results
-                    
-                    # Add a short pause between breakpoints
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as bp_error:
-                    print(f"  ERROR at breakpoint {breakpoint}px: {str(bp_error)}")
-                    results['responsive_testing']['breakpoint_results'][str(breakpoint)] = {
-                        'breakpoint': breakpoint,
-                        'error': str(bp_error)
-                    }
-            
-            # Consolidate results across all breakpoints
-            print("\n--- Consolidating responsive testing results ---")
-            try:
-                # Pass the page object to allow section reporting
-                consolidated_results = consolidate_responsive_results(
-                    results['responsive_testing']['breakpoint_results'], 
-                    page  # Include page object for section reporting
-                )
-                
-                # Make sure we have a valid result structure
-                if not isinstance(consolidated_results, dict):
-                    print(f"  WARNING: Consolidation returned non-dictionary result: {type(consolidated_results)}")
-                    consolidated_results = {
-                        'summary': {
-                            'totalIssues': 0,
-                            'affectedBreakpoints': 0
-                        },
-                        'timestamp': datetime.now().isoformat()
-                    }
-                
-                # Store the consolidated results
-                results['responsive_testing']['consolidated'] = consolidated_results
-                
-                # Add summary to main results
-                print(f"  Found {consolidated_results.get('summary', {}).get('totalIssues', 0)} responsive accessibility issues across {consolidated_results.get('summary', {}).get('affectedBreakpoints', 0)} breakpoints")
-                
-                # Add additional debugging information about the consolidated issues 
-                if 'issuesByType' in consolidated_results:
-                    print("\n  Issue types found:")
-                    for issue_type, issue_data in consolidated_results['issuesByType'].items():
-                        print(f"  - {issue_type}: {issue_data.get('count', 0)} issues across {len(issue_data.get('affectedBreakpoints', []))} breakpoints")
-                
-            except Exception as consolidation_error:
-                print(f"  ERROR consolidating results: {str(consolidation_error)}")
-                import traceback
-                traceback.print_exc()
-                # Create a valid fallback result structure even in case of error
-                results['responsive_testing']['consolidated'] = {
+                logger.info("Testing breakpoint %d/%d: %spx", i + 1, len(responsive_breakpoints), breakpoint)
+                responsive_testing['breakpoint_results'][str(breakpoint)] = \
+                    await test_breakpoint(page, breakpoint, original_viewport)
+
+                # Add a short pause between breakpoints
+                await asyncio.sleep(0.1)
+
+        # Consolidate results across all breakpoints
+        logger.debug("Consolidating responsive testing results")
+        try:
+            # Pass the page object to allow section reporting
+            consolidate_responsive_results = load_test_module('responsive_accessibility').consolidate_responsive_results
+            consolidated_results = consolidate_responsive_results(
+                responsive_testing['breakpoint_results'], 
+                page  # Include page object for section reporting
+            )
+
+            # Make sure we have a valid result structure
+            if not isinstance(consolidated_results, dict):
+                logger.warning("Consolidation returned non-dictionary result: %s", type(consolidated_results).__name__)
+                consolidated_results = {
                     'summary': {
                         'totalIssues': 0,
                         'affectedBreakpoints': 0
                     },
-                    'error': str(consolidation_error),
                     'timestamp': datetime.now().isoformat()
                 }
-        else:
-            # No breakpoints found, add information to results but skip testing
-            print("\n=== SKIPPING RESPONSIVE BREAKPOINT TESTING (NO BREAKPOINTS FOUND) ===")
-            results['responsive_testing']['status'] = 'skipped'
-            results['responsive_testing']['reason'] = 'No CSS media query breakpoints found'
-            results['responsive_testing']['timestamp'] = datetime.now().isoformat()
+
+            # Store the consolidated results
+            responsive_testing['consolidated'] = consolidated_results
+
+            summary = consolidated_results.get('summary', {})
+            logger.info("Found %s responsive accessibility issues across %s breakpoints",
+                        summary.get('totalIssues', 0), summary.get('affectedBreakpoints', 0))
+            if logger.isEnabledFor(logging.DEBUG):
+                for issue_type, issue_data in consolidated_results.get('issuesByType', {}).items():
+                    logger.debug("%s: %s issues across %d breakpoints", issue_type, issue_data.get('count', 0),
+                                 len(issue_data.get('affectedBreakpoints', [])))
+
+        except Exception as consolidation_error:
+            logger.exception("Error consolidating results: %s", consolidation_error)
+            # Create a valid fallback result structure even in case of error
+            responsive_testing['consolidated'] = {
+                'summary': {
+                    'totalIssues': 0,
+                    'affectedBreakpoints': 0
+                },
+                'error': str(consolidation_error),
+                'timestamp': datetime.now().isoformat()
+            }
+    else:
+        # No breakpoints found, add information to results but skip testing
+        logger.info("Skipping responsive breakpoint testing, no breakpoints found")
+        responsive_testing['status'] = 'skipped'
+        responsive_testing['reason'] = 'No CSS media query breakpoints found'
+        responsive_testing['timestamp'] = datetime.now().isoformat()
+
+    return responsive_testing
+
+async def test_page_accessibility(page, breakpoint_concurrency=1, tests=DEFAULT_TESTS, test_concurrency=1,
+                                  timings=None, scheduler=None):
+    """
+    Test accessibility features of the page
+
+    The enabled tests run through the test pipeline: each starts once the
+    tests producing its inputs have finished, read-only tests run up to
+    `test_concurrency` at a time over a shared DOM snapshot, and tests that
+    mutate the page run on their own.
+
+    Args:
+        page: The Puppeteer page object
+        breakpoint_concurrency: Number of responsive breakpoints to test at the
+            same time, each in its own page; 1 resizes this page for each
+            breakpoint in turn
+        tests: Names of the enabled tests, as resolved by the test registry
+        test_concurrency: Number of read-only tests to run at the same time
+        timings: PageTimings that records each test under timings.tests
+        scheduler: DomainScheduler that rate limits the page loads made for
+            parallel breakpoints
+    """
+    try:
+        logger.debug("Testing accessibility for: %s", page.url)
+        await ensure_js_runtime(page)
+        results = {
+            'url': page.url,
+            'tests': {},
+            'page_structure': None  # Will store page structure for section analysis
+        }
+
+        # Store the original viewport to restore later
+        original_viewport = page.viewport
+        logger.debug("Original viewport: %s", original_viewport)
+
+        # Determine if this is the homepage
+        url = page.url
+        is_homepage = url.endswith('/') or url.endswith('.com') or url.endswith('.ca') or \
+                     not any(x in url.split('?')[0].split('/')[-1] for x in ['.', '_', '-'])
+        test_context = {'is_homepage': is_homepage}
+
+        # Responsive testing is skipped unless the suite is enabled
+        results['responsive_testing'] = {
+            'breakpoints': [],
+            'breakpoint_results': {},
+            'status': 'skipped',
+            'reason': 'Responsive accessibility test not enabled',
+            'timestamp': datetime.now().isoformat()
+        }
+        responsive_breakpoints = []
+        if timings is None:
+            timings = PageTimings()
+
+        async def run_test(test_name):
+            async with timings.measure(test_name, page, group='tests'):
+                await run_instrumented_test(test_name)
+
+        async def run_instrumented_test(test_name):
+            nonlocal responsive_breakpoints
+            if test_name == 'responsive_accessibility':
+                # Test at every breakpoint media_queries found
+                results['responsive_testing'] = await test_responsive_breakpoints(
+                    page, responsive_breakpoints, original_viewport, breakpoint_concurrency, scheduler, timings
+                )
+                return
+
+            test_results = await run_page_test(page, test_name, test_context)
+            results['tests'][test_name] = test_results
+
+            if test_name == 'media_queries':
+                responsive_breakpoints = get_responsive_breakpoints(test_results)
+            elif test_name == 'page_structure' and isinstance(test_results, dict):
+                # Store page structure data separately for easy access by other tests
+                results['page_structure'] = test_results.get('page_structure', {})
+
+                # Store page structure data on the page object itself so test functions can access it
+                # This is a clean way to pass context between test functions without changing all function signatures
+                context = getattr(page, '_accessibility_context', None) or {}
+                context['page_structure'] = test_results.get('page_structure', {})
+                page._accessibility_context = context
+
+        await run_test_pipeline(page, tests, run_test, concurrency=test_concurrency)
         
         # Restore original viewport
-        print("\n--- Restoring original viewport ---")
+        logger.debug("Restoring original viewport")
         await page.setViewport(original_viewport)
-        await asyncio.sleep(0.5)  # Wait for layout to stabilize
+        await wait_for_layout_stable(page)
         
         return results
 
@@ -510,45 +547,355 @@ async def test_page_accessibility(page):
             'tests': {}
         }
     
-def collect_test_documentation():
+async def process_page(pool, db, test_run_id, url, index, total, screenshots_dir, incognito=False,
+                       breakpoint_concurrency=1, incremental=False, tests=DEFAULT_TESTS, test_concurrency=1,
+                       scheduler=None):
     """
-    Collects TEST_DOCUMENTATION objects from all test modules.
-    
+    Load a single URL from the browser pool, screenshot it and run the accessibility tests
+
+    Args:
+        pool: BrowserPool to lease the page from
+        db: AccessibilityDB used to record the page result
+        test_run_id: ID of the current test run
+        url: URL to test
+        index: 1-based position of the URL in the input file
+        total: Total number of URLs in the run
+        screenshots_dir: Directory to save the screenshot in
+        incognito: Run the page in its own incognito browser context
+        breakpoint_concurrency: Number of responsive breakpoints tested at the
+            same time, each in its own page
+        incremental: Reuse the results of an earlier run instead of testing
+            the page when its DOM and CSS fingerprint is unchanged and that
+            run covered every enabled test
+        tests: Names of the enabled tests, stored with the page result
+        test_concurrency: Number of read-only tests run at the same time
+        scheduler: DomainScheduler that handed out the URL; extra page loads
+            for parallel breakpoints keep its per-domain interval
+
+    Each step is timed with PageTimings and the timings are stored with the
+    page result; the final write cannot time itself, so timings.db_write
+    covers the writes before it.
+
     Returns:
-        dict: A dictionary mapping test names to their documentation objects
+        str: The final status recorded for the page
     """
-    print("Collecting test documentation from all test modules...")
-    documentation = {}
-    
-    # Add the manually imported documentation
-    documentation['media_queries'] = MEDIA_QUERIES_DOCS
-    documentation['page_structure'] = PAGE_STRUCTURE_DOCS
-    documentation['accessible_names'] = ACCESSIBLE_NAMES_DOCS
-    documentation['focus_management'] = FOCUS_MANAGEMENT_DOCS
-    documentation['images'] = IMAGES_DOCS
-    documentation['tables'] = TABLES_DOCS
-    documentation['headings'] = HEADINGS_DOCS
-    documentation['responsive_accessibility'] = RESPONSIVE_DOCS
-    documentation['text_resize'] = TEXT_RESIZE_DOCS
+    print(f"\nProcessing page {index} of {total}: {url}")
     
-    # Just return what we've manually imported to simplify the testing process
-    print(f"Collected documentation for {len(documentation)} tests")
-    return documentation
+    # Initialize page result
+    page_result = {
+        'status': 'started',
+        'screenshot': None,
+        'errors': [],
+        'timestamp_start': datetime.now().isoformat(),
+        'index': index,
+        'tests': list(tests)
+    }
+    timings = PageTimings()
+
+    async def save_page_result():
+        page_result['timings'] = timings.to_document()
+        async with timings.measure('db_write'):
+            await maybe_await(db.save_page_result(test_run_id, url, page_result))
+
+    # Save initial status
+    await save_page_result()
+
+    try:
+        async with pool.page(incognito=incognito) as page:
+            page.setDefaultNavigationTimeout(60000)
+            timings.attach(page)
+
+            try:
+                await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+                await install_js_runtime(page)
+
+                async with timings.measure('navigation', page):
+                    response = await page.goto(url, {
+                        'waitUntil': ['load', 'networkidle0', 'domcontentloaded'],
+                        'timeout': 60000
+                    })
+
+                if response is None:
+                    error_msg = f"Failed to load {url}: No response received"
+                    print(error_msg)
+                    page_result['errors'].append(error_msg)
+                    page_result['status'] = 'failed'
+                    await save_page_result()
+                    return page_result['status']
+
+                async with timings.measure('navigation', page):
+                    await page.waitForSelector('body', {'timeout': 30000})
+
+                # Fingerprint the DOM and CSS so incremental runs can tell whether the page changed
+                async with timings.measure('fingerprint', page):
+                    page_result['fingerprint'] = await get_page_fingerprint(page)
+                previous = None
+                if incremental and page_result['fingerprint']:
+                    async with timings.measure('db_read'):
+                        previous = await maybe_await(
+                            db.get_reusable_page_result(url, page_result['fingerprint'], test_run_id, tests)
+                        )
+
+                screenshot_filename = clean_filename(url)
+                screenshot_path = os.path.join(screenshots_dir, screenshot_filename)
+                if previous and os.path.exists(screenshot_path):
+                    print(f"Keeping existing screenshot: {screenshot_path}")
+                else:
+                    async with timings.measure('screenshot', page):
+                        await page.screenshot({
+                            'path': screenshot_path,
+                            'fullPage': True
+                        })
+                    print(f"Screenshot saved: {screenshot_path}")
+
+                # Update results with screenshot info
+                page_result['screenshot'] = screenshot_filename
+                page_result['status'] = 'in_progress'
+
+                if previous:
+                    previous_run_id, previous_result = previous
+                    print(f"Page unchanged since test run {previous_run_id}, reusing its results")
+                    accessibility_results = previous_result.get('accessibility', {})
+                    page_result['reused_from'] = previous_run_id
+                    # The earlier run may have run more tests than this one
+                    page_result['tests'] = previous_result.get('tests', page_result['tests'])
+                else:
+                    # Run accessibility tests
+                    async with timings.measure('accessibility_tests', page):
+                        accessibility_results = await test_page_accessibility(page, breakpoint_concurrency, tests,
+                                                                                test_concurrency, timings, scheduler)
+                page_result['accessibility'] = accessibility_results
+                page_result['status'] = 'completed'
+                page_result['timestamp_end'] = datetime.now().isoformat()
+                
+                # Extract page title from HTML structure test results and store it at the top level
+                try:
+                    html_structure = accessibility_results.get('tests', {}).get('html_structure', {})
+                    title_info = html_structure.get('details', {}).get('title', {})
+                    
+                    if title_info and title_info.get('exists') and title_info.get('analysis'):
+                        title_text = title_info.get('analysis', {}).get('text')
+                        if title_text:
+                            page_result['page_title'] = title_text
+                            print(f"Extracted page title: {title_text}")
+                except Exception as title_error:
+                    print(f"Error extracting page title: {str(title_error)}")
+
+                # Save completed page result
+                await save_page_result()
+
+            except Exception as e:
+                error_message = f"Error processing {url}: {str(e)}"
+                print(error_message)
+                page_result['errors'].append(error_message)
+                page_result['status'] = 'error'
+                await save_page_result()
+
+            finally:
+                # The pool may hand this page out again
+                timings.detach(page)
+
+    except Exception as e:
+        error_message = f"Error creating page for {url}: {str(e)}"
+        print(error_message)
+        page_result['errors'].append(error_message)
+        page_result['status'] = 'error'
+        await save_page_result()
+
+    return page_result['status']
+
+async def run_concurrent_workers(pool, db, test_run_id, scheduler, total, screenshots_dir, concurrency,
+                                 progress_callback=None, breakpoint_concurrency=1, incremental=False,
+                                 tests=DEFAULT_TESTS, test_concurrency=1):
+    """
+    Process URLs with a bounded number of asyncio workers pulling from a per-domain
+    scheduler. With more than one worker, every page runs in its own incognito
+    context so the monkey-patches and viewport changes made by the tests cannot
+    leak between concurrently tested pages.
+
+    Args:
+        pool: BrowserPool to lease pages from
+        db: AccessibilityDB used to record page results
+        test_run_id: ID of the current test run
+        scheduler: DomainScheduler that hands out (index, url) tuples
+        total: Total number of URLs in the run
+        screenshots_dir: Directory to save screenshots in
+        concurrency: Number of pages to test at the same time
+        progress_callback: Optional callable(index, url, status) notified when a
+            page starts and when it finishes
+        breakpoint_concurrency: Number of responsive breakpoints tested at the
+            same time for each page
+        incremental: Reuse earlier results for pages whose fingerprint is unchanged
+        tests: Names of the enabled tests
+        test_concurrency: Number of read-only tests run at the same time on a page
+    """
+    incognito = concurrency > 1
+
+    async def worker(worker_id):
+        while True:
+            item = await scheduler.next()
+            if item is None:
+                return
+            index, url = item
+            status = 'error'
+            try:
+                if progress_callback:
+                    progress_callback(index, url, 'started')
+                status = await process_page(pool, db, test_run_id, url, index, total, screenshots_dir, incognito=incognito,
+                                            breakpoint_concurrency=breakpoint_concurrency, incremental=incremental,
+                                            tests=tests, test_concurrency=test_concurrency, scheduler=scheduler)
+            except Exception as e:
+                print(f"Worker {worker_id}: unexpected error processing {url}: {str(e)}")
+            finally:
+                await scheduler.release(url)
+                if progress_callback:
+                    progress_callback(index, url, status)
+
+    if concurrency > 1:
+        print(f"Running {concurrency} concurrent workers")
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(1, concurrency + 1)))
+
+async def crawl_urls(db, test_run_id, indexed_urls, total, crawl_options, progress_callback=None):
+    """
+    Test a list of URLs with a browser pool, serially or with concurrent workers
+
+    Args:
+        db: AccessibilityDB used to record page results
+        test_run_id: ID of the current test run
+        indexed_urls: List of (index, url) tuples to process
+        total: Total number of URLs in the run
+        crawl_options: Dictionary with launch_options, screenshots_dir, delay,
+            max_per_domain, concurrency, pool_size, pages_per_browser,
+            browser_memory_limit, snapshot_engine, breakpoint_concurrency,
+            incremental, tests and test_concurrency
+        progress_callback: Optional callable(index, url, status) notified when a
+            page starts and when it finishes
+    """
+    concurrency = max(1, crawl_options.get('concurrency') or 1)
+    pool_size = crawl_options.get('pool_size', DEFAULT_POOL_SIZE)
+    set_snapshot_engine(crawl_options.get('snapshot_engine'))
+
+    # The delay is enforced per domain, so pages from other sites can load in between
+    scheduler = DomainScheduler(
+        indexed_urls,
+        min_interval=crawl_options['delay'],
+        max_per_domain=crawl_options.get('max_per_domain') or concurrency
+    )
+    print(f"Scheduling {len(indexed_urls)} pages across {scheduler.domain_count} domains")
+
+    # Keep warm browsers around instead of launching Chromium for every URL.
+    # Concurrent workers share the pooled browsers through incognito contexts.
+    pool = BrowserPool(
+        crawl_options['launch_options'],
+        size=pool_size,
+        max_pages_per_browser=crawl_options.get('pages_per_browser', DEFAULT_PAGES_PER_BROWSER),
+        max_memory_mb=crawl_options.get('browser_memory_limit'),
+        leases_per_browser=math.ceil(concurrency / max(1, pool_size))
+    )
+    await pool.start()
+
+    try:
+        await run_concurrent_workers(pool, db, test_run_id, scheduler, total, crawl_options['screenshots_dir'],
+                                     concurrency, progress_callback,
+                                     breakpoint_concurrency=crawl_options.get('breakpoint_concurrency', 1),
+                                     incremental=crawl_options.get('incremental', False),
+                                     tests=crawl_options.get('tests', DEFAULT_TESTS),
+                                     test_concurrency=crawl_options.get('test_concurrency', 1))
+    finally:
+        await pool.close()
 
-async def process_urls(file_path, screenshots_dir, results_file, max_pages, clear_db, delay, db_name, auto_create_db):
+async def verify_saved_results(db, test_run_id, urls):
     """
-    Process URLs from the input file one at a time using Puppeteer
+    Check what was stored for each page of a test run, one line per page
+
+    The page results are streamed as server-side summaries, so the check
+    reads a few hundred bytes per page rather than every stored result.
+
+    Returns:
+        dict: Page counts by status, plus the number of URLs without a result
+    """
+    print(f"\nVerifying saved results of test run {test_run_id}")
+    statuses = {}
+    seen_urls = set()
+    async for summary in maybe_aiter(db.iter_result_summaries(test_run_id)):
+        seen_urls.add(summary['url'])
+        status = summary.get('status', 'unknown')
+        statuses[status] = statuses.get(status, 0) + 1
+
+        line = (f"{summary['url']}: {status}, {len(summary['tests'])} tests, "
+                f"{summary['breakpoint_results']}/{len(summary.get('breakpoints') or [])} breakpoint results")
+        consolidated = summary['consolidated']
+        if isinstance(consolidated, dict):
+            line += (f", {consolidated.get('totalIssues', 0)} responsive issues across "
+                     f"{consolidated.get('affectedBreakpoints', 0)} breakpoints")
+        elif consolidated:
+            line += ", consolidated results stored separately"
+        if summary['errors']:
+            line += f", {summary['errors']} errors"
+        print(line)
+
+    missing = [url for url in urls if url not in seen_urls]
+    for url in missing:
+        print(f"{url}: no result found")
+    counts = ', '.join(f"{count} {status}" for status, count in sorted(statuses.items()))
+    print(f"Verified {len(seen_urls)} page results ({counts or 'none'}), {len(missing)} URLs without a result")
+    statuses['missing'] = len(missing)
+    return statuses
+
+async def process_urls(file_path, screenshots_dir, results_file, max_pages, clear_db, delay, db_name, auto_create_db,
+                       pool_size=DEFAULT_POOL_SIZE, pages_per_browser=DEFAULT_PAGES_PER_BROWSER, browser_memory_limit=None,
+                       concurrency=1, workers=1, max_per_domain=DEFAULT_MAX_PER_DOMAIN, resume_run_id=None,
+                       snapshot_engine=DEFAULT_SNAPSHOT_ENGINE, breakpoint_concurrency=1, write_buffer_size=0,
+                       flush_interval=DEFAULT_FLUSH_INTERVAL, async_db=False, split_results=False,
+                       dedup_results=False, incremental=False, export_format=None, export_compression=None,
+                       violations_dir=None, tests=DEFAULT_TESTS, test_concurrency=1, verify_results=False,
+                       log_level=None, log_modules=None):
+    """
+    Process URLs from the input file using Puppeteer, one at a time or with
+    `concurrency` pages in flight at once, optionally sharded across `workers`
+    processes that share one test run. When `resume_run_id` is given, the
+    existing test run is reopened and only pages that did not complete are tested.
+    With `async_db` results are stored through AsyncAccessibilityDB (motor)
+    instead of the blocking pymongo backend. With `split_results` each test's
+    result is stored as its own document rather than nested in the page result;
+    with `dedup_results` identical results are stored once and shared by hash.
+    With `incremental` pages whose DOM and CSS are unchanged since an earlier
+    run reuse that run's results instead of being tested again. The results
+    file is written as `export_format` with optional `export_compression`,
+    both inferred from its name when not given. With `violations_dir` the
+    violations are also exported there as Parquet, partitioned by test.
+    Only the `tests` selected from the test registry are imported and run,
+    with up to `test_concurrency` read-only tests at a time on each page.
+    With `verify_results` a summary of every stored page result is printed
+    once the run is complete. `log_level` and `log_modules` are passed on so
+    shard workers log like this process.
+
+    Returns:
+        str: The ID of the test run the results were saved under
     """
     # Initialize database with the specified name
-    db = AccessibilityDB(db_name=db_name, create_if_not_exists=auto_create_db)
+    if async_db:
+        db = await AsyncAccessibilityDB.connect(db_name=db_name, create_if_not_exists=auto_create_db,
+                                                split_results=split_results, dedup_results=dedup_results)
+        if write_buffer_size:
+            print("Note: --write-buffer is ignored with --async-db; async writes do not block the crawler")
+    else:
+        db = AccessibilityDB(db_name=db_name, create_if_not_exists=auto_create_db,
+                             write_buffer_size=write_buffer_size, flush_interval=flush_interval,
+                             split_results=split_results, dedup_results=dedup_results)
     
     # Clear database if requested
     if clear_db:
         print(f"Clearing database '{db.db_name}'...")
-        db.clear_database()
+        await maybe_await(db.clear_database())
     
-    # Collect test documentation from all modules
-    test_documentation = collect_test_documentation()
+    # By default a site may have as many pages in flight as --concurrency allows
+    max_per_domain = max_per_domain or max(1, concurrency or 1)
+
+    # Collect test documentation from the enabled test modules
+    tests = list(tests)
+    print(f"Enabled tests: {', '.join(tests)}")
+    test_documentation = collect_test_documentation(tests)
     
     # Create settings dictionary
     settings = {
@@ -557,11 +904,31 @@ async def process_urls(file_path, screenshots_dir, results_file, max_pages, clea
         'results_file': results_file,
         'max_pages': max_pages,
         'database_cleared': clear_db,
-        'delay_between_pages': delay
+        'delay_between_pages': delay,
+        'max_pages_per_domain': max_per_domain,
+        'browser_pool_size': pool_size,
+        'pages_per_browser': pages_per_browser,
+        'browser_memory_limit_mb': browser_memory_limit,
+        'concurrency': concurrency,
+        'workers': workers,
+        'snapshot_engine': snapshot_engine,
+        'parallel_breakpoints': breakpoint_concurrency,
+        'write_buffer_size': write_buffer_size,
+        'flush_interval': flush_interval,
+        'async_db': async_db,
+        'split_results': split_results,
+        'dedup_results': dedup_results,
+        'incremental': incremental,
+        'tests': tests,
+        'parallel_tests': test_concurrency
     }
     
-    # Start new test run with documentation included
-    test_run_id = db.start_new_test_run(settings, documentation=test_documentation)
+    if resume_run_id:
+        # Continue an interrupted run instead of creating a new one
+        test_run_id = await maybe_await(db.reopen_test_run(resume_run_id, settings))
+    else:
+        # Start new test run with documentation included
+        test_run_id = await maybe_await(db.start_new_test_run(settings, documentation=test_documentation))
     
     # Create screenshots directory if it doesn't exist
     os.makedirs(screenshots_dir, exist_ok=True)
@@ -588,6 +955,10 @@ async def process_urls(file_path, screenshots_dir, results_file, max_pages, clea
         }
     }
 
+    shard_progress = None
+    skipped_urls = None
+    effective = None
+
     try:
         # Read URLs from file
         with open(file_path, 'r') as file:
@@ -599,194 +970,110 @@ async def process_urls(file_path, screenshots_dir, results_file, max_pages, clea
             print(f"\nLimiting test to first {max_pages} pages")
         
         print(f"Total pages to process: {len(urls)}")
-        print(f"Delay between pages: {delay} seconds")
-
-        for index, url in enumerate(urls, 1):
-            print(f"\nProcessing page {index} of {len(urls)}: {url}")
-            
-            # Initialize page result
-            page_result = {
-                'status': 'started',
-                'screenshot': None,
-                'errors': [],
-                'timestamp_start': datetime.now().isoformat(),
-                'index': index
-            }
-
-            # Save initial status
-            db.save_page_result(test_run_id, url, page_result)
-
-            browser = await launch(launch_options)
-            
-            try:
-                page = await browser.newPage()
-                page.setDefaultNavigationTimeout(60000)
-
-                try:
-                    await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-
-                    response = await page.goto(url, {
-                        'waitUntil': ['load', 'networkidle0', 'domcontentloaded'],
-                        'timeout': 60000
-                    })
+        print(f"Minimum delay between pages on the same domain: {delay} seconds")
+        print(f"Maximum concurrent pages per domain: {max_per_domain}")
 
-                    if response is None:
-                        error_msg = f"Failed to load {url}: No response received"
-                        print(error_msg)
-                        page_result['errors'].append(error_msg)
-                        page_result['status'] = 'failed'
-                        db.save_page_result(test_run_id, url, page_result)
-                        continue
+        concurrency = max(1, concurrency or 1)
+        if concurrency > 1:
+            print(f"Concurrency: {concurrency} pages at a time")
 
-                    await page.waitForSelector('body', {'timeout': 30000})
-
-                    screenshot_filename = clean_filename(url)
-                    screenshot_path = os.path.join(screenshots_dir, screenshot_filename)
-                    await page.screenshot({
-                        'path': screenshot_path,
-                        'fullPage': True
-                    })
-                    print(f"Screenshot saved: {screenshot_path}")
-
-                    # Update results with screenshot info
-                    page_result['screenshot'] = screenshot_filename
-                    page_result['status'] = 'in_progress'
-
-                    # Run accessibility tests
-                    accessibility_results = await test_page_accessibility(page)
-                    page_result['accessibility'] = accessibility_results
-                    page_result['status'] = 'completed'
-                    page_result['timestamp_end'] = datetime.now().isoformat()
-                    
-                    # Extract page title from HTML structure test results and store it at the top level
-                    try:
-                        html_structure = accessibility_results.get('tests', {}).get('html_structure', {})
-                        title_info = html_structure.get('details', {}).get('title', {})
-                        
-                        if title_info and title_info.get('exists') and title_info.get('analysis'):
-                            title_text = title_info.get('analysis', {}).get('text')
-                            if title_text:
-                                page_result['page_title'] = title_text
-                                print(f"Extracted page title: {title_text}")
-                    except Exception as title_error:
-                        print(f"Error extracting page title: {str(title_error)}")
-
-                    # Save completed page result
-                    db.save_page_result(test_run_id, url, page_result)
+        crawl_options = {
+            'launch_options': launch_options,
+            'screenshots_dir': screenshots_dir,
+            'delay': delay,
+            'max_per_domain': max_per_domain,
+            'concurrency': concurrency,
+            'pool_size': pool_size,
+            'pages_per_browser': pages_per_browser,
+            'browser_memory_limit': browser_memory_limit,
+            'snapshot_engine': snapshot_engine,
+            'breakpoint_concurrency': max(1, breakpoint_concurrency or 1),
+            'db_name': db.db_name,
+            'write_buffer_size': write_buffer_size,
+            'flush_interval': flush_interval,
+            'async_db': async_db,
+            'split_results': split_results,
+            'dedup_results': dedup_results,
+            'incremental': incremental,
+            'tests': tests,
+            'test_concurrency': max(1, test_concurrency or 1),
+            'log_level': log_level,
+            'log_modules': log_modules
+        }
+        indexed_urls = list(enumerate(urls, 1))
 
-                except Exception as e:
-                    error_message = f"Error processing {url}: {str(e)}"
-                    print(error_message)
-                    page_result['errors'].append(error_message)
-                    page_result['status'] = 'error'
-                    db.save_page_result(test_run_id, url, page_result)
+        if resume_run_id:
+            # Keep each URL's original index; started and errored pages are tested again
+            finished_urls = await maybe_await(db.get_finished_urls(test_run_id))
+            indexed_urls = [(index, url) for index, url in indexed_urls if url not in finished_urls]
+            skipped_urls = len(urls) - len(indexed_urls)
+            print(f"Resuming test run {test_run_id}: skipping {skipped_urls} completed pages, "
+                  f"{len(indexed_urls)} pages left to test")
 
-                finally:
-                    try:
-                        await asyncio.wait_for(page.close(), timeout=5.0)
-                    except asyncio.TimeoutError:
-                        print("Warning: Page close operation timed out")
-            except Exception as e:
-                error_message = f"Error creating page for {url}: {str(e)}"
-                print(error_message)
-                page_result['errors'].append(error_message)
-                page_result['status'] = 'error'
-                db.save_page_result(test_run_id, url, page_result)
+        # A domain stays in one worker process with at most max_per_domain
+        # pages in flight, so few domains limit what --workers and --concurrency give
+        domain_count = len(group_by_domain(indexed_urls))
+        used_workers, pages_in_flight = effective_parallelism(domain_count, workers, concurrency, max_per_domain)
+        requested_pages = max(1, workers or 1) * concurrency
+        if used_workers < max(1, workers or 1) or pages_in_flight < requested_pages:
+            print(f"Warning: {domain_count} domain(s) with at most {max_per_domain} page(s) each in flight "
+                  f"allow {used_workers} worker process(es) and {pages_in_flight} page(s) at a time "
+                  f"instead of the requested {max(1, workers or 1)} and {requested_pages}")
+        effective = {'workers': used_workers, 'pages_in_flight': pages_in_flight}
 
+        if workers and workers > 1:
+            # Shard the URLs across worker processes; the coordinator runs in a
+            # thread so this event loop is not blocked while it waits on them
+            # The coordinator uses the database from a thread, so it needs the blocking backend
+            coordinator_db = AccessibilityDB(db_name=db.db_name, create_if_not_exists=True) if async_db else db
+            try:
+                coordinator = ShardCoordinator(coordinator_db, test_run_id, indexed_urls, workers, crawl_options)
+                shard_progress = await asyncio.get_event_loop().run_in_executor(None, coordinator.run)
             finally:
-                await browser.close()
-                print(f"Waiting {delay} seconds before next page...")
-                await asyncio.sleep(delay)
+                if coordinator_db is not db:
+                    coordinator_db.close()
+        else:
+            await crawl_urls(db, test_run_id, indexed_urls, len(urls), crawl_options)
 
     except Exception as e:
         print(f"Error reading file or processing URLs: {str(e)}")
         
     finally:
-        # Complete the test run
-        summary = {
-            'total_urls': len(urls),
-            'completed_at': datetime.now().isoformat()
-        }
-        db.complete_test_run(test_run_id, summary)
+        try:
+            # Complete the test run
+            summary = {
+                'total_urls': len(urls),
+                'completed_at': datetime.now().isoformat()
+            }
+            if shard_progress:
+                summary['shard_progress'] = shard_progress
+            if skipped_urls is not None:
+                summary['resumed_skipped_urls'] = skipped_urls
+            if effective:
+                summary['effective_parallelism'] = effective
+            # Percentiles of the per-page timings, across every shard
+            summary['timings'] = summarize_timings(await maybe_await(db.get_page_timings(test_run_id)))
+            await maybe_await(db.complete_test_run(test_run_id, summary))
         
-        # Export to JSON if needed
-        if results_file:
-            db.export_to_json(results_file, test_run_id)
-            print(f"\nFinal results saved to: {results_file}")
+            # Export to JSON if needed
+            if results_file:
+                await maybe_await(db.export_to_json(results_file, test_run_id, export_format, export_compression))
+                print(f"\nFinal results saved to: {results_file}")
+
+            if violations_dir:
+                violation_count = await maybe_await(db.export_violations(violations_dir, test_run_id))
+                print(f"Exported {violation_count} violations to: {violations_dir}")
             
-        # DEBUGGING: Check the MongoDB to see if the results were saved properly
-        print("\nDEBUGGING: Checking MongoDB for saved results")
-        debug_urls = list(urls)  # Make a copy to avoid modifying the original
-        
-        try:
-            # First, check if the test run exists
-            latest_test_run = db.get_latest_test_run()
-            if latest_test_run:
-                print(f"\nLatest test run ID: {latest_test_run.get('_id')}")
-                print(f"Started: {latest_test_run.get('timestamp_start')}")
-                print(f"Status: {latest_test_run.get('status')}")
-            else:
-                print("Warning: No test runs found in database")
-                
-            for url in debug_urls:
-                print(f"\nChecking results for URL: {url}")
-                
+            if verify_results:
                 try:
-                    page_result = db.get_page_result(test_run_id, url)
-                    
-                    if page_result:
-                        print(f"Status: {page_result.get('status', 'unknown')}")
-                        
-                        # Check for responsive testing results
-                        if 'accessibility' in page_result and 'responsive_testing' in page_result['accessibility']:
-                            resp_testing = page_result['accessibility']['responsive_testing']
-                            print(f"Responsive breakpoints: {resp_testing.get('breakpoints', [])}")
-                            print(f"Number of breakpoint results: {len(resp_testing.get('breakpoint_results', {}))}")
-                            
-                            # Check each breakpoint result
-                            for bp, bp_result in resp_testing.get('breakpoint_results', {}).items():
-                                print(f"\nBreakpoint {bp}:")
-                                print(f"Tests: {list(bp_result.get('tests', {}).keys())}")
-                                
-                                # Check text resize results
-                                if 'text_resize' in bp_result.get('tests', {}):
-                                    tr_result = bp_result['tests']['text_resize']
-                                    if 'textResize' in tr_result:
-                                        print(f"Text resize issues: {tr_result['textResize'].get('pageFlags', {}).get('hasResizeIssues', 'N/A')}")
-                                    else:
-                                        print(f"Text resize format: {list(tr_result.keys())}")
-                                
-                                # Check responsive results
-                                if 'responsive' in bp_result.get('tests', {}):
-                                    resp_result = bp_result['tests']['responsive']
-                                    print(f"Responsive keys: {list(resp_result.keys())}")
-                            
-                            # Check consolidated results
-                            if 'consolidated' in resp_testing:
-                                consolidated = resp_testing['consolidated']
-                                print("\nConsolidated Results:")
-                                print(f"Total Issues: {consolidated.get('summary', {}).get('totalIssues', 0)}")
-                                print(f"Affected Breakpoints: {consolidated.get('summary', {}).get('affectedBreakpoints', 0)}")
-                                
-                                # Check issue types
-                                if 'issuesByType' in consolidated:
-                                    print("Issue Types:")
-                                    for issue_type, issue_data in consolidated['issuesByType'].items():
-                                        print(f"- {issue_type}: {issue_data.get('count', 0)} issues")
-                        else:
-                            print("No responsive testing results found")
-                    else:
-                        print("No results found for this URL")
-                        
+                    await verify_saved_results(db, test_run_id, urls)
                 except Exception as e:
-                    print(f"Error retrieving results for URL {url}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                
-        except Exception as e:
-            print(f"Error checking database results: {str(e)}")
-            import traceback
-            traceback.print_exc()
+                    logger.exception("Error checking database results: %s", e)
+        finally:
+            # Both backends: the sync one flushes its write buffer and stops its flush thread
+            db.close()
+
+    return test_run_id
 
 @click.command()
 @click.argument('input_file', type=click.Path(exists=True))
@@ -799,33 +1086,132 @@ async def process_urls(file_path, screenshots_dir, results_file, max_pages, clea
 @click.option('--clear-db', '-c', is_flag=True,
               help='Clear specified database before starting new test run')
 @click.option('--delay', '-d', type=float, default=2.0,
-              help='Delay in seconds between page tests (default: 2.0)')
+              help='Minimum delay in seconds between page tests on the same domain (default: 2.0)')
 @click.option('--database', '-db', default=None,
               help='MongoDB database name to use (default: accessibility_tests)')
 @click.option('--auto-create-db', '-a', is_flag=True,
               help='Automatically create the database if it does not exist')
-def main(input_file, screenshots_dir, results_file, max_pages, clear_db, delay, database, auto_create_db):
+@click.option('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+              help=f'Number of warm browsers to keep in the pool (default: {DEFAULT_POOL_SIZE})')
+@click.option('--pages-per-browser', type=int, default=DEFAULT_PAGES_PER_BROWSER,
+              help=f'Recycle a browser after this many pages, 0 to disable (default: {DEFAULT_PAGES_PER_BROWSER})')
+@click.option('--browser-memory-limit', type=float, default=None,
+              help='Recycle a browser once it uses this many MB of memory (requires psutil)')
+@click.option('--concurrency', '-n', type=int, default=1,
+              help='Number of pages to test at the same time (default: 1)')
+@click.option('--workers', '-w', type=int, default=1,
+              help='Number of worker processes to shard the URLs across (default: 1)')
+@click.option('--max-per-domain', type=int, default=DEFAULT_MAX_PER_DOMAIN,
+              help='Maximum pages from one domain tested at the same time (default: same as --concurrency)')
+@click.option('--resume', 'resume_run_id', default=None, metavar='TEST_RUN_ID',
+              help='Resume an interrupted test run, skipping pages that already completed')
+@click.option('--snapshot-engine', type=click.Choice(SNAPSHOT_ENGINES), default=DEFAULT_SNAPSHOT_ENGINE,
+              help=f'How the shared DOM snapshot is collected: js walks the DOM in the page, '
+                   f'cdp uses DOMSnapshot.captureSnapshot (default: {DEFAULT_SNAPSHOT_ENGINE})')
+@click.option('--parallel-breakpoints', 'breakpoint_concurrency', type=int, default=1,
+              help='Test this many responsive breakpoints at the same time, each in its own page; their page loads '
+                   'keep the per-domain delay but do not count against --max-per-domain (default: 1)')
+@click.option('--write-buffer', 'write_buffer_size', type=int, default=0,
+              help='Buffer page results and bulk write them once this many are pending, 0 to write immediately (default: 0)')
+@click.option('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+              help=f'Maximum seconds a buffered page result waits before it is written (default: {DEFAULT_FLUSH_INTERVAL})')
+@click.option('--async-db', is_flag=True,
+              help='Store results with the asyncio MongoDB backend (requires motor)')
+@click.option('--split-results', is_flag=True,
+              help='Store each test\'s result as its own document instead of one large page document')
+@click.option('--dedup-results', is_flag=True,
+              help='Store identical test results once, shared across pages and runs by content hash')
+@click.option('--incremental', is_flag=True,
+              help='Reuse earlier results for pages whose DOM and CSS have not changed')
+@click.option('--export-format', type=click.Choice(EXPORT_FORMATS), default=None,
+              help='Format of the results file: json, or ndjson with one page per line (default: from file name)')
+@click.option('--export-compression', type=click.Choice(EXPORT_COMPRESSIONS), default=None,
+              help='Compress the results file; zstd requires zstandard (default: from file name)')
+@click.option('--violations-dir', default=None,
+              help='Also export violations as Parquet files partitioned by test to this directory (requires pyarrow)')
+@click.option('--analysis-workers', type=int, default=1,
+              help='Number of processes analyzing site structure per domain in parallel (default: 1)')
+@click.option('--tests', 'test_selection', default=None, metavar='NAMES',
+              help=f'Comma separated tests to run, or "all" (default: {",".join(DEFAULT_TESTS)}; '
+                   f'available: {",".join(available_tests())})')
+@click.option('--parallel-tests', 'test_concurrency', type=int, default=1,
+              help='Run this many read-only tests on a page at the same time; tests that change the page still run alone (default: 1)')
+@click.option('--incremental-analysis', is_flag=True,
+              help='Analyze site structure from per-domain statistics kept in MongoDB, reading only changed pages')
+@click.option('--verify-results', is_flag=True,
+              help='Print a summary of every stored page result once the run is complete')
+@click.option('--log-level', type=click.Choice(LOG_LEVELS), default=DEFAULT_LOG_LEVEL,
+              help=f'Level of the log output on stderr (default: {DEFAULT_LOG_LEVEL})')
+@click.option('--log-module', 'log_module_settings', multiple=True, metavar='MODULE=LEVEL',
+              help='Log level of one module, e.g. test_responsive_accessibility=debug; can be repeated')
+def main(input_file, screenshots_dir, results_file, max_pages, clear_db, delay, database, auto_create_db,
+         pool_size, pages_per_browser, browser_memory_limit, concurrency, workers, max_per_domain, resume_run_id,
+         snapshot_engine, breakpoint_concurrency, write_buffer_size, flush_interval, async_db,
+         split_results, dedup_results, incremental, export_format, export_compression,
+         violations_dir, analysis_workers, incremental_analysis, test_selection, test_concurrency,
+         verify_results, log_level, log_module_settings):
     """
     Process URLs from INPUT_FILE one at a time and test for accessibility.
     Screenshots will be saved in the specified directory.
     Results will be saved to both MongoDB and the specified JSON file.
     Optional limit on number of pages to test.
     Optional database clearing before starting.
-    Optional delay between page tests.
+    Optional delay between page tests on the same domain.
     Optional database name to use.
     Optional automatic creation of database if it does not exist.
+    Optional browser pool sizing and recycling limits.
+    Optional number of pages to test concurrently.
+    Optional number of worker processes to shard the URLs across.
+    Optional cap on concurrent pages per domain.
+    Optional resumption of an interrupted test run.
+    Optional DevTools snapshot engine for style and layout data.
+    Optional parallel testing of responsive breakpoints.
+    Optional buffered bulk writes of page results.
+    Optional asyncio MongoDB backend.
+    Optional per-test storage of results.
+    Optional deduplication of identical test results.
+    Optional incremental testing of changed pages only.
+    Optional NDJSON and compressed results file.
+    Optional Parquet export of violations.
+    Optional parallel structure analysis.
+    Optional incremental structure analysis.
+    Optional selection of the tests to run.
+    Optional concurrent read-only tests.
+    Optional verification of the stored results.
+    Optional log level, overall and per module.
     """
     try:
+        if resume_run_id and clear_db:
+            raise click.UsageError('--resume cannot be combined with --clear-db')
+        try:
+            tests = parse_test_selection(test_selection)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        try:
+            log_modules = parse_module_levels(log_module_settings)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        configure_logging(log_level, log_modules)
+
         if platform.system() == 'Windows':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
         
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        loop.run_until_complete(process_urls(input_file, screenshots_dir, results_file, max_pages, clear_db, delay, database, auto_create_db))
+        test_run_id = loop.run_until_complete(process_urls(input_file, screenshots_dir, results_file, max_pages, clear_db, delay, database, auto_create_db,
+                                                           pool_size, pages_per_browser, browser_memory_limit, concurrency, workers,
+                                                           max_per_domain, resume_run_id, snapshot_engine,
+                                                           breakpoint_concurrency, write_buffer_size, flush_interval,
+                                                           async_db, split_results, dedup_results,
+                                                           incremental, export_format, export_compression,
+                                                           violations_dir, tests, test_concurrency,
+                                                           verify_results, log_level, log_modules))
         loop.close()
 
         print("\nAnalyzing common page structure across the site...")
-        structure_analysis = analyze_common_structure(db_name=database)
+        structure_analysis = analyze_common_structure(db_name=database, test_run_id=test_run_id,
+                                                      workers=analysis_workers,
+                                                      incremental=incremental_analysis)
         print("Structure analysis complete.")
     except Exception as e:
         print(f"Error: {str(e)}")
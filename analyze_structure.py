@@ -1,12 +1,167 @@
 # analyze_structure.py - Analyzes common structural elements across sites
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+from operator import itemgetter
 import json
+import multiprocessing
 from bson import ObjectId
 from datetime import datetime
 import pprint
 
+try:
+    from src.test_with_mongo.result_storage import (
+        TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, is_split, assemble_page_result, blob_refs, blob_parts,
+        result_hash
+    )
+except ImportError:
+    from result_storage import (
+        TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, is_split, assemble_page_result, blob_refs, blob_parts,
+        result_hash
+    )
+
+# The tests structure analysis reads; only these are loaded for split results
+ANALYZED_TESTS = ('accessible_names', 'page_structure')
+
+# Where the analyzed data sits inside each test's result
+STRUCTURE_FIELD = 'page_structure'
+ACCESSIBLE_NAMES_FIELD = 'accessible_names.details.elements'
+
+# The keyElements compared across a domain's pages, by the analysis each produces
+STRUCTURE_COMPONENTS = (
+    ('header_analysis', 'primaryHeader'),
+    ('footer_analysis', 'primaryFooter'),
+    ('navigation_analysis', 'navigation'),
+    ('main_content_analysis', 'mainContent'),
+    ('complementary_analysis', 'complementaryContent')
+)
+
+# The pageFlags counted per domain
+PAGE_FLAGS = (
+    'hasSecondaryHeaders', 'hasSecondaryFooters', 'hasSearchComponent', 'hasSocialMediaLinks',
+    'hasCookieNotice', 'hasSidebars', 'hasChatbot', 'hasNewsletterSignup', 'hasPopups', 'hasForms',
+    'hasHeroSection', 'hasCardGrids', 'hasFeatureSections', 'hasCarousels', 'hasRepetitivePatterns'
+)
+
+# Incremental analysis keeps per-domain statistics, and what each page added to them
+STRUCTURE_STATISTICS_COLLECTION = 'structure_statistics'
+STRUCTURE_PAGE_STATISTICS_COLLECTION = 'structure_page_statistics'
+
+# URLs per $in query when reading and comparing pages incrementally
+URL_BATCH_SIZE = 1000
+
+
+def _domain_expression():
+    """
+    The page's domain: the stored domain field, or for results saved before
+    it existed the lowercased host of the URL, computed with $split
+    """
+    after_scheme = {'$arrayElemAt': [{'$split': ['$url', '://']}, -1]}
+    host = {'$arrayElemAt': [{'$split': [after_scheme, '/']}, 0]}
+    hostname = {'$arrayElemAt': [{'$split': [host, ':']}, 0]}
+    return {'$ifNull': ['$domain', {'$toLower': hostname}]}
+
+
+def _blob_field(test_name, field):
+    """Pick a field of the deduplicated blob holding test_name's result"""
+    ref = {'$arrayElemAt': [
+        {'$filter': {'input': '$refs', 'cond': {'$eq': [{'$arrayElemAt': ['$$this', 0]}, test_name]}}}, 0
+    ]}
+    # Bind the hash first; $$this inside the second $filter is the blob
+    blob = {'$arrayElemAt': [
+        {'$filter': {'input': '$blobs', 'cond': {'$eq': ['$$this._id', '$$digest']}}}, 0
+    ]}
+    return {'$let': {
+        'vars': {'digest': {'$arrayElemAt': [ref, 2]}},
+        'in': {'$let': {'vars': {'blob': blob}, 'in': f'$$blob.result.{field}'}}
+    }}
+
+
+def _part_field(test_name, field):
+    """Pick a field of the test_results part holding test_name's result"""
+    part = {'$arrayElemAt': [
+        {'$filter': {'input': '$parts', 'cond': {'$eq': ['$$this.test_name', test_name]}}}, 0
+    ]}
+    return {'$let': {'vars': {'part': part}, 'in': f'$$part.{field}'}}
+
+
+def structure_pipeline(test_run_id, domain=None, split=False, urls=None):
+    """
+    Aggregation pipeline that returns only what structure analysis needs:
+    one {url, domain, structure, elements} document per page, sorted by
+    domain. With split=True the data of split or deduplicated results is
+    looked up in test_results and result_blobs on the server as well.
+    urls limits the pipeline to those pages.
+    """
+    match = {'test_run_id': test_run_id}
+    if urls is not None:
+        match['url'] = {'$in': list(urls)}
+    if domain is not None:
+        # Results saved before the domain field existed are matched after $project
+        match['domain'] = {'$in': [domain, None]}
+    tests = '$results.accessibility.tests'
+    structure = f'{tests}.page_structure.{STRUCTURE_FIELD}'
+    elements = f'{tests}.accessible_names.{ACCESSIBLE_NAMES_FIELD}'
+
+    pipeline = [{'$match': match}]
+    if split:
+        pipeline += [
+            {'$lookup': {
+                'from': TEST_RESULTS_COLLECTION,
+                'let': {'run': '$test_run_id', 'url': '$url'},
+                'pipeline': [
+                    {'$match': {
+                        'test_name': {'$in': list(ANALYZED_TESTS)},
+                        'breakpoint': None,
+                        '$expr': {'$and': [{'$eq': ['$test_run_id', '$$run']}, {'$eq': ['$url', '$$url']}]}
+                    }},
+                    {'$project': {
+                        '_id': 0,
+                        'test_name': 1,
+                        'structure': f'$result.{STRUCTURE_FIELD}',
+                        'elements': f'$result.{ACCESSIBLE_NAMES_FIELD}'
+                    }}
+                ],
+                'as': 'parts'
+            }},
+            {'$addFields': {'refs': {'$filter': {
+                'input': {'$ifNull': ['$results.accessibility.split_tests', []]},
+                'cond': {'$and': [
+                    {'$gte': [{'$size': '$$this'}, 3]},
+                    {'$in': [{'$arrayElemAt': ['$$this', 0]}, list(ANALYZED_TESTS)]}
+                ]}
+            }}}},
+            {'$addFields': {'hashes': {'$map': {'input': '$refs', 'in': {'$arrayElemAt': ['$$this', 2]}}}}},
+            {'$lookup': {
+                'from': RESULT_BLOBS_COLLECTION,
+                'localField': 'hashes',
+                'foreignField': '_id',
+                'as': 'blobs'
+            }}
+        ]
+        structure = {'$ifNull': [structure, {'$ifNull': [
+            _part_field('page_structure', 'structure'), _blob_field('page_structure', STRUCTURE_FIELD)
+        ]}]}
+        elements = {'$ifNull': [elements, {'$ifNull': [
+            _part_field('accessible_names', 'elements'), _blob_field('accessible_names', ACCESSIBLE_NAMES_FIELD)
+        ]}]}
+
+    pipeline += [
+        {'$project': {
+            '_id': 0,
+            'url': 1,
+            'domain': _domain_expression(),
+            'structure': structure,
+            'elements': elements
+        }}
+    ]
+    if domain is not None:
+        pipeline.append({'$match': {'domain': domain}})
+    pipeline.append({'$sort': {'domain': 1, 'url': 1}})
+    return pipeline
+
 DEFAULT_DB_NAME = 'accessibility_tests'
 
 class AccessibilityDB:
@@ -23,22 +178,129 @@ class AccessibilityDB:
             self.db = self.client[db_name]
             self.test_runs = self.db['test_runs']
             self.page_results = self.db['page_results']
+            self.test_results = self.db[TEST_RESULTS_COLLECTION]
+            self.result_blobs = self.db[RESULT_BLOBS_COLLECTION]
             self.structure_analysis = self.db['structure_analysis']
+            self.structure_statistics = self.db[STRUCTURE_STATISTICS_COLLECTION]
+            self.structure_page_statistics = self.db[STRUCTURE_PAGE_STATISTICS_COLLECTION]
+            self.structure_page_statistics.create_index('domain')
             
             print(f"Structure analysis connected to database: '{db_name}'")
         except Exception as e:
             print(f"Failed to connect to MongoDB: {e}")
             raise
 
-    def get_page_results(self, test_run_ids=None):
-        """Get all page results for specific test runs"""
+    def get_page_results(self, test_run_ids=None, tests=ANALYZED_TESTS):
+        """
+        Get all page results for specific test runs
+
+        Results stored with split_results or dedup_results are reassembled
+        from test_results or result_blobs, loading only the parts for `tests`.
+        """
         query = {}
         if test_run_ids:
             if isinstance(test_run_ids, list):
                 query['test_run_id'] = {'$in': test_run_ids}
             else:
                 query['test_run_id'] = test_run_ids
-        return list(self.page_results.find(query))
+        page_results = list(self.page_results.find(query))
+
+        split = [result for result in page_results if is_split(result.get('results'))]
+        if split:
+            parts = defaultdict(list)
+            if any(not blob_refs(result['results']) for result in split):
+                parts_query = dict(query, test_name={'$in': list(tests)})
+                for part in self.test_results.find(parts_query, {'_id': 0, 'timestamp': 0}):
+                    parts[(part['test_run_id'], part['url'])].append(part)
+            hashes = list({digest for result in split for _, _, digest in blob_refs(result['results'], tests)})
+            blobs = {}
+            if hashes:
+                blobs = {doc['_id']: doc['result'] for doc in self.result_blobs.find({'_id': {'$in': hashes}})}
+            for result in split:
+                envelope = result['results']
+                result['results'] = assemble_page_result(
+                    envelope, parts.get((result['test_run_id'], result['url']), []) + blob_parts(envelope, blobs, tests)
+                )
+        return page_results
+
+    def has_split_results(self, test_run_id):
+        """True if any page result of the run stores its tests separately"""
+        return self.page_results.find_one(
+            {'test_run_id': test_run_id, 'results.accessibility.split_tests': {'$exists': True}},
+            {'_id': 1}
+        ) is not None
+
+    def iter_structure_data(self, test_run_id, domain=None, urls=None):
+        """
+        Stream the structure data of a run, sorted by domain, computed with an
+        aggregation pipeline so only the analyzed subdocuments cross the wire
+        """
+        pipeline = structure_pipeline(test_run_id, domain, split=self.has_split_results(test_run_id), urls=urls)
+        return self.page_results.aggregate(pipeline, allowDiskUse=True)
+
+    def get_page_fingerprints(self, test_run_id):
+        """Get the URL, domain and DOM/CSS fingerprint of every page of a run"""
+        pipeline = [
+            {'$match': {'test_run_id': test_run_id}},
+            {'$project': {'_id': 0, 'url': 1, 'domain': _domain_expression(), 'fingerprint': '$results.fingerprint'}}
+        ]
+        return list(self.page_results.aggregate(pipeline))
+
+    def get_page_statistics(self, urls):
+        """Get what each of the URLs last contributed to its domain's statistics, by URL"""
+        urls = list(urls)
+        page_statistics = {}
+        for start in range(0, len(urls), URL_BATCH_SIZE):
+            for doc in self.structure_page_statistics.find({'_id': {'$in': urls[start:start + URL_BATCH_SIZE]}}):
+                page_statistics[doc['_id']] = doc
+        return page_statistics
+
+    def iter_domain_page_statistics(self, domains):
+        """Yield the URL, domain and contribution of every page counted in the domains' statistics"""
+        return self.structure_page_statistics.find(
+            {'domain': {'$in': list(domains)}}, {'_id': 1, 'domain': 1, 'contribution': 1}
+        )
+
+    def delete_page_statistics(self, urls):
+        """Forget what the URLs contributed to their domains' statistics"""
+        urls = list(urls)
+        for start in range(0, len(urls), URL_BATCH_SIZE):
+            self.structure_page_statistics.delete_many({'_id': {'$in': urls[start:start + URL_BATCH_SIZE]}})
+
+    def save_page_statistics(self, page_statistics):
+        """Replace the stored contributions of pages, one document per URL"""
+        if page_statistics:
+            self.structure_page_statistics.bulk_write(
+                [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in page_statistics], ordered=False
+            )
+
+    def get_domain_statistics(self, domains):
+        """Get the stored structure statistics of domains, by domain"""
+        return {doc['_id']: doc for doc in self.structure_statistics.find({'_id': {'$in': list(domains)}})}
+
+    def save_domain_statistics(self, domain_statistics):
+        """Replace the stored structure statistics of domains, one document per domain"""
+        if domain_statistics:
+            self.structure_statistics.bulk_write(
+                [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in domain_statistics], ordered=False
+            )
+
+    def get_domains(self, test_run_id):
+        """Get the domains of a run with their page counts, largest first"""
+        pipeline = [
+            {'$match': {'test_run_id': test_run_id}},
+            {'$group': {'_id': _domain_expression(), 'pages': {'$sum': 1}}},
+            {'$sort': {'pages': -1, '_id': 1}}
+        ]
+        return [(doc['_id'], doc['pages']) for doc in self.page_results.aggregate(pipeline)]
+
+    def get_test_run_start(self, test_run_id):
+        """Get when a test run started, as its ISO timestamp_start, or None"""
+        try:
+            test_run = self.test_runs.find_one({'_id': ObjectId(test_run_id)}, {'timestamp_start': 1})
+        except Exception:
+            return None
+        return test_run.get('timestamp_start') if test_run else None
 
     def get_most_recent_test_run_id(self):
         """Get the most recent test run ID"""
@@ -55,91 +317,354 @@ class AccessibilityDB:
         if hasattr(self, 'client'):
             self.client.close()
 
-def analyze_common_structure(db_name=None):
+def collect_domain_pages(pages):
+    """
+    Split one domain's pages from the structure pipeline into its structure
+    data and accessible_names elements by URL
+
+    Returns:
+        tuple: (page_count, structure_data_by_url, accessible_names_by_url)
+    """
+    structure_data_by_url = {}
+    accessible_names_by_url = {}
+    page_count = 0
+    for page in pages:
+        page_count += 1
+        if page.get('structure'):
+            structure_data_by_url[page['url']] = page['structure']
+        if page.get('elements'):
+            accessible_names_by_url[page['url']] = page['elements']
+    return page_count, structure_data_by_url, accessible_names_by_url
+
+# Each analysis worker process keeps one database connection for all its domains
+_worker_db = None
+
+def _init_analysis_worker(db_name):
+    global _worker_db
+    _worker_db = AccessibilityDB(db_name=db_name)
+
+def _analyze_domain_worker(test_run_id, domain):
+    """Stream one domain's pages from Mongo and analyze them in a worker process"""
+    page_count, structure_data, accessible_names = collect_domain_pages(
+        _worker_db.iter_structure_data(test_run_id, domain)
+    )
+    return domain, page_count, analyze_domain_data(domain, structure_data, accessible_names)
+
+def analyze_domains_in_parallel(db, test_run_id, workers):
+    """
+    Analyze every domain of a run in a pool of worker processes
+
+    Returns:
+        tuple: (domain_analyses, total_pages, total_domains)
+    """
+    # Largest domains first, so one big site does not start last and finish alone
+    domains = db.get_domains(test_run_id)
+    print(f"Analyzing {len(domains)} domains with {workers} worker processes")
+
+    results = {}
+    total_pages = 0
+    # spawn gives every worker a clean interpreter and its own MongoClient
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_analysis_worker, initargs=(db.db_name,)) as executor:
+        futures = [executor.submit(_analyze_domain_worker, test_run_id, domain) for domain, _ in domains]
+        for future in as_completed(futures):
+            domain, page_count, analysis = future.result()
+            total_pages += page_count
+            print(f"Analyzed domain: {domain} ({page_count} pages)")
+            if analysis:
+                results[domain] = analysis
+
+    # Same order as the sequential analysis
+    domain_analyses = {domain: results[domain] for domain in sorted(results)}
+    return domain_analyses, total_pages, len(domains)
+
+def page_contribution(structure):
+    """
+    What one page adds to its domain's structure statistics: a summary of
+    each component found on it, and the page flags it raises
+    """
+    key_elements = structure.get('keyElements', {})
+    components = {}
+    for _, element in STRUCTURE_COMPONENTS:
+        comp = key_elements.get(element, {})
+        if comp:
+            components[element] = summarize_component(comp)
+    return {'components': components, 'flags': sorted(count_page_flags([structure]))}
+
+def empty_domain_statistics():
+    return {
+        'page_count': 0,
+        'components': {
+            element: {'pages': 0, 'tags': Counter(), 'class_patterns': Counter(), 'children_counts': Counter()}
+            for _, element in STRUCTURE_COMPONENTS
+        },
+        'flags': Counter()
+    }
+
+def apply_page_contribution(statistics, contribution, sign=1):
+    """Add (sign=1) or remove (sign=-1) one page's contribution to its domain's statistics"""
+    statistics['page_count'] += sign
+    for element, summary in contribution['components'].items():
+        component = statistics['components'][element]
+        component['pages'] += sign
+        component['tags'][summary['tag']] += sign
+        for cls in summary['classes']:
+            component['class_patterns'][cls] += sign
+        component['children_counts'][summary['children']] += sign
+    for flag in contribution['flags']:
+        statistics['flags'][flag] += sign
+
+def _counter_pairs(counter):
+    # [key, count] pairs, since class names may contain dots and children counts are ints
+    return [[key, count] for key, count in counter.items() if count > 0]
+
+def domain_statistics_to_document(domain, statistics, test_run_id=None, run_started=None):
+    """
+    Serialize a domain's statistics for the structure_statistics collection,
+    noting the test run they were last brought up to date with
+    """
+    return {
+        '_id': domain,
+        'test_run_id': test_run_id,
+        'run_started': run_started,
+        'page_count': statistics['page_count'],
+        'components': {
+            element: {
+                'pages': component['pages'],
+                'tags': _counter_pairs(component['tags']),
+                'class_patterns': _counter_pairs(component['class_patterns']),
+                'children_counts': _counter_pairs(component['children_counts'])
+            }
+            for element, component in statistics['components'].items()
+        },
+        'flags': {flag: count for flag, count in statistics['flags'].items() if count > 0},
+        'timestamp': datetime.now().isoformat()
+    }
+
+def domain_statistics_from_document(doc):
+    """Load a domain's statistics stored by domain_statistics_to_document"""
+    statistics = empty_domain_statistics()
+    if doc:
+        statistics['page_count'] = doc.get('page_count', 0)
+        for element, component in doc.get('components', {}).items():
+            statistics['components'][element] = {
+                'pages': component.get('pages', 0),
+                'tags': Counter({key: count for key, count in component.get('tags', [])}),
+                'class_patterns': Counter({key: count for key, count in component.get('class_patterns', [])}),
+                'children_counts': Counter({key: count for key, count in component.get('children_counts', [])})
+            }
+        statistics['flags'] = Counter(doc.get('flags', {}))
+    return statistics
+
+def analyze_domain_statistics(domain, statistics):
+    """
+    Analyze a domain from its stored structure statistics. Sections that need
+    every page's full structure (forms, complexity, interactive elements and
+    sample pages) are left out. Domains without any page structure have no
+    statistics; analyze_structure_incrementally analyzes those from their
+    accessible_names results instead, as analyze_domain_data does.
+    """
+    page_count = statistics['page_count']
+    component_analyses = {}
+    for analysis_name, element in STRUCTURE_COMPONENTS:
+        component = statistics['components'][element]
+        component_analyses[analysis_name] = consistency_from_statistics(
+            page_count, component['pages'], component['tags'], component['class_patterns'], component['children_counts']
+        )
+    flag_analysis = analyze_page_flags(statistics['flags'], page_count)
+
+    return {
+        'domain': domain,
+        'page_count': page_count,
+        'header_analysis': component_analyses['header_analysis'],
+        'footer_analysis': component_analyses['footer_analysis'],
+        'secondary_headers': flag_analysis['secondary_headers'],
+        'secondary_footers': flag_analysis['secondary_footers'],
+        'navigation_analysis': component_analyses['navigation_analysis'],
+        'main_content_analysis': component_analyses['main_content_analysis'],
+        'complementary_analysis': component_analyses['complementary_analysis'],
+        'component_presence': flag_analysis['component_presence'],
+        'recurring_elements': flag_analysis['recurring_elements'],
+        'content_blocks': flag_analysis['content_blocks'],
+        'repetitive_patterns': flag_analysis['repetitive_patterns'],
+        'overall_consistency_score': overall_consistency_score(component_analyses.values()),
+        'analysis_method': 'incremental_structure'
+    }
+
+def update_structure_statistics(db, test_run_id):
+    """
+    Bring the stored per-domain structure statistics up to date with a run.
+
+    The statistics of a domain count exactly the run's pages of that domain,
+    each with the structure of its result in the run. Pages whose DOM/CSS
+    fingerprint matches the one last counted are skipped without reading
+    their structure; for the others the old contribution is removed from the
+    domain's statistics and the new one added, and pages counted before but
+    missing from the run are removed, so the work grows with the number of
+    changed pages rather than with the size of the domains.
+
+    Statistics only move forward: if any of the run's domains was last
+    updated from a run that started later, nothing is changed and None is
+    returned so the caller can analyze the run in full instead.
+
+    Returns:
+        tuple: (pages, statistics) the run's pages as {url, domain, fingerprint},
+            and the statistics of the run's domains, or None
+    """
+    run_started = db.get_test_run_start(test_run_id)
+    pages = db.get_page_fingerprints(test_run_id)
+    run_domains = {page['domain'] for page in pages}
+    stored = db.get_domain_statistics(run_domains)
+
+    newer = sorted(
+        domain for domain, doc in stored.items()
+        if run_started and doc.get('run_started') and doc['run_started'] > run_started
+    )
+    if newer:
+        print(f"Warning: structure statistics of {len(newer)} domain(s) (e.g. {newer[0]}) were updated from a "
+              f"later test run than {test_run_id}; not rolling them back")
+        return None
+
+    previous = db.get_page_statistics(page['url'] for page in pages)
+    changed = {}
+    for page in pages:
+        counted = previous.get(page['url'])
+        if (not page.get('fingerprint') or counted is None or counted.get('fingerprint') != page['fingerprint']
+                or counted.get('domain') != page['domain']):
+            changed[page['url']] = page
+
+    affected_domains = {previous[url]['domain'] for url in changed if url in previous} - run_domains
+    stored.update(db.get_domain_statistics(affected_domains))
+    statistics = {
+        domain: domain_statistics_from_document(stored.get(domain)) for domain in run_domains | affected_domains
+    }
+    updated_domains = set()
+
+    # Drop the pages counted for the run's domains that are not part of the run
+    run_urls = {page['url'] for page in pages}
+    removed = []
+    for doc in db.iter_domain_page_statistics(run_domains):
+        if doc['_id'] not in run_urls:
+            removed.append(doc['_id'])
+            if doc.get('contribution'):
+                apply_page_contribution(statistics[doc['domain']], doc['contribution'], -1)
+                updated_domains.add(doc['domain'])
+
+    page_statistics = []
+    urls = list(changed)
+    for start in range(0, len(urls), URL_BATCH_SIZE):
+        for page in db.iter_structure_data(test_run_id, urls=urls[start:start + URL_BATCH_SIZE]):
+            url = page['url']
+            domain = page['domain']
+            structure = page.get('structure') or None
+            digest = result_hash(structure) if structure else None
+            counted = previous.get(url)
+            doc = {'_id': url, 'domain': domain, 'fingerprint': changed[url].get('fingerprint'), 'digest': digest}
+
+            if counted is not None and counted.get('digest') == digest and counted.get('domain') == domain:
+                # Same structure under a new fingerprint; the statistics stay as they are
+                doc['contribution'] = counted.get('contribution')
+            else:
+                if counted is not None and counted.get('contribution'):
+                    apply_page_contribution(statistics[counted['domain']], counted['contribution'], -1)
+                    updated_domains.add(counted['domain'])
+                doc['contribution'] = page_contribution(structure) if structure else None
+                if doc['contribution']:
+                    apply_page_contribution(statistics[domain], doc['contribution'])
+                    updated_domains.add(domain)
+            page_statistics.append(doc)
+
+    # Every domain of the run is stamped with it, so older runs are refused later
+    db.save_domain_statistics([
+        domain_statistics_to_document(domain, statistics[domain], test_run_id, run_started)
+        for domain in sorted(run_domains | updated_domains)
+    ])
+    db.save_page_statistics(page_statistics)
+    db.delete_page_statistics(removed)
+    print(f"Updated structure statistics from {len(changed)} new or changed pages "
+          f"({len(pages) - len(changed)} unchanged, {len(removed)} no longer in the run) "
+          f"across {len(updated_domains)} domains")
+    return pages, statistics
+
+def analyze_structure_incrementally(db, test_run_id):
+    """
+    Analyze every domain of a run from its stored structure statistics,
+    updating them from the run's new or changed pages first. Domains without
+    page structure are analyzed from their accessible_names results.
+
+    Returns:
+        tuple: (domain_analyses, total_pages, total_domains), or None if the
+            statistics are newer than the run and it has to be analyzed in full
+    """
+    updated = update_structure_statistics(db, test_run_id)
+    if updated is None:
+        return None
+    pages, statistics = updated
+    domains = sorted({page['domain'] for page in pages})
+
+    domain_analyses = {}
+    for domain in domains:
+        domain_statistics = statistics.get(domain)
+        if domain_statistics and domain_statistics['page_count'] > 0:
+            domain_analyses[domain] = analyze_domain_statistics(domain, domain_statistics)
+        else:
+            _, structure_data_by_url, accessible_names_by_url = collect_domain_pages(
+                db.iter_structure_data(test_run_id, domain)
+            )
+            analysis = analyze_domain_data(domain, structure_data_by_url, accessible_names_by_url)
+            if analysis:
+                domain_analyses[domain] = analysis
+    return domain_analyses, len(pages), len(domains)
+
+def analyze_common_structure(db_name=None, test_run_id=None, workers=1, incremental=False):
     """
     Analyze common structural elements by site, then provide an overall summary.
     
     Args:
         db_name (str, optional): Name of the MongoDB database to use. Defaults to None (uses 'accessibility_tests').
+        test_run_id (str, optional): Test run to analyze. Defaults to None (uses the most recent test run).
+        workers (int, optional): Number of processes analyzing domains in parallel. Defaults to 1 (in process).
+        incremental (bool, optional): Analyze from per-domain statistics kept in MongoDB, reading only
+            new or changed pages. Defaults to False.
     """
     db = AccessibilityDB(db_name=db_name)
     
-    # Get the most recent test run ID
-    test_run_id = db.get_most_recent_test_run_id()
+    # Default to the most recent test run ID
+    if test_run_id is None:
+        test_run_id = db.get_most_recent_test_run_id()
     print(f"Analyzing structure for test run: {test_run_id}")
     
-    # Get all page results for this test run
-    page_results = db.get_page_results(test_run_id)
-    print(f"Found {len(page_results)} pages to analyze")
-    
-    # Group results by domain
-    pages_by_domain = {}
-    all_accessible_names = {}
-    all_structure_data = {}
-    
-    for result in page_results:
-        url = result['url']
-        domain = url.replace('http://', '').replace('https://', '').split('/')[0]
-        
-        # Initialize domain entry if needed
-        if domain not in pages_by_domain:
-            pages_by_domain[domain] = []
-            all_accessible_names[domain] = {}
-            all_structure_data[domain] = {}
+    incremental_analysis = analyze_structure_incrementally(db, test_run_id) if incremental else None
+    if incremental_analysis:
+        domain_analyses, total_pages, total_domains = incremental_analysis
+    elif workers and workers > 1:
+        domain_analyses, total_pages, total_domains = analyze_domains_in_parallel(db, test_run_id, workers)
+    else:
+        # The pipeline returns the pages sorted by domain, so each domain can be
+        # analyzed as soon as its pages have arrived
+        domain_analyses = {}
+        total_pages = 0
+        total_domains = 0
         
-        # Add page to domain list
-        pages_by_domain[domain].append(url)
-        
-        # Extract accessible_names data
-        elements = []
-        if 'results' in result and 'accessibility' in result['results']:
-            accessibility = result['results']['accessibility']
-            
-            # Try the accessible_names test
-            if 'tests' in accessibility and 'accessible_names' in accessibility['tests']:
-                accessible_names = accessibility['tests']['accessible_names']
-                if 'accessible_names' in accessible_names:
-                    details = accessible_names['accessible_names'].get('details', {})
-                    elements = details.get('elements', [])
-        
-        if elements:
-            all_accessible_names[domain][url] = elements
-        
-        # Extract structure data if available
-        if 'results' in result and 'accessibility' in result['results']:
-            accessibility = result['results']['accessibility']
+        for domain, pages in groupby(db.iter_structure_data(test_run_id), key=itemgetter('domain')):
+            page_count, all_structure_data, all_accessible_names = collect_domain_pages(pages)
+            total_pages += page_count
+            total_domains += 1
             
-            if 'tests' in accessibility and 'page_structure' in accessibility['tests']:
-                structure_data = accessibility['tests']['page_structure'].get('page_structure', {})
-                
-                if structure_data:
-                    all_structure_data[domain][url] = structure_data
-    
-    print(f"Grouped pages into {len(pages_by_domain)} domains")
-    
-    # Analyze each domain separately
-    domain_analyses = {}
+            print(f"Analyzing domain: {domain} ({page_count} pages)")
+            analysis = analyze_domain_data(domain, all_structure_data, all_accessible_names)
+            if analysis:
+                domain_analyses[domain] = analysis
     
-    for domain, urls in pages_by_domain.items():
-        print(f"Analyzing domain: {domain} ({len(urls)} pages)")
-        
-        # Use structure data if available, otherwise fall back to accessible_names
-        if domain in all_structure_data and all_structure_data[domain]:
-            analysis = analyze_domain_structure(domain, all_structure_data[domain])
-        elif domain in all_accessible_names and all_accessible_names[domain]:
-            analysis = analyze_domain_accessible_names(domain, all_accessible_names[domain])
-        else:
-            analysis = None
-            
-        if analysis:
-            domain_analyses[domain] = analysis
+    print(f"Analyzed {total_pages} pages across {total_domains} domains")
     
     # Calculate overall cross-site consistency
     overall_analysis = {
         'test_run_id': test_run_id,
         'timestamp': datetime.now().isoformat(),
-        'total_pages': len(page_results),
-        'total_domains': len(pages_by_domain),
+        'total_pages': total_pages,
+        'total_domains': total_domains,
         'domains_analyzed': list(domain_analyses.keys()),
         'domain_analyses': domain_analyses,
         'overall_summary': calculate_overall_summary(domain_analyses)
@@ -155,68 +680,80 @@ def analyze_common_structure(db_name=None):
     
     return overall_analysis
 
+def analyze_domain_data(domain, structure_data_by_url, accessible_names_by_url):
+    """Analyze a domain from its structure data, falling back to accessible_names"""
+    if structure_data_by_url:
+        return analyze_domain_structure(domain, structure_data_by_url)
+    if accessible_names_by_url:
+        return analyze_domain_accessible_names(domain, accessible_names_by_url)
+    return None
+
+def count_page_flags(structures):
+    """Count the pages of a domain that raise each of PAGE_FLAGS"""
+    flag_counts = Counter()
+    for data in structures:
+        page_flags = data.get('pageFlags', {})
+        flag_counts.update(flag for flag in PAGE_FLAGS if page_flags.get(flag, False))
+    return flag_counts
+
+def analyze_page_flags(flag_counts, page_count):
+    """The parts of a domain's structure analysis derived from its page flag counts"""
+    secondary_headers_count = flag_counts.get('hasSecondaryHeaders', 0)
+    secondary_footers_count = flag_counts.get('hasSecondaryFooters', 0)
+    return {
+        'secondary_headers': {
+            'count': secondary_headers_count,
+            'presence_ratio': secondary_headers_count / page_count if page_count else 0
+        },
+        'secondary_footers': {
+            'count': secondary_footers_count,
+            'presence_ratio': secondary_footers_count / page_count if page_count else 0
+        },
+        'component_presence': {
+            'search': flag_counts.get('hasSearchComponent', 0),
+            'socialMedia': flag_counts.get('hasSocialMediaLinks', 0),
+            'cookieNotice': flag_counts.get('hasCookieNotice', 0),
+            'sidebars': flag_counts.get('hasSidebars', 0)
+        },
+        'recurring_elements': {
+            'chatbots': flag_counts.get('hasChatbot', 0),
+            'cookieNotices': flag_counts.get('hasCookieNotice', 0),
+            'newsletters': flag_counts.get('hasNewsletterSignup', 0),
+            'popups': flag_counts.get('hasPopups', 0),
+            'forms': flag_counts.get('hasForms', 0)
+        },
+        'content_blocks': {
+            'heroSections': flag_counts.get('hasHeroSection', 0),
+            'cardGrids': flag_counts.get('hasCardGrids', 0),
+            'featureSections': flag_counts.get('hasFeatureSections', 0),
+            'carousels': flag_counts.get('hasCarousels', 0)
+        },
+        'repetitive_patterns': {
+            'found': flag_counts.get('hasRepetitivePatterns', 0)
+        }
+    }
+
+def overall_consistency_score(component_analyses):
+    """Average the consistency scores of the components present on a domain"""
+    scores = [analysis.get('consistency_score', 0) if analysis else 0 for analysis in component_analyses]
+    # Filter out zero scores (components that might not be present)
+    scores = [score for score in scores if score > 0]
+    return sum(scores) / len(scores) if scores else 0
+
 def analyze_domain_structure(domain, structure_data_by_url):
     """Analyze page structure for a specific domain using dedicated structure data"""
     
-    # Analyze primary header consistency
-    header_analysis = analyze_component_consistency(
-        structure_data_by_url, 
-        lambda data: data.get('keyElements', {}).get('primaryHeader', {})
-    )
-    
-    # Analyze primary footer consistency
-    footer_analysis = analyze_component_consistency(
-        structure_data_by_url, 
-        lambda data: data.get('keyElements', {}).get('primaryFooter', {})
-    )
-    
-    # Analyze secondary headers
-    secondary_headers_count = sum(1 for data in structure_data_by_url.values() 
-                               if data.get('pageFlags', {}).get('hasSecondaryHeaders', False))
-    
-    # Analyze secondary footers
-    secondary_footers_count = sum(1 for data in structure_data_by_url.values() 
-                               if data.get('pageFlags', {}).get('hasSecondaryFooters', False))
-    
-    # Analyze navigation consistency
-    navigation_analysis = analyze_component_consistency(
-        structure_data_by_url, 
-        lambda data: data.get('keyElements', {}).get('navigation', {})
-    )
-    
-    # Analyze main content consistency
-    main_content_analysis = analyze_component_consistency(
-        structure_data_by_url, 
-        lambda data: data.get('keyElements', {}).get('mainContent', {})
-    )
-    
-    # Analyze complementary content consistency
-    complementary_analysis = analyze_component_consistency(
-        structure_data_by_url, 
-        lambda data: data.get('keyElements', {}).get('complementaryContent', {})
-    )
-    
-    # Analyze component presence
-    component_presence = {
-        'search': sum(1 for data in structure_data_by_url.values() if data.get('pageFlags', {}).get('hasSearchComponent', False)),
-        'socialMedia': sum(1 for data in structure_data_by_url.values() if data.get('pageFlags', {}).get('hasSocialMediaLinks', False)),
-        'cookieNotice': sum(1 for data in structure_data_by_url.values() if data.get('pageFlags', {}).get('hasCookieNotice', False)),
-        'sidebars': sum(1 for data in structure_data_by_url.values() if data.get('pageFlags', {}).get('hasSidebars', False))
+    # Analyze the consistency of the header, footer, navigation, main and complementary content
+    component_analyses = {
+        analysis_name: analyze_component_consistency(
+            structure_data_by_url,
+            lambda data, element=element: data.get('keyElements', {}).get(element, {})
+        )
+        for analysis_name, element in STRUCTURE_COMPONENTS
     }
     
-    # Analyze recurring elements presence
-    recurring_elements = {
-        'chatbots': sum(1 for data in structure_data_by_url.values() 
-                      if data.get('pageFlags', {}).get('hasChatbot', False)),
-        'cookieNotices': sum(1 for data in structure_data_by_url.values() 
-                           if data.get('pageFlags', {}).get('hasCookieNotice', False)),
-        'newsletters': sum(1 for data in structure_data_by_url.values() 
-                         if data.get('pageFlags', {}).get('hasNewsletterSignup', False)),
-        'popups': sum(1 for data in structure_data_by_url.values() 
-                     if data.get('pageFlags', {}).get('hasPopups', False)),
-        'forms': sum(1 for data in structure_data_by_url.values() 
-                   if data.get('pageFlags', {}).get('hasForms', False))
-    }
+    # Count secondary headers/footers, components, recurring elements and content blocks
+    flag_analysis = analyze_page_flags(count_page_flags(structure_data_by_url.values()), len(structure_data_by_url))
     
     # Analyze forms data for this domain
     forms_analysis = analyze_forms_for_domain(domain, structure_data_by_url)
@@ -258,54 +795,24 @@ def analyze_domain_structure(domain, structure_data_by_url):
         url = next(iter(structure_data_by_url.keys()))
         sample_pages[url] = structure_data_by_url[url]
     
-    # Calculate overall consistency score for this domain
-    scores = [
-        header_analysis.get('consistency_score', 0),
-        footer_analysis.get('consistency_score', 0),
-        navigation_analysis.get('consistency_score', 0),
-        main_content_analysis.get('consistency_score', 0) if main_content_analysis else 0,
-        complementary_analysis.get('consistency_score', 0) if complementary_analysis else 0
-    ]
-    # Filter out zero scores (components that might not be present)
-    scores = [score for score in scores if score > 0]
-    overall_score = sum(scores) / len(scores) if scores else 0
-    
     return {
         'domain': domain,
         'page_count': len(structure_data_by_url),
-        'header_analysis': header_analysis,
-        'footer_analysis': footer_analysis,
-        'secondary_headers': {
-            'count': secondary_headers_count,
-            'presence_ratio': secondary_headers_count / len(structure_data_by_url) if structure_data_by_url else 0
-        },
-        'secondary_footers': {
-            'count': secondary_footers_count,
-            'presence_ratio': secondary_footers_count / len(structure_data_by_url) if structure_data_by_url else 0
-        },
-        'navigation_analysis': navigation_analysis,
-        'main_content_analysis': main_content_analysis,
-        'complementary_analysis': complementary_analysis,
-        'component_presence': component_presence,
-        'recurring_elements': recurring_elements,
+        'header_analysis': component_analyses['header_analysis'],
+        'footer_analysis': component_analyses['footer_analysis'],
+        'secondary_headers': flag_analysis['secondary_headers'],
+        'secondary_footers': flag_analysis['secondary_footers'],
+        'navigation_analysis': component_analyses['navigation_analysis'],
+        'main_content_analysis': component_analyses['main_content_analysis'],
+        'complementary_analysis': component_analyses['complementary_analysis'],
+        'component_presence': flag_analysis['component_presence'],
+        'recurring_elements': flag_analysis['recurring_elements'],
         'forms_analysis': forms_analysis,
         'complexity_data': complexity_data,
         'interactive_elements': interactive_elements,
-        'content_blocks': {
-            'heroSections': sum(1 for data in structure_data_by_url.values() 
-                             if data.get('pageFlags', {}).get('hasHeroSection', False)),
-            'cardGrids': sum(1 for data in structure_data_by_url.values() 
-                          if data.get('pageFlags', {}).get('hasCardGrids', False)),
-            'featureSections': sum(1 for data in structure_data_by_url.values() 
-                                if data.get('pageFlags', {}).get('hasFeatureSections', False)),
-            'carousels': sum(1 for data in structure_data_by_url.values() 
-                          if data.get('pageFlags', {}).get('hasCarousels', False))
-        },
-        'repetitive_patterns': {
-            'found': sum(1 for data in structure_data_by_url.values() 
-                      if data.get('pageFlags', {}).get('hasRepetitivePatterns', False))
-        },
-        'overall_consistency_score': overall_score,
+        'content_blocks': flag_analysis['content_blocks'],
+        'repetitive_patterns': flag_analysis['repetitive_patterns'],
+        'overall_consistency_score': overall_consistency_score(component_analyses.values()),
         'sample_pages': sample_pages,
         'analysis_method': 'page_structure'
     }
@@ -757,24 +1264,38 @@ def calculate_overall_summary(domain_analyses):
         'total_domains': total_domains
     }
 
-def analyze_component_consistency(structure_data_by_url, component_extractor):
+def summarize_component(comp):
+    """What consistency analysis compares of a component: its tag, class names and children count"""
+    return {
+        'tag': comp.get('tag', '').lower(),
+        'classes': comp.get('className', '').lower().split() if comp.get('className') else [],
+        'children': len(comp.get('children', []))
+    }
+
+def component_statistics(components):
     """
-    Analyze consistency of a component (header, footer, navigation) across pages
-    
-    Args:
-        structure_data_by_url: Dictionary mapping URLs to structure data
-        component_extractor: Function that extracts the component from structure data
-        
+    Count the sufficient statistics of a component across the pages where it
+    was found: its tags, class names and children counts
+
     Returns:
-        Analysis results for the component
+        tuple: (tags, class_patterns, children_counts) Counters
     """
-    # Extract components from all pages
-    components = {url: component_extractor(data) for url, data in structure_data_by_url.items()}
-    
-    # Filter out pages where the component was not found
-    valid_components = {url: comp for url, comp in components.items() if comp}
-    
-    if not valid_components:
+    tags = Counter()
+    class_patterns = Counter()
+    children_counts = Counter()
+    for summary in map(summarize_component, components):
+        tags[summary['tag']] += 1
+        for cls in summary['classes']:
+            class_patterns[cls] += 1
+        children_counts[summary['children']] += 1
+    return tags, class_patterns, children_counts
+
+def consistency_from_statistics(page_count, pages_with_component, tags, class_patterns, children_counts):
+    """
+    Score the consistency of a component from its statistics, as counted by
+    component_statistics over the pages_with_component pages that have it
+    """
+    if not pages_with_component:
         return {
             'presence_ratio': 0.0,
             'consistency_score': 0.0,
@@ -784,47 +1305,58 @@ def analyze_component_consistency(structure_data_by_url, component_extractor):
                 'common_classes': [],
                 'typical_children_count': 0
             },
-            'page_count': len(structure_data_by_url),
+            'page_count': page_count,
             'pages_with_component': 0
         }
     
     # Analyze tag consistency
-    tags = Counter(comp.get('tag', '').lower() for comp in valid_components.values())
     most_common_tag = tags.most_common(1)[0] if tags else (None, 0)
     
     # Analyze class/id pattern consistency
-    class_patterns = Counter()
-    for comp in valid_components.values():
-        classes = comp.get('className', '').lower().split() if comp.get('className') else []
-        for cls in classes:
-            class_patterns[cls] += 1
-    
-    common_classes = [cls for cls, count in class_patterns.most_common(5) if count > len(valid_components) * 0.3]
+    common_classes = [cls for cls, count in class_patterns.most_common(5) if count > pages_with_component * 0.3]
     
     # Analyze structural consistency (children count, etc.)
-    children_counts = Counter(len(comp.get('children', [])) for comp in valid_components.values())
     most_common_children_count = children_counts.most_common(1)[0] if children_counts else (0, 0)
     
     # Calculate overall consistency score based on multiple factors
-    tag_consistency = most_common_tag[1] / len(valid_components) if len(valid_components) > 0 else 0
+    tag_consistency = most_common_tag[1] / pages_with_component
     class_consistency = len(common_classes) / 5  # Normalize to [0,1]
-    children_consistency = most_common_children_count[1] / len(valid_components) if len(valid_components) > 0 else 0
+    children_consistency = most_common_children_count[1] / pages_with_component
     
     consistency_score = (tag_consistency * 0.5) + (class_consistency * 0.3) + (children_consistency * 0.2)
     
     return {
-        'presence_ratio': len(valid_components) / len(structure_data_by_url),
+        'presence_ratio': pages_with_component / page_count,
         'consistency_score': consistency_score,
         'common_patterns': {
             'tag': most_common_tag[0],
-            'tag_frequency': most_common_tag[1] / len(valid_components) if len(valid_components) > 0 else 0,
+            'tag_frequency': most_common_tag[1] / pages_with_component,
             'common_classes': common_classes,
             'typical_children_count': most_common_children_count[0]
         },
-        'page_count': len(structure_data_by_url),
-        'pages_with_component': len(valid_components)
+        'page_count': page_count,
+        'pages_with_component': pages_with_component
     }
 
+def analyze_component_consistency(structure_data_by_url, component_extractor):
+    """
+    Analyze consistency of a component (header, footer, navigation) across pages
+    
+    Args:
+        structure_data_by_url: Dictionary mapping URLs to structure data
+        component_extractor: Function that extracts the component from structure data
+        
+    Returns:
+        Analysis results for the component
+    """
+    # Extract components from all pages, skipping pages where the component was not found
+    valid_components = [comp for comp in map(component_extractor, structure_data_by_url.values()) if comp]
+    
+    tags, class_patterns, children_counts = component_statistics(valid_components)
+    return consistency_from_statistics(
+        len(structure_data_by_url), len(valid_components), tags, class_patterns, children_counts
+    )
+
 def print_analysis_summary(analysis):
     """Print a summary of the structure analysis"""
     print("\n=== STRUCTURE ANALYSIS SUMMARY ===")
@@ -0,0 +1,464 @@
+"""
+Asyncio MongoDB backend for the crawler.
+
+AccessibilityDB talks to Mongo with blocking pymongo calls, so every
+save_page_result stalls the event loop and with it every concurrently tested
+page. AsyncAccessibilityDB offers the same methods as coroutines on top of
+motor, which keeps a pool of connections and awaits Mongo without blocking
+the loop. Code that works with either backend awaits results through
+maybe_await.
+"""
+import asyncio
+import inspect
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# motor is only needed when the async backend is selected
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+# Handle import errors gracefully - allows both package and direct imports
+try:
+    from src.test_with_mongo.database import DEFAULT_DB_NAME
+    from src.test_with_mongo.result_export import ResultExportWriter, DEFAULT_EXPORT_BATCH_SIZE
+    from src.test_with_mongo.violations_export import ViolationsParquetWriter
+    from src.test_with_mongo.result_storage import (
+        TEST_RUNS_COLLECTION, PAGE_RESULTS_COLLECTION, TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, INDEXES,
+        is_split, part_filter, page_filter, parts_query, group_parts, page_result_writes, blob_writes,
+        collect_batch_refs, assemble_batch, assemble_page_result, blob_refs, blob_parts, part_digests,
+        blob_test_result, reusable_result_query, test_run_document, reopen_update, completion_update,
+        finished_urls_query, page_timings_query, result_summary_pipeline, stored_result_summary
+    )
+except ImportError:
+    from database import DEFAULT_DB_NAME
+    from result_export import ResultExportWriter, DEFAULT_EXPORT_BATCH_SIZE
+    from violations_export import ViolationsParquetWriter
+    from result_storage import (
+        TEST_RUNS_COLLECTION, PAGE_RESULTS_COLLECTION, TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, INDEXES,
+        is_split, part_filter, page_filter, parts_query, group_parts, page_result_writes, blob_writes,
+        collect_batch_refs, assemble_batch, assemble_page_result, blob_refs, blob_parts, part_digests,
+        blob_test_result, reusable_result_query, test_run_document, reopen_update, completion_update,
+        finished_urls_query, page_timings_query, result_summary_pipeline, stored_result_summary
+    )
+
+DEFAULT_MAX_POOL_SIZE = 20
+
+
+async def maybe_await(value):
+    """Return a database call's result, awaiting it if the backend is async"""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def maybe_aiter(results):
+    """Iterate a database call's results, whether the backend yields them synchronously or asynchronously"""
+    if hasattr(results, '__aiter__'):
+        async for result in results:
+            yield result
+    else:
+        for result in results:
+            yield result
+
+
+def _write_pages(write_page, page_results):
+    # Runs in an executor thread: hand a batch of page results to a blocking writer
+    for result in page_results:
+        write_page(result['url'], result['results'])
+
+
+class AsyncAccessibilityDB:
+    """
+    Asyncio counterpart of AccessibilityDB.
+
+    Usage:
+        db = await AsyncAccessibilityDB.connect(db_name='accessibility_tests')
+        test_run_id = await db.start_new_test_run(settings)
+        await db.save_page_result(test_run_id, url, page_result)
+        await db.complete_test_run(test_run_id)
+        db.close()
+    """
+
+    def __init__(self, db_name=None, max_pool_size=DEFAULT_MAX_POOL_SIZE, split_results=False,
+                 dedup_results=False):
+        """
+        Create the client without any I/O; use connect() to also verify the
+        server and create the indexes.
+
+        Args:
+            db_name: Name of the database to use
+            max_pool_size: Maximum number of pooled connections to Mongo
+            split_results: Store each test's result as its own document in
+                test_results instead of nesting all of them in page_results
+            dedup_results: Store each distinct test result once in
+                result_blobs, referenced from page_results by its hash
+        """
+        self.split_results = split_results
+        self.dedup_results = dedup_results
+        # Hashes known to be stored already, so repeat results are not resent
+        self._known_blobs = set()
+        if AsyncIOMotorClient is None:
+            raise ImportError("The async database backend requires motor (pip install motor)")
+
+        if db_name is None:
+            db_name = DEFAULT_DB_NAME
+            print(f"Warning: No database name specified. Using default database '{DEFAULT_DB_NAME}'.")
+
+        self.client = AsyncIOMotorClient('mongodb://localhost:27017/',
+                                         serverSelectionTimeoutMS=5000,
+                                         maxPoolSize=max_pool_size)
+        self.db_name = db_name
+        self.db = self.client[db_name]
+
+        # Separate collections for test runs and page results
+        self.test_runs = self.db[TEST_RUNS_COLLECTION]
+        self.page_results = self.db[PAGE_RESULTS_COLLECTION]
+        self.test_results = self.db[TEST_RESULTS_COLLECTION]
+        self.result_blobs = self.db[RESULT_BLOBS_COLLECTION]
+
+    @classmethod
+    async def connect(cls, db_name=None, create_if_not_exists=False, max_pool_size=DEFAULT_MAX_POOL_SIZE,
+                      split_results=False, dedup_results=False):
+        """
+        Connect to Mongo, check the database exists and create the indexes
+
+        If the database does not exist and create_if_not_exists is False the
+        user is asked whether to create it. The prompt is read in an executor
+        thread, so the event loop keeps running while it waits.
+
+        Returns:
+            AsyncAccessibilityDB: The connected database
+        """
+        db = cls(db_name=db_name, max_pool_size=max_pool_size, split_results=split_results,
+                 dedup_results=dedup_results)
+        try:
+            await db.client.server_info()
+
+            # Check if database exists or needs to be created
+            db_names = await db.client.list_database_names()
+            db_exists = db.db_name in db_names or db.db_name in ['admin', 'config', 'local']
+
+            if not db_exists and not create_if_not_exists:
+                # Database doesn't exist and auto-creation is not enabled
+                response = await asyncio.get_event_loop().run_in_executor(
+                    None, input, f"Database '{db.db_name}' does not exist. Create it? (y/n): "
+                )
+                if response.lower() != 'y':
+                    raise ValueError(f"Database '{db.db_name}' does not exist and was not created.")
+
+            await db._create_indexes()
+            print(f"Connected to database: '{db.db_name}' (async)")
+        except Exception as e:
+            print(f"Failed to connect to MongoDB: {e}")
+            db.close()
+            raise
+        return db
+
+    async def _create_indexes(self):
+        for collection, keys, options in INDEXES:
+            await self.db[collection].create_index(keys, **options)
+
+    async def start_new_test_run(self, settings, documentation=None):
+        """
+        Create a new test run and return its ID
+
+        Args:
+            settings: Dictionary of test run settings
+            documentation: Optional dictionary of test documentation objects
+
+        Returns:
+            str: The ID of the created test run
+        """
+        if documentation:
+            print(f"Including documentation for {len(documentation)} test types in test run")
+
+        result = await self.test_runs.insert_one(test_run_document(settings, documentation))
+        return str(result.inserted_id)
+
+    async def reopen_test_run(self, test_run_id, settings=None):
+        """
+        Reopen an existing test run so it can be resumed
+
+        Args:
+            test_run_id: The ID of the test run to reopen
+            settings: Optional settings of the resumed invocation, recorded in the resume history
+
+        Returns:
+            str: The ID of the reopened test run
+        """
+        result = await self.test_runs.update_one({'_id': ObjectId(test_run_id)}, reopen_update(settings))
+        if result.matched_count == 0:
+            raise ValueError(f"Test run '{test_run_id}' does not exist in database '{self.db_name}'.")
+
+        print(f"Reopened test run {test_run_id}")
+        return test_run_id
+
+    async def get_finished_urls(self, test_run_id, statuses=('completed',)):
+        """Get the URLs of a test run whose page results reached one of the given statuses"""
+        try:
+            cursor = self.page_results.find(finished_urls_query(test_run_id, statuses), {'_id': 0, 'url': 1})
+            return {doc['url'] async for doc in cursor}
+        except Exception as e:
+            print(f"Error getting finished URLs: {e}")
+            return set()
+
+    async def get_page_timings(self, test_run_id):
+        """Get the timings subdocument of every page of a test run"""
+        try:
+            cursor = self.page_results.find(page_timings_query(test_run_id), {'_id': 0, 'results.timings': 1})
+            return [doc['results']['timings'] async for doc in cursor]
+        except Exception as e:
+            print(f"Error getting page timings: {e}")
+            return []
+
+    async def get_reusable_page_result(self, url, fingerprint, exclude_test_run_id=None, tests=None):
+        """
+        Find the latest completed result of a URL from another test run whose
+        page had the same DOM/CSS fingerprint and that ran every test in
+        `tests`; results stored without their test list are not reused
+
+        Returns:
+            tuple: (test_run_id, page_result) of the earlier result, or None
+        """
+        try:
+            previous = await self.page_results.find_one(
+                reusable_result_query(url, fingerprint, exclude_test_run_id, tests),
+                {'_id': 0, 'test_run_id': 1}, sort=[('timestamp', -1)]
+            )
+            if not previous:
+                return None
+            page_result = await self.get_page_result(previous['test_run_id'], url)
+            return (previous['test_run_id'], page_result) if page_result else None
+        except Exception as e:
+            print(f"Error looking up earlier result for URL {url}: {e}")
+            return None
+
+    async def _unstored_blobs(self, blobs):
+        """The blobs whose hashes are not in result_blobs yet"""
+        unknown = [digest for digest in blobs if digest not in self._known_blobs]
+        if unknown:
+            async for doc in self.result_blobs.find({'_id': {'$in': unknown}}, {'_id': 1}):
+                self._known_blobs.add(doc['_id'])
+        return {digest: blobs[digest] for digest in unknown if digest not in self._known_blobs}
+
+    async def save_page_result(self, test_run_id, url, page_result):
+        """Save individual page result"""
+        try:
+            blobs, writes = page_result_writes(test_run_id, url, page_result, self.split_results,
+                                               self.dedup_results)
+
+            new_blobs = await self._unstored_blobs(blobs)
+            if new_blobs:
+                await self._bulk_upsert(blob_writes(new_blobs))
+                self._known_blobs.update(new_blobs)
+
+            *part_writes, (_, query, update) = writes
+            if part_writes:
+                await self._bulk_upsert(part_writes)
+
+            return await self.page_results.update_one(query, update, upsert=True)
+        except Exception as e:
+            print(f"Error saving page result: {e}")
+            return None
+
+    async def _bulk_upsert(self, writes):
+        """Send (collection, query, update) upserts of one collection with a single bulk_write"""
+        collection = writes[0][0]
+        return await self.db[collection].bulk_write(
+            [UpdateOne(query, update, upsert=True) for _, query, update in writes],
+            ordered=False
+        )
+
+    async def complete_test_run(self, test_run_id, summary=None):
+        """Mark a test run as complete and add summary data"""
+        try:
+            await self.test_runs.update_one({'_id': ObjectId(test_run_id)}, completion_update(summary))
+        except Exception as e:
+            print(f"Error completing test run: {e}")
+
+    async def _load_parts(self, test_run_id, url=None, test_names=None, urls=None):
+        """Load split test results of a run, grouped by URL"""
+        cursor = self.test_results.find(parts_query(test_run_id, url, test_names, urls), {'_id': 0, 'timestamp': 0})
+        return group_parts([part async for part in cursor])
+
+    async def _load_blobs(self, hashes):
+        """Load deduplicated results by hash"""
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        return {doc['_id']: doc['result'] async for doc in self.result_blobs.find({'_id': {'$in': hashes}})}
+
+    async def _assemble_batch(self, test_run_id, page_results):
+        """Nest split or deduplicated test results back into a batch of page results"""
+        part_urls, digests = collect_batch_refs(page_results)
+        parts = await self._load_parts(test_run_id, urls=part_urls) if part_urls else {}
+        return assemble_batch(page_results, parts, await self._load_blobs(digests))
+
+    async def _iter_page_batches(self, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """Yield the assembled page results of a test run in batches of batch_size"""
+        cursor = self.page_results.find({'test_run_id': test_run_id}, {'_id': 0}).batch_size(batch_size)
+        batch = []
+        async for result in cursor:
+            batch.append(result)
+            if len(batch) >= batch_size:
+                yield await self._assemble_batch(test_run_id, batch)
+                batch = []
+        if batch:
+            yield await self._assemble_batch(test_run_id, batch)
+
+    async def iter_page_results(self, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Yield the page results of a test run, reading them from the cursor
+        batch_size at a time so memory use stays constant
+        """
+        async for batch in self._iter_page_batches(test_run_id, batch_size):
+            for page_result in batch:
+                yield page_result
+
+    async def iter_result_summaries(self, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Yield a small summary of each page result of a test run (status, test
+        names, breakpoint counts, consolidated summary), projected on the
+        server and read from the cursor batch_size at a time
+        """
+        cursor = self.page_results.aggregate(result_summary_pipeline(test_run_id), batchSize=batch_size)
+        async for summary in cursor:
+            yield stored_result_summary(summary)
+
+    async def get_page_results(self, test_run_id):
+        """Get all page results for a specific test run"""
+        try:
+            return [result async for result in self.iter_page_results(test_run_id)]
+        except Exception as e:
+            print(f"Error getting page results: {e}")
+            return []
+
+    async def get_page_result(self, test_run_id, url, tests=None):
+        """
+        Get a specific page result by test_run_id and URL
+
+        Args:
+            test_run_id: The ID of the test run
+            url: The page URL
+            tests: Optional test names to load when the result is stored split;
+                only those parts are fetched and nested back in. None loads all.
+        """
+        try:
+            result = await self.page_results.find_one(page_filter(test_run_id, url), {'_id': 0})
+            if result:
+                page_result = result.get('results', {})
+                if is_split(page_result):
+                    refs = blob_refs(page_result, tests)
+                    if refs:
+                        blobs = await self._load_blobs(digest for _, _, digest in refs)
+                        parts = blob_parts(page_result, blobs, tests)
+                    else:
+                        parts = (await self._load_parts(test_run_id, url, tests)).get(url, [])
+                    page_result = assemble_page_result(page_result, parts)
+                return page_result
+            return None
+        except Exception as e:
+            print(f"Error getting page result for URL {url}: {e}")
+            return None
+
+    async def get_test_result(self, test_run_id, url, test_name, breakpoint=None):
+        """Get a single test's result for a page stored with split_results or dedup_results"""
+        try:
+            breakpoint = None if breakpoint is None else str(breakpoint)
+            part = await self.test_results.find_one(
+                part_filter(test_run_id, url, test_name, breakpoint),
+                {'_id': 0, 'result': 1}
+            )
+            if part:
+                return part['result']
+
+            envelope = await self.page_results.find_one(
+                page_filter(test_run_id, url),
+                {'_id': 0, 'results.accessibility.split_tests': 1}
+            )
+            envelope = (envelope or {}).get('results')
+            digests = part_digests(envelope, test_name, breakpoint)
+            if digests:
+                return blob_test_result(envelope, await self._load_blobs(digests[:1]), test_name, breakpoint)
+            return None
+        except Exception as e:
+            print(f"Error getting {test_name} result for URL {url}: {e}")
+            return None
+
+    async def get_all_test_runs(self):
+        """Get all test runs"""
+        try:
+            return await self.test_runs.find().sort("timestamp_start", -1).to_list(length=None)
+        except Exception as e:
+            print(f"Error getting test runs: {e}")
+            return []
+
+    async def get_latest_test_run(self):
+        """Get the most recent test run"""
+        try:
+            return await self.test_runs.find_one({}, sort=[("timestamp_start", -1)])
+        except Exception as e:
+            print(f"Error getting latest test run: {e}")
+            return None
+
+    async def export_to_json(self, filename, test_run_id, export_format=None, compression=None,
+                             batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Export results for a specific test run to JSON file, streaming the
+        pages; the file is opened, written and compressed in an executor
+        thread, a batch at a time, so the event loop is not blocked
+        """
+        try:
+            test_run = await self.test_runs.find_one(
+                {'_id': ObjectId(test_run_id)},
+                {'_id': 0}
+            )
+
+            loop = asyncio.get_event_loop()
+            writer = await loop.run_in_executor(None, ResultExportWriter, filename, export_format, compression)
+            try:
+                await loop.run_in_executor(None, writer.write_test_run, test_run)
+                async for batch in self._iter_page_batches(test_run_id, batch_size):
+                    await loop.run_in_executor(None, _write_pages, writer.write_page, batch)
+            finally:
+                await loop.run_in_executor(None, writer.close)
+        except Exception as e:
+            print(f"Error exporting to JSON: {e}")
+
+    async def export_violations(self, output_dir, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Export the violations of a test run as Parquet files partitioned by
+        test; the rows are flattened and written in an executor thread
+        """
+        try:
+            test_run = await self.test_runs.find_one({'_id': ObjectId(test_run_id)}, {'documentation': 1}) or {}
+            loop = asyncio.get_event_loop()
+            writer = ViolationsParquetWriter(output_dir, test_run_id, test_run.get('documentation'))
+            try:
+                async for batch in self._iter_page_batches(test_run_id, batch_size):
+                    await loop.run_in_executor(None, _write_pages, writer.add_page, batch)
+            finally:
+                await loop.run_in_executor(None, writer.close)
+            return writer.rows_written
+        except Exception as e:
+            print(f"Error exporting violations: {e}")
+            return 0
+
+    async def clear_database(self):
+        """Clear all collections in the specific database"""
+        try:
+            await self.test_runs.drop()
+            await self.page_results.drop()
+            await self.test_results.drop()
+            await self.result_blobs.drop()
+            self._known_blobs.clear()
+            await self._create_indexes()
+            print(f"Database '{self.db_name}' cleared successfully")
+        except Exception as e:
+            print(f"Error clearing database '{self.db_name}': {e}")
+
+    def close(self):
+        """Close the client and its connection pool"""
+        self.client.close()
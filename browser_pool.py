@@ -0,0 +1,306 @@
+"""
+Pool of warm Chromium instances shared across page tests.
+
+Launching and tearing down a browser for every URL costs more than some of
+the test suites themselves, so process_urls leases pages from this pool
+instead. Each browser is recycled after a configurable number of pages or
+once its process tree grows past a memory threshold, and browsers that
+crash or disconnect are replaced transparently on the next lease.
+
+A browser can also serve several leases at once when each lease runs in its
+own incognito browser context, which is how concurrent workers share a small
+number of browsers without seeing each other's page state.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from pyppeteer import launch
+
+# psutil is only needed for the memory-based recycling threshold
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_PAGES_PER_BROWSER = 50
+DEFAULT_CLOSE_TIMEOUT = 30.0
+
+# Queued in place of a browser whose replacement could not be launched; the
+# lease that takes it tries the launch again
+_RELAUNCH = object()
+# Queued by close() once for every lease still waiting for a browser
+_CLOSED = object()
+
+
+class PooledBrowser:
+    """A launched browser together with its usage bookkeeping"""
+
+    def __init__(self, browser, browser_id):
+        self.browser = browser
+        self.browser_id = browser_id
+        self.pages_served = 0
+        self.active_leases = 0
+        self.disconnected = False
+        self.retiring = None
+        self.retired_slots = 0
+        browser.on('disconnected', self._on_disconnected)
+
+    def _on_disconnected(self, *args):
+        self.disconnected = True
+
+    def is_alive(self):
+        """Check whether the browser process is still running and connected"""
+        if self.disconnected:
+            return False
+        process = getattr(self.browser, 'process', None)
+        if process is not None and process.poll() is not None:
+            return False
+        return True
+
+    def memory_mb(self):
+        """
+        Resident memory of the browser process and its renderers in MB
+
+        Returns:
+            float: Memory usage, or None if it cannot be measured
+        """
+        process = getattr(self.browser, 'process', None)
+        if psutil is None or process is None:
+            return None
+        try:
+            root = psutil.Process(process.pid)
+            total = root.memory_info().rss
+            for child in root.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of warm browsers and hands out pages from them.
+
+    Usage:
+        pool = BrowserPool(launch_options, size=2)
+        await pool.start()
+        async with pool.page() as page:
+            await page.goto(url)
+        await pool.close()
+    """
+
+    def __init__(self, launch_options, size=DEFAULT_POOL_SIZE,
+                 max_pages_per_browser=DEFAULT_PAGES_PER_BROWSER, max_memory_mb=None,
+                 leases_per_browser=1):
+        """
+        Args:
+            launch_options: Options passed to pyppeteer.launch for every browser
+            size: Number of browsers to keep warm
+            max_pages_per_browser: Recycle a browser after serving this many pages
+                (None or 0 disables page-count recycling)
+            max_memory_mb: Recycle a browser once its process tree exceeds this
+                many MB of resident memory (requires psutil)
+            leases_per_browser: Number of pages a single browser may serve at the
+                same time; use incognito leases when this is greater than 1
+        """
+        self.launch_options = launch_options
+        self.size = max(1, int(size or DEFAULT_POOL_SIZE))
+        self.leases_per_browser = max(1, int(leases_per_browser or 1))
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_memory_mb = max_memory_mb
+        self._idle = asyncio.Queue()
+        self._browsers = []
+        self._next_id = 1
+        self._closed = False
+        self._all_released = asyncio.Event()
+        self._waiting = 0
+        self.stats = {
+            'launched': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'pages_served': 0
+        }
+
+        if max_memory_mb and psutil is None:
+            print("Warning: psutil is not installed; browser memory threshold will be ignored")
+
+    async def start(self):
+        """Launch the initial set of warm browsers"""
+        print(f"Starting browser pool with {self.size} browser(s), "
+              f"{self.leases_per_browser} lease(s) per browser")
+        for _ in range(self.size):
+            pooled = await self._launch_browser()
+            self._add_slots(pooled)
+
+    def _add_slots(self, pooled):
+        for _ in range(self.leases_per_browser):
+            self._idle.put_nowait(pooled)
+
+    async def _launch_browser(self):
+        browser = await launch(self.launch_options)
+        pooled = PooledBrowser(browser, self._next_id)
+        self._next_id += 1
+        self._browsers.append(pooled)
+        self.stats['launched'] += 1
+        return pooled
+
+    async def _close_browser(self, pooled):
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await asyncio.wait_for(pooled.browser.close(), timeout=10.0)
+        except Exception as e:
+            print(f"Warning: Error closing browser {pooled.browser_id}: {str(e)}")
+
+    def _needs_recycling(self, pooled):
+        if self.max_pages_per_browser and pooled.pages_served >= self.max_pages_per_browser:
+            return f"served {pooled.pages_served} pages"
+        if self.max_memory_mb:
+            memory = pooled.memory_mb()
+            if memory is not None and memory >= self.max_memory_mb:
+                return f"using {memory:.0f}MB"
+        return None
+
+    def _mark_retiring(self, pooled):
+        """Flag a browser for replacement once all of its leases are returned"""
+        if pooled.retiring:
+            return
+        if not pooled.is_alive():
+            pooled.retiring = 'crashed'
+            self.stats['crashed'] += 1
+            return
+        reason = self._needs_recycling(pooled)
+        if reason:
+            pooled.retiring = reason
+            self.stats['recycled'] += 1
+
+    async def _retire_slot(self, pooled):
+        """
+        Take one slot of a retiring browser out of circulation. When the last
+        slot comes back the browser is closed and a fresh one takes its place.
+        """
+        pooled.retired_slots += 1
+        if pooled.retired_slots < self.leases_per_browser:
+            return
+
+        print(f"Replacing browser {pooled.browser_id} ({pooled.retiring})")
+        await self._close_browser(pooled)
+        await self._launch_replacement()
+
+    async def _launch_replacement(self):
+        """
+        Launch a browser to take the place of a closed one. If the launch
+        fails the closed browser is dropped for good and a relaunch marker is
+        queued instead, so the next lease retries the launch.
+        """
+        try:
+            replacement = await self._launch_browser()
+        except Exception:
+            self._idle.put_nowait(_RELAUNCH)
+            raise
+        self._add_slots(replacement)
+
+    async def _acquire_browser(self):
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            self._waiting += 1
+            try:
+                pooled = await self._idle.get()
+            finally:
+                self._waiting -= 1
+            if pooled is _CLOSED or self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if pooled is _RELAUNCH:
+                await self._launch_replacement()
+                continue
+            if not pooled.retiring and not pooled.is_alive():
+                self._mark_retiring(pooled)
+            if pooled.retiring:
+                await self._retire_slot(pooled)
+                continue
+            pooled.active_leases += 1
+            return pooled
+
+    async def _release_browser(self, pooled):
+        pooled.active_leases -= 1
+        if self._closed:
+            if pooled.active_leases == 0:
+                await self._close_browser(pooled)
+                if not any(browser.active_leases for browser in self._browsers):
+                    self._all_released.set()
+            return
+
+        self._mark_retiring(pooled)
+        if pooled.retiring:
+            try:
+                await self._retire_slot(pooled)
+            except Exception as e:
+                print(f"Warning: Could not replace browser: {str(e)}")
+        else:
+            self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def page(self, incognito=False):
+        """
+        Lease a fresh page from a warm browser.
+
+        Args:
+            incognito: Open the page in its own incognito browser context so
+                cookies, storage and cache are not shared with other leases
+
+        The page (and its context) is closed and the browser returned to the
+        pool, or recycled, when the context manager exits.
+        """
+        pooled = await self._acquire_browser()
+        context = None
+        page = None
+        try:
+            if incognito:
+                context = await pooled.browser.createIncognitoBrowserContext()
+                page = await context.newPage()
+            else:
+                page = await pooled.browser.newPage()
+            pooled.pages_served += 1
+            self.stats['pages_served'] += 1
+            yield page
+        finally:
+            try:
+                if context is not None:
+                    await asyncio.wait_for(context.close(), timeout=5.0)
+                elif page is not None:
+                    await asyncio.wait_for(page.close(), timeout=5.0)
+            except asyncio.TimeoutError:
+                print("Warning: Page close operation timed out")
+            except Exception as e:
+                print(f"Warning: Error closing page: {str(e)}")
+            await self._release_browser(pooled)
+
+    async def close(self, timeout=DEFAULT_CLOSE_TIMEOUT):
+        """
+        Close every browser in the pool
+
+        Browsers with pages still leased are closed as their last lease is
+        returned. Those still leased after timeout seconds are closed anyway.
+        Leases waiting for a browser fail with RuntimeError.
+        """
+        self._closed = True
+        for _ in range(self._waiting):
+            self._idle.put_nowait(_CLOSED)
+        for pooled in list(self._browsers):
+            if pooled.active_leases == 0:
+                await self._close_browser(pooled)
+        if any(pooled.active_leases for pooled in self._browsers):
+            try:
+                await asyncio.wait_for(self._all_released.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                leased = sum(pooled.active_leases for pooled in self._browsers)
+                print(f"Warning: Closing browser pool with {leased} page(s) still leased")
+        for pooled in list(self._browsers):
+            await self._close_browser(pooled)
+        print(f"Browser pool closed: {self.stats['launched']} launched, "
+              f"{self.stats['recycled']} recycled, {self.stats['crashed']} crashed, "
+              f"{self.stats['pages_served']} pages served")
@@ -1,12 +1,63 @@
-from pymongo import MongoClient
-from datetime import datetime
-import json
+from pymongo import MongoClient, UpdateOne
+import threading
+import bson
 from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+# Handle import errors gracefully - allows both package and direct imports
+try:
+    from src.test_with_mongo.result_export import ResultExportWriter, DEFAULT_EXPORT_BATCH_SIZE
+    from src.test_with_mongo.violations_export import ViolationsParquetWriter
+    from src.test_with_mongo.result_storage import (
+        TEST_RUNS_COLLECTION, PAGE_RESULTS_COLLECTION, TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, INDEXES,
+        is_split, part_filter, page_filter, parts_query, group_parts, page_result_writes, blob_writes,
+        collect_batch_refs, assemble_batch, assemble_page_result, blob_refs, blob_parts, part_digests,
+        blob_test_result, reusable_result_query, test_run_document, reopen_update, completion_update,
+        finished_urls_query, page_timings_query, result_summary_pipeline, stored_result_summary
+    )
+except ImportError:
+    from result_export import ResultExportWriter, DEFAULT_EXPORT_BATCH_SIZE
+    from violations_export import ViolationsParquetWriter
+    from result_storage import (
+        TEST_RUNS_COLLECTION, PAGE_RESULTS_COLLECTION, TEST_RESULTS_COLLECTION, RESULT_BLOBS_COLLECTION, INDEXES,
+        is_split, part_filter, page_filter, parts_query, group_parts, page_result_writes, blob_writes,
+        collect_batch_refs, assemble_batch, assemble_page_result, blob_refs, blob_parts, part_digests,
+        blob_test_result, reusable_result_query, test_run_document, reopen_update, completion_update,
+        finished_urls_query, page_timings_query, result_summary_pipeline, stored_result_summary
+    )
 
 DEFAULT_DB_NAME = 'accessibility_tests'
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 2.0
 
 class AccessibilityDB:
-    def __init__(self, db_name=None, create_if_not_exists=False):
+    def __init__(self, db_name=None, create_if_not_exists=False, write_buffer_size=0,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, split_results=False, dedup_results=False):
+        """
+        Args:
+            db_name: Name of the database to use
+            create_if_not_exists: Create the database without prompting
+            write_buffer_size: When greater than 0, page results are buffered
+                and written with bulk_write from a background thread once this
+                many are pending or flush_interval seconds have passed
+            flush_interval: Maximum seconds a buffered page result waits
+            split_results: Store each test's result as its own document in
+                test_results instead of nesting all of them in page_results
+            dedup_results: Store each distinct test result once in
+                result_blobs, referenced from page_results by its hash
+        """
+        self.split_results = split_results
+        self.dedup_results = dedup_results
+        # Hashes known to be stored already, so repeat results are not resent
+        self._known_blobs = set()
+        self._pending_writes = {}
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_wanted = threading.Event()
+        self._closed = threading.Event()
+        self._flush_thread = None
+        self.write_buffer_size = max(0, int(write_buffer_size or 0))
+        self.flush_interval = flush_interval or DEFAULT_FLUSH_INTERVAL
         try:
             self.client = MongoClient('mongodb://localhost:27017/',
                                     serverSelectionTimeoutMS=5000)
@@ -31,19 +82,75 @@ class AccessibilityDB:
             self.db = self.client[db_name]
             
             # Separate collections for test runs and page results
-            self.test_runs = self.db['test_runs']
-            self.page_results = self.db['page_results']
+            self.test_runs = self.db[TEST_RUNS_COLLECTION]
+            self.page_results = self.db[PAGE_RESULTS_COLLECTION]
+            self.test_results = self.db[TEST_RESULTS_COLLECTION]
+            self.result_blobs = self.db[RESULT_BLOBS_COLLECTION]
             
             # Create indexes
-            self.page_results.create_index([('url', 1), ('test_run_id', 1)])
-            self.page_results.create_index('timestamp')
-            self.test_runs.create_index('timestamp')
+            self._create_indexes()
             
             print(f"Connected to database: '{db_name}'")
         except Exception as e:
             print(f"Failed to connect to MongoDB: {e}")
             raise
 
+        if self.write_buffer_size:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='a11y-db-flush', daemon=True)
+            self._flush_thread.start()
+            print(f"Buffering page results: flushing every {self.write_buffer_size} writes "
+                  f"or {self.flush_interval}s")
+
+    def _create_indexes(self):
+        for collection, keys, options in INDEXES:
+            self.db[collection].create_index(keys, **options)
+
+    def _flush_loop(self):
+        """Background thread that writes buffered page results"""
+        while not self._closed.is_set():
+            self._flush_wanted.wait(self.flush_interval)
+            self._flush_wanted.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered page results with a single bulk_write.
+        Safe to call from any thread; a no-op when nothing is buffered.
+        """
+        # Holding the flush lock across the swap and the write keeps batches
+        # in order, so an older result never overwrites a newer one
+        with self._flush_lock:
+            with self._buffer_lock:
+                pending = self._pending_writes
+                self._pending_writes = {}
+            if not pending:
+                return
+
+            by_collection = {}
+            for (collection, _), (query, update) in pending.items():
+                by_collection.setdefault(collection, []).append(UpdateOne(query, update, upsert=True))
+            try:
+                # Test parts and blobs first, so an envelope never lists parts that are not stored yet
+                for collection in sorted(by_collection, key=lambda name: name == PAGE_RESULTS_COLLECTION):
+                    self.db[collection].bulk_write(by_collection[collection], ordered=False)
+            except Exception as e:
+                print(f"Error flushing {len(pending)} buffered writes: {e}")
+                # Put them back for the next flush unless a newer result arrived meanwhile
+                with self._buffer_lock:
+                    for key, value in pending.items():
+                        self._pending_writes.setdefault(key, value)
+
+    def close(self):
+        """Flush buffered writes, stop the flush thread and close the client"""
+        if self._flush_thread is not None:
+            self._closed.set()
+            self._flush_wanted.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+        if hasattr(self, 'client'):
+            self.client.close()
+
     def start_new_test_run(self, settings, documentation=None):
         """
         Create a new test run and return its ID
@@ -55,88 +162,254 @@ class AccessibilityDB:
         Returns:
             str: The ID of the created test run
         """
-        test_run = {
-            'timestamp_start': datetime.now().isoformat(),
-            'status': 'in_progress',
-            'settings': settings
-        }
-        
-        # Add documentation if provided
         if documentation:
-            test_run['documentation'] = documentation
             print(f"Including documentation for {len(documentation)} test types in test run")
         
-        result = self.test_runs.insert_one(test_run)
+        result = self.test_runs.insert_one(test_run_document(settings, documentation))
         return str(result.inserted_id)
 
+    def reopen_test_run(self, test_run_id, settings=None):
+        """
+        Reopen an existing test run so it can be resumed
+        
+        Args:
+            test_run_id: The ID of the test run to reopen
+            settings: Optional settings of the resumed invocation, recorded in the resume history
+        
+        Returns:
+            str: The ID of the reopened test run
+        """
+        result = self.test_runs.update_one({'_id': ObjectId(test_run_id)}, reopen_update(settings))
+        if result.matched_count == 0:
+            raise ValueError(f"Test run '{test_run_id}' does not exist in database '{self.db_name}'.")
+        
+        print(f"Reopened test run {test_run_id}")
+        return test_run_id
+
+    def get_finished_urls(self, test_run_id, statuses=('completed',)):
+        """
+        Get the URLs of a test run whose page results reached one of the given statuses.
+        Uses the (test_run_id, results.status, url) index so only URLs cross the wire.
+        """
+        self.flush()
+        try:
+            cursor = self.page_results.find(finished_urls_query(test_run_id, statuses), {'_id': 0, 'url': 1})
+            return {doc['url'] for doc in cursor}
+        except Exception as e:
+            print(f"Error getting finished URLs: {e}")
+            return set()
+
+    def get_page_timings(self, test_run_id):
+        """
+        Get the timings subdocument of every page of a test run, projected so
+        only the timings cross the wire
+        """
+        self.flush()
+        try:
+            cursor = self.page_results.find(page_timings_query(test_run_id), {'_id': 0, 'results.timings': 1})
+            return [doc['results']['timings'] for doc in cursor]
+        except Exception as e:
+            print(f"Error getting page timings: {e}")
+            return []
+
+    def _unstored_blobs(self, blobs):
+        """The blobs whose hashes are not in result_blobs yet"""
+        unknown = [digest for digest in blobs if digest not in self._known_blobs]
+        if unknown:
+            for doc in self.result_blobs.find({'_id': {'$in': unknown}}, {'_id': 1}):
+                self._known_blobs.add(doc['_id'])
+        return {digest: blobs[digest] for digest in unknown if digest not in self._known_blobs}
+
+    def get_reusable_page_result(self, url, fingerprint, exclude_test_run_id=None, tests=None):
+        """
+        Find the latest completed result of a URL from another test run whose
+        page had the same DOM/CSS fingerprint and that ran every test in
+        `tests`; results stored without their test list are not reused
+
+        Returns:
+            tuple: (test_run_id, page_result) of the earlier result, or None
+        """
+        try:
+            previous = self.page_results.find_one(
+                reusable_result_query(url, fingerprint, exclude_test_run_id, tests),
+                {'_id': 0, 'test_run_id': 1}, sort=[('timestamp', -1)]
+            )
+            if not previous:
+                return None
+            page_result = self.get_page_result(previous['test_run_id'], url)
+            return (previous['test_run_id'], page_result) if page_result else None
+        except Exception as e:
+            print(f"Error looking up earlier result for URL {url}: {e}")
+            return None
+
     def save_page_result(self, test_run_id, url, page_result):
-        """Save individual page result"""
+        """
+        Save individual page result. With a write buffer the result is queued
+        and written later by the flush thread; a newer result for the same URL
+        replaces a queued one. With split_results each test's result is
+        written to test_results and page_results only keeps the envelope;
+        with dedup_results the envelope references results in result_blobs.
+        """
         try:
-            # Prepare the document
-            document = {
-                'test_run_id': test_run_id,
-                'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'results': page_result
-            }
+            blobs, writes = page_result_writes(test_run_id, url, page_result, self.split_results,
+                                               self.dedup_results)
+
+            if self.write_buffer_size:
+                # Encode now so later changes to page_result do not leak into the queued write
+                with self._buffer_lock:
+                    new_blobs = {digest: result for digest, result in blobs.items() if digest not in self._known_blobs}
+                    self._known_blobs.update(new_blobs)
+                    for collection, query, update in blob_writes(new_blobs) + writes:
+                        self._pending_writes[(collection, tuple(query.values()))] = (
+                            query, {operator: RawBSONDocument(bson.encode(value)) for operator, value in update.items()}
+                        )
+                    pending = len(self._pending_writes)
+                if pending >= self.write_buffer_size:
+                    self._flush_wanted.set()
+                return None
+
+            new_blobs = self._unstored_blobs(blobs)
+            if new_blobs:
+                self._bulk_upsert(blob_writes(new_blobs))
+                self._known_blobs.update(new_blobs)
+
+            *part_writes, (_, query, update) = writes
+            if part_writes:
+                self._bulk_upsert(part_writes)
             
             # Update or insert the page result
-            return self.page_results.update_one(
-                {
-                    'test_run_id': test_run_id,
-                    'url': url
-                },
-                {'$set': document},
-                upsert=True
-            )
+            return self.page_results.update_one(query, update, upsert=True)
         except Exception as e:
             print(f"Error saving page result: {e}")
             return None
 
+    def _bulk_upsert(self, writes):
+        """Send (collection, query, update) upserts of one collection with a single bulk_write"""
+        collection = writes[0][0]
+        return self.db[collection].bulk_write(
+            [UpdateOne(query, update, upsert=True) for _, query, update in writes],
+            ordered=False
+        )
+
     def complete_test_run(self, test_run_id, summary=None):
         """Mark a test run as complete and add summary data"""
+        self.flush()
         try:
-            update_data = {
-                'status': 'completed',
-                'timestamp_end': datetime.now().isoformat()
-            }
-            if summary:
-                update_data['summary'] = summary
-
-            self.test_runs.update_one(
-                {'_id': ObjectId(test_run_id)},
-                {'$set': update_data}
-            )
+            self.test_runs.update_one({'_id': ObjectId(test_run_id)}, completion_update(summary))
         except Exception as e:
             print(f"Error completing test run: {e}")
 
+    def _load_parts(self, test_run_id, url=None, test_names=None, urls=None):
+        """Load split test results of a run, grouped by URL"""
+        return group_parts(self.test_results.find(
+            parts_query(test_run_id, url, test_names, urls), {'_id': 0, 'timestamp': 0}
+        ))
+
+    def _load_blobs(self, hashes):
+        """Load deduplicated results by hash"""
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        return {doc['_id']: doc['result'] for doc in self.result_blobs.find({'_id': {'$in': hashes}})}
+
+    def _assemble_batch(self, test_run_id, page_results):
+        """Nest split or deduplicated test results back into a batch of page results"""
+        part_urls, digests = collect_batch_refs(page_results)
+        parts = self._load_parts(test_run_id, urls=part_urls) if part_urls else {}
+        return assemble_batch(page_results, parts, self._load_blobs(digests))
+
+    def iter_page_results(self, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Yield the page results of a test run, reading them from the cursor
+        batch_size at a time so memory use stays constant
+        """
+        self.flush()
+        cursor = self.page_results.find({'test_run_id': test_run_id}, {'_id': 0}).batch_size(batch_size)
+        batch = []
+        for result in cursor:
+            batch.append(result)
+            if len(batch) >= batch_size:
+                yield from self._assemble_batch(test_run_id, batch)
+                batch = []
+        if batch:
+            yield from self._assemble_batch(test_run_id, batch)
+
+    def iter_result_summaries(self, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Yield a small summary of each page result of a test run (status, test
+        names, breakpoint counts, consolidated summary), projected on the
+        server and read from the cursor batch_size at a time
+        """
+        self.flush()
+        cursor = self.page_results.aggregate(result_summary_pipeline(test_run_id), batchSize=batch_size)
+        for summary in cursor:
+            yield stored_result_summary(summary)
+
     def get_page_results(self, test_run_id):
         """Get all page results for a specific test run"""
         try:
-            return list(self.page_results.find(
-                {'test_run_id': test_run_id},
-                {'_id': 0}
-            ))
+            return list(self.iter_page_results(test_run_id))
         except Exception as e:
             print(f"Error getting page results: {e}")
             return []
             
-    def get_page_result(self, test_run_id, url):
-        """Get a specific page result by test_run_id and URL"""
+    def get_page_result(self, test_run_id, url, tests=None):
+        """
+        Get a specific page result by test_run_id and URL
+        
+        Args:
+            test_run_id: The ID of the test run
+            url: The page URL
+            tests: Optional test names to load when the result is stored split;
+                only those parts are fetched and nested back in. None loads all.
+        """
+        self.flush()
         try:
-            result = self.page_results.find_one(
-                {
-                    'test_run_id': test_run_id,
-                    'url': url
-                },
-                {'_id': 0}
-            )
+            result = self.page_results.find_one(page_filter(test_run_id, url), {'_id': 0})
             if result:
-                return result.get('results', {})
+                page_result = result.get('results', {})
+                if is_split(page_result):
+                    refs = blob_refs(page_result, tests)
+                    if refs:
+                        parts = blob_parts(page_result, self._load_blobs(digest for _, _, digest in refs), tests)
+                    else:
+                        parts = self._load_parts(test_run_id, url, tests).get(url, [])
+                    page_result = assemble_page_result(page_result, parts)
+                return page_result
             return None
         except Exception as e:
             print(f"Error getting page result for URL {url}: {e}")
             return None
+
+    def get_test_result(self, test_run_id, url, test_name, breakpoint=None):
+        """
+        Get a single test's result for a page stored with split_results or dedup_results
+        
+        Returns:
+            dict: The test result, or None if it is not stored separately
+        """
+        self.flush()
+        try:
+            breakpoint = None if breakpoint is None else str(breakpoint)
+            part = self.test_results.find_one(
+                part_filter(test_run_id, url, test_name, breakpoint),
+                {'_id': 0, 'result': 1}
+            )
+            if part:
+                return part['result']
+
+            envelope = self.page_results.find_one(
+                page_filter(test_run_id, url),
+                {'_id': 0, 'results.accessibility.split_tests': 1}
+            )
+            envelope = (envelope or {}).get('results')
+            digests = part_digests(envelope, test_name, breakpoint)
+            if digests:
+                return blob_test_result(envelope, self._load_blobs(digests[:1]), test_name, breakpoint)
+            return None
+        except Exception as e:
+            print(f"Error getting {test_name} result for URL {url}: {e}")
+            return None
             
     def get_all_test_runs(self):
         """Get all test runs"""
@@ -154,8 +427,19 @@ class AccessibilityDB:
             print(f"Error getting latest test run: {e}")
             return None
 
-    def export_to_json(self, filename, test_run_id):
-        """Export results for a specific test run to JSON file"""
+    def export_to_json(self, filename, test_run_id, export_format=None, compression=None,
+                       batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Export results for a specific test run to JSON file, streaming the
+        pages so memory use does not grow with the size of the run
+        
+        Args:
+            filename: File to write
+            test_run_id: The ID of the test run
+            export_format: 'json' or 'ndjson'; inferred from filename if None
+            compression: 'gzip' or 'zstd'; inferred from filename if None
+            batch_size: Number of page results read from Mongo at a time
+        """
         try:
             # Get test run info
             test_run = self.test_runs.find_one(
@@ -163,30 +447,42 @@ class AccessibilityDB:
                 {'_id': 0}
             )
             
-            # Get all page results
-            page_results = self.get_page_results(test_run_id)
-            
-            # Combine into one document
-            full_results = {
-                'test_run': test_run,
-                'pages': {result['url']: result['results'] for result in page_results}
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(full_results, f, indent=2, default=str)
+            with ResultExportWriter(filename, export_format, compression) as writer:
+                writer.write_test_run(test_run)
+                for result in self.iter_page_results(test_run_id, batch_size):
+                    writer.write_page(result['url'], result['results'])
         except Exception as e:
             print(f"Error exporting to JSON: {e}")
 
+    def export_violations(self, output_dir, test_run_id, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        """
+        Export the violations of a test run as Parquet files partitioned by
+        test (requires pyarrow)
+        
+        Returns:
+            int: Number of violations written
+        """
+        try:
+            test_run = self.test_runs.find_one({'_id': ObjectId(test_run_id)}, {'documentation': 1}) or {}
+            with ViolationsParquetWriter(output_dir, test_run_id, test_run.get('documentation')) as writer:
+                for result in self.iter_page_results(test_run_id, batch_size):
+                    writer.add_page(result['url'], result['results'])
+            return writer.rows_written
+        except Exception as e:
+            print(f"Error exporting violations: {e}")
+            return 0
+
     def clear_database(self):
         """Clear all collections in the specific database"""
         try:
             self.test_runs.drop()
             self.page_results.drop()
+            self.test_results.drop()
+            self.result_blobs.drop()
+            self._known_blobs.clear()
             
             # Recreate indexes
-            self.page_results.create_index([('url', 1), ('test_run_id', 1)])
-            self.page_results.create_index('timestamp')
-            self.test_runs.create_index('timestamp')
+            self._create_indexes()
             
             print(f"Database '{self.db_name}' cleared successfully")
         except Exception as e:
@@ -195,5 +491,7 @@ class AccessibilityDB:
 
 
     def __del__(self):
-        if hasattr(self, 'client'):
-            self.client.close()
\ No newline at end of file
+        try:
+            self.close()
+        except Exception:
+            pass
\ No newline at end of file
@@ -0,0 +1,515 @@
+"""
+Single-pass DOM collector shared by the test modules.
+
+Many test modules walk every element with querySelectorAll('*') and call
+getComputedStyle inside their own page.evaluate, so a large DOM gets walked
+over and over for every page and breakpoint. get_dom_snapshot walks the
+DOM once and returns a columnar snapshot holding each element's tag,
+selected attributes, bounding rect, a fixed set of computed style properties
+and its XPath. Test modules read from that snapshot in Python instead of
+re-querying the live page.
+
+The snapshot is cached on the page and keyed by URL and viewport, so tests
+running at the same breakpoint share one walk, while a viewport change
+triggers a fresh collection.
+
+Two engines can collect the snapshot:
+
+- 'js' walks the DOM in page JavaScript and calls getComputedStyle for every
+  element.
+- 'cdp' issues a single DevTools Protocol DOMSnapshot.captureSnapshot call,
+  which returns the whitelisted computed styles and layout boxes for the
+  whole document as flat string-table arrays, and converts the result into
+  the same columnar layout in Python.
+"""
+import re
+
+# Computed style properties captured for every element
+SNAPSHOT_STYLE_PROPERTIES = [
+    'display', 'visibility', 'opacity', 'position',
+    'overflow', 'overflowX', 'overflowY',
+    'top', 'right', 'bottom', 'left', 'zIndex',
+    'color', 'backgroundColor', 'backgroundImage',
+    'borderStyle', 'borderColor',
+    'fontFamily', 'fontSize', 'fontWeight', 'fontStyle', 'lineHeight',
+    'textAlign', 'textDecorationLine',
+    'animationName', 'animationDuration', 'animationIterationCount', 'animationPlayState'
+]
+
+# Attributes captured when present on an element
+SNAPSHOT_ATTRIBUTES = [
+    'role', 'tabindex', 'href', 'alt', 'title', 'type', 'lang',
+    'aria-hidden', 'aria-label', 'aria-labelledby', 'aria-describedby'
+]
+
+# Number of characters of textContent kept per element
+SNAPSHOT_TEXT_LENGTH = 50
+
+SNAPSHOT_ENGINES = ('js', 'cdp')
+DEFAULT_SNAPSHOT_ENGINE = 'js'
+
+# captureSnapshot only reports styles for nodes with a layout object. Elements
+# without one are not rendered, so they get display: none and initial values.
+CDP_UNRENDERED_STYLES = {
+    'display': 'none',
+    'visibility': 'visible',
+    'opacity': '1',
+    'position': 'static',
+    'overflow': 'visible',
+    'overflowX': 'visible',
+    'overflowY': 'visible',
+    'top': 'auto',
+    'right': 'auto',
+    'bottom': 'auto',
+    'left': 'auto',
+    'zIndex': 'auto',
+    'color': 'rgb(0, 0, 0)',
+    'backgroundColor': 'rgba(0, 0, 0, 0)',
+    'backgroundImage': 'none',
+    'borderStyle': 'none',
+    'borderColor': 'rgb(0, 0, 0)',
+    'fontFamily': '',
+    'fontSize': '16px',
+    'fontWeight': '400',
+    'fontStyle': 'normal',
+    'lineHeight': 'normal',
+    'textAlign': 'start',
+    'textDecorationLine': 'none',
+    'animationName': 'none',
+    'animationDuration': '0s',
+    'animationIterationCount': '1',
+    'animationPlayState': 'running'
+}
+
+_snapshot_engine = DEFAULT_SNAPSHOT_ENGINE
+
+DOM_SNAPSHOT_SCRIPT = '''
+    (styleProperties, attributeNames, textLength) => {
+        const snapshot = {
+            url: location.href,
+            viewport: {width: window.innerWidth, height: window.innerHeight},
+            body: document.body ? {
+                scrollWidth: document.body.scrollWidth,
+                scrollHeight: document.body.scrollHeight
+            } : null,
+            count: 0,
+            tag: [],
+            id: [],
+            className: [],
+            parent: [],
+            xpath: [],
+            text: [],
+            attributes: [],
+            rect: {left: [], top: [], width: [], height: []},
+            styles: {},
+            strings: []
+        };
+        styleProperties.forEach(prop => snapshot.styles[prop] = []);
+
+        // Style values repeat heavily, so they are stored as indexes into a string table
+        const stringIndex = new Map();
+        function intern(value) {
+            let index = stringIndex.get(value);
+            if (index === undefined) {
+                index = snapshot.strings.length;
+                snapshot.strings.push(value);
+                stringIndex.set(value, index);
+            }
+            return index;
+        }
+
+        // First textLength characters of textContent without building the full string
+        function textPrefix(element) {
+            let text = '';
+            const walker = document.createTreeWalker(element, NodeFilter.SHOW_TEXT);
+            while (text.length < textLength && walker.nextNode()) {
+                text += walker.currentNode.nodeValue;
+            }
+            return text.substring(0, textLength).trim() || null;
+        }
+
+        function visit(element, parentIndex, xpath) {
+            const index = snapshot.count++;
+            const style = window.getComputedStyle(element);
+            const rect = element.getBoundingClientRect();
+
+            snapshot.tag.push(element.tagName.toLowerCase());
+            snapshot.id.push(element.id || null);
+            snapshot.className.push(element.getAttribute('class') || null);
+            snapshot.parent.push(parentIndex);
+            snapshot.xpath.push(xpath);
+            snapshot.text.push(textPrefix(element));
+
+            let attributes = null;
+            for (const name of attributeNames) {
+                if (element.hasAttribute(name)) {
+                    attributes = attributes || {};
+                    attributes[name] = element.getAttribute(name);
+                }
+            }
+            snapshot.attributes.push(attributes);
+
+            snapshot.rect.left.push(rect.left);
+            snapshot.rect.top.push(rect.top);
+            snapshot.rect.width.push(rect.width);
+            snapshot.rect.height.push(rect.height);
+
+            for (const prop of styleProperties) {
+                snapshot.styles[prop].push(intern(style[prop]));
+            }
+
+            // XPath indexes count preceding siblings with the same tag name
+            const tagCounts = {};
+            for (const child of element.children) {
+                const tag = child.tagName.toLowerCase();
+                tagCounts[tag] = (tagCounts[tag] || 0) + 1;
+                visit(child, index, `${xpath}/${tag}[${tagCounts[tag]}]`);
+            }
+        }
+
+        const root = document.documentElement;
+        visit(root, null, `/${root.tagName.toLowerCase()}[1]`);
+        return snapshot;
+    }
+'''
+
+
+class DomSnapshot:
+    """
+    Read-only view over a columnar DOM snapshot.
+
+    Elements are addressed by their index in document order.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.url = data.get('url')
+        self.viewport = data.get('viewport', {})
+        self.body = data.get('body') or {}
+        self._strings = data.get('strings', [])
+        self._styles = data.get('styles', {})
+        self._rect = data.get('rect', {})
+        self._children = None
+
+    def __len__(self):
+        return self.data.get('count', 0)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def tag(self, index):
+        return self.data['tag'][index]
+
+    def element_id(self, index):
+        return self.data['id'][index]
+
+    def class_name(self, index):
+        return self.data['className'][index]
+
+    def xpath(self, index):
+        return self.data['xpath'][index]
+
+    def text(self, index):
+        return self.data['text'][index]
+
+    def parent(self, index):
+        return self.data['parent'][index]
+
+    def attribute(self, index, name, default=None):
+        attributes = self.data['attributes'][index]
+        if not attributes:
+            return default
+        return attributes.get(name, default)
+
+    def has_attribute(self, index, name):
+        attributes = self.data['attributes'][index]
+        return bool(attributes) and name in attributes
+
+    def style(self, index, prop):
+        """Computed style value of an element; prop must be in SNAPSHOT_STYLE_PROPERTIES"""
+        return self._strings[self._styles[prop][index]]
+
+    def rect(self, index):
+        left = self._rect['left'][index]
+        top = self._rect['top'][index]
+        width = self._rect['width'][index]
+        height = self._rect['height'][index]
+        return {
+            'left': left,
+            'top': top,
+            'width': width,
+            'height': height,
+            'right': left + width,
+            'bottom': top + height
+        }
+
+    def children(self, index):
+        """Indexes of the element's child elements, in document order"""
+        if self._children is None:
+            self._children = [[] for _ in range(len(self))]
+            for child, parent in enumerate(self.data['parent']):
+                if parent is not None:
+                    self._children[parent].append(child)
+        return self._children[index]
+
+    def is_hidden(self, index):
+        """Same visibility test the modules used with getComputedStyle"""
+        return (self.style(index, 'display') == 'none' or
+                self.style(index, 'visibility') == 'hidden' or
+                self.style(index, 'opacity') == '0')
+
+    def in_body(self, index):
+        """True for descendants of <body> (not <body> itself)"""
+        return self.xpath(index).startswith('/html[1]/body[1]/')
+
+
+def set_snapshot_engine(engine):
+    """
+    Select the engine get_dom_snapshot uses in this process
+
+    Args:
+        engine: 'js' or 'cdp'; None keeps the default
+    """
+    global _snapshot_engine
+    engine = engine or DEFAULT_SNAPSHOT_ENGINE
+    if engine not in SNAPSHOT_ENGINES:
+        raise ValueError(f"Unknown snapshot engine '{engine}', expected one of {', '.join(SNAPSHOT_ENGINES)}")
+    _snapshot_engine = engine
+
+
+def _css_property_name(prop):
+    """camelCase style property to the CSS name used by the protocol"""
+    return re.sub(r'([A-Z])', lambda m: '-' + m.group(1).lower(), prop)
+
+
+def _convert_cdp_snapshot(result, viewport, attribute_names=SNAPSHOT_ATTRIBUTES,
+                          style_properties=SNAPSHOT_STYLE_PROPERTIES, text_length=SNAPSHOT_TEXT_LENGTH):
+    """
+    Convert a DOMSnapshot.captureSnapshot result for the top-level document
+    into the columnar layout produced by DOM_SNAPSHOT_SCRIPT.
+
+    Only elements reachable through element.children are kept, i.e. pseudo
+    elements, shadow trees and template contents are skipped just like the
+    JavaScript walk skips them.
+    """
+    strings = list(result['strings'])
+    document = result['documents'][0]
+    nodes = document['nodes']
+    layout = document['layout']
+
+    def string(index):
+        return strings[index] if index is not None and index >= 0 else None
+
+    string_index = {}
+
+    def intern(value):
+        index = string_index.get(value)
+        if index is None:
+            index = len(strings)
+            strings.append(value)
+            string_index[value] = index
+        return index
+
+    node_types = nodes['nodeType']
+    node_names = nodes['nodeName']
+    node_values = nodes.get('nodeValue', [])
+    parents = nodes['parentIndex']
+    node_attributes = nodes.get('attributes', [])
+    pseudo_nodes = set(nodes.get('pseudoType', {}).get('index', []))
+
+    layout_index = {}
+    for position, node_index in enumerate(layout['nodeIndex']):
+        layout_index.setdefault(node_index, position)
+    bounds = layout.get('bounds', [])
+    layout_styles = layout.get('styles', [])
+    scroll_rects = layout.get('scrollRects', [])
+    scroll_x = document.get('scrollOffsetX', 0) or 0
+    scroll_y = document.get('scrollOffsetY', 0) or 0
+    unrendered = {prop: intern(CDP_UNRENDERED_STYLES.get(prop, '')) for prop in style_properties}
+    wanted_attributes = set(attribute_names)
+
+    snapshot = {
+        'url': string(document.get('documentURL')),
+        'viewport': viewport,
+        'body': None,
+        'count': 0,
+        'tag': [],
+        'id': [],
+        'className': [],
+        'parent': [],
+        'xpath': [],
+        'text': [],
+        'attributes': [],
+        'rect': {'left': [], 'top': [], 'width': [], 'height': []},
+        'styles': {prop: [] for prop in style_properties},
+        'strings': strings
+    }
+
+    # Node index -> element index for kept elements; the document node maps to None
+    element_of = {}
+    tag_counts = {}
+    texts = []
+    body_layout = None
+
+    for node_index, node_type in enumerate(node_types):
+        parent = parents[node_index]
+        if node_type == 9 and parent == -1:
+            element_of[node_index] = None
+            continue
+
+        if node_type == 3:
+            # Append text to the owning element and its ancestors until full
+            element = element_of.get(parent, -1)
+            value = string(node_values[node_index]) if node_index < len(node_values) else None
+            while value and element not in (None, -1) and len(texts[element]) < text_length:
+                texts[element] += value
+                element = snapshot['parent'][element]
+            continue
+
+        if node_type != 1 or node_index in pseudo_nodes or parent not in element_of:
+            continue
+
+        parent_element = element_of[parent]
+        index = snapshot['count']
+        snapshot['count'] += 1
+        element_of[node_index] = index
+
+        tag = string(node_names[node_index]).lower()
+        counts = tag_counts.setdefault(parent, {})
+        counts[tag] = counts.get(tag, 0) + 1
+        parent_xpath = snapshot['xpath'][parent_element] if parent_element is not None else ''
+        snapshot['xpath'].append(f"{parent_xpath}/{tag}[{counts[tag]}]")
+        snapshot['tag'].append(tag)
+        snapshot['parent'].append(parent_element)
+        texts.append('')
+
+        element_id = None
+        class_name = None
+        attributes = None
+        pairs = node_attributes[node_index] if node_index < len(node_attributes) else []
+        for position in range(0, len(pairs), 2):
+            name = string(pairs[position])
+            value = string(pairs[position + 1])
+            if name == 'id':
+                element_id = value or None
+            elif name == 'class':
+                class_name = value or None
+            if name in wanted_attributes:
+                attributes = attributes or {}
+                attributes[name] = value
+        snapshot['id'].append(element_id)
+        snapshot['className'].append(class_name)
+        snapshot['attributes'].append(attributes)
+
+        position = layout_index.get(node_index)
+        if position is None:
+            left = top = width = height = 0
+            for prop in style_properties:
+                snapshot['styles'][prop].append(unrendered[prop])
+        else:
+            left, top, width, height = bounds[position]
+            left -= scroll_x
+            top -= scroll_y
+            for prop, value in zip(style_properties, layout_styles[position]):
+                snapshot['styles'][prop].append(value)
+            if tag == 'body' and parent_element == 0:
+                body_layout = position
+        snapshot['rect']['left'].append(left)
+        snapshot['rect']['top'].append(top)
+        snapshot['rect']['width'].append(width)
+        snapshot['rect']['height'].append(height)
+
+    snapshot['text'] = [text[:text_length].strip() or None for text in texts]
+
+    if body_layout is not None:
+        if body_layout < len(scroll_rects):
+            _, _, scroll_width, scroll_height = scroll_rects[body_layout]
+        else:
+            scroll_width = document.get('contentWidth', 0)
+            scroll_height = document.get('contentHeight', 0)
+        snapshot['body'] = {'scrollWidth': scroll_width, 'scrollHeight': scroll_height}
+
+    return snapshot
+
+
+async def _collect_js_snapshot(page):
+    return await page.evaluate(
+        DOM_SNAPSHOT_SCRIPT,
+        SNAPSHOT_STYLE_PROPERTIES,
+        SNAPSHOT_ATTRIBUTES,
+        SNAPSHOT_TEXT_LENGTH
+    )
+
+
+async def _collect_cdp_snapshot(page):
+    viewport = page.viewport
+    if not viewport:
+        viewport = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
+
+    session = await page.target.createCDPSession()
+    try:
+        result = await session.send('DOMSnapshot.captureSnapshot', {
+            'computedStyles': [_css_property_name(prop) for prop in SNAPSHOT_STYLE_PROPERTIES],
+            'includeDOMRects': True
+        })
+    finally:
+        try:
+            await session.detach()
+        except Exception:
+            pass
+
+    return _convert_cdp_snapshot(
+        result,
+        {'width': viewport.get('width'), 'height': viewport.get('height')}
+    )
+
+
+def _snapshot_key(page):
+    viewport = page.viewport or {}
+    return (page.url, viewport.get('width'), viewport.get('height'))
+
+
+async def get_dom_snapshot(page, refresh=False, engine=None):
+    """
+    Return the DOM snapshot for the page's current URL and viewport, collecting
+    it with a single DOM walk if it is not cached yet.
+
+    Args:
+        page: The Puppeteer page object
+        refresh: Collect a new snapshot even if one is cached, e.g. after a
+            test has mutated the DOM
+        engine: 'js' or 'cdp'; defaults to the engine chosen with
+            set_snapshot_engine
+
+    Returns:
+        DomSnapshot: The snapshot of the page
+    """
+    context = getattr(page, '_accessibility_context', None)
+    if context is None:
+        context = {'page_structure': {}}
+        page._accessibility_context = context
+
+    key = _snapshot_key(page)
+    cached = context.get('dom_snapshot')
+    if cached and not refresh and cached[0] == key:
+        return cached[1]
+
+    engine = engine or _snapshot_engine
+    data = None
+    if engine == 'cdp':
+        try:
+            data = await _collect_cdp_snapshot(page)
+        except Exception as e:
+            print(f"Warning: DOMSnapshot capture failed, falling back to the JS walk: {str(e)}")
+    if data is None:
+        data = await _collect_js_snapshot(page)
+    snapshot = DomSnapshot(data)
+    context['dom_snapshot'] = (key, snapshot)
+    return snapshot
+
+
+def invalidate_dom_snapshot(page):
+    """Drop the page's cached snapshot, e.g. after a test has mutated the DOM"""
+    context = getattr(page, '_accessibility_context', None)
+    if context:
+        context.pop('dom_snapshot', None)
@@ -0,0 +1,169 @@
+"""
+Per-domain politeness scheduling for the crawler.
+
+Instead of sleeping a fixed delay after every page, URLs are grouped by
+hostname and handed out round-robin across domains. Each domain gets a
+minimum interval between page loads and a cap on how many of its pages may
+be in flight at once, so multi-site runs stay busy while every individual
+site is still rate limited.
+
+By default a domain may have as many pages in flight as the crawl's
+concurrency, so a single-site run still uses every concurrent page while
+the minimum interval keeps the request rate polite.
+"""
+import asyncio
+import time
+from collections import deque, OrderedDict
+from urllib.parse import urlparse
+
+# None: as many pages per domain as the crawl's concurrency
+DEFAULT_MAX_PER_DOMAIN = None
+
+
+def get_domain(url):
+    """Return the hostname used to group a URL for politeness limits"""
+    return (urlparse(url).hostname or '').lower()
+
+
+def group_by_domain(indexed_urls):
+    """
+    Group (index, url) tuples by hostname, preserving input order
+
+    Returns:
+        OrderedDict: Mapping of hostname to its list of (index, url) tuples
+    """
+    groups = OrderedDict()
+    for index, url in indexed_urls:
+        groups.setdefault(get_domain(url), []).append((index, url))
+    return groups
+
+
+def effective_parallelism(domain_count, workers, concurrency, max_per_domain):
+    """
+    How much of the requested parallelism the domain limits leave
+
+    A domain is crawled by a single worker process and has at most
+    max_per_domain pages in flight, so few domains cap both.
+
+    Returns:
+        tuple: (worker processes used, pages in flight at most)
+    """
+    domain_count = max(1, domain_count)
+    used_workers = max(1, min(workers or 1, domain_count))
+    pages = min(used_workers * max(1, concurrency or 1), domain_count * max(1, max_per_domain or 1))
+    return used_workers, pages
+
+
+class DomainScheduler:
+    """
+    Hands out URLs so that each domain respects a minimum interval and a
+    concurrency cap while different domains are interleaved.
+
+    Usage:
+        scheduler = DomainScheduler(indexed_urls, min_interval=2.0)
+        while True:
+            item = await scheduler.next()
+            if item is None:
+                break
+            index, url = item
+            try:
+                ...
+            finally:
+                await scheduler.release(url)
+    """
+
+    def __init__(self, indexed_urls, min_interval=0.0, max_per_domain=DEFAULT_MAX_PER_DOMAIN):
+        """
+        Args:
+            indexed_urls: List of (index, url) tuples to schedule
+            min_interval: Minimum seconds between page loads on the same domain
+            max_per_domain: Maximum pages from one domain in flight at once;
+                None allows one
+        """
+        self.min_interval = max(0.0, min_interval or 0.0)
+        self.max_per_domain = max(1, max_per_domain or 1)
+        self._pending = OrderedDict(
+            (domain, deque(items)) for domain, items in group_by_domain(indexed_urls).items()
+        )
+        self._active = {domain: 0 for domain in self._pending}
+        self._next_allowed = {domain: 0.0 for domain in self._pending}
+        self._condition = asyncio.Condition()
+
+    @property
+    def domain_count(self):
+        return len(self._active)
+
+    def _pick(self, now):
+        """
+        Take the next URL from the first eligible domain and rotate that domain
+        to the back so the following pick prefers a different site.
+        """
+        for domain in list(self._pending):
+            if self._active[domain] >= self.max_per_domain:
+                continue
+            if now < self._next_allowed[domain]:
+                continue
+            urls = self._pending[domain]
+            item = urls.popleft()
+            if urls:
+                self._pending.move_to_end(domain)
+            else:
+                del self._pending[domain]
+            self._active[domain] += 1
+            self._next_allowed[domain] = now + self.min_interval
+            return item
+        return None
+
+    def _seconds_until_eligible(self, now):
+        """Time until a rate-limited domain opens up, or None if all are at their cap"""
+        waits = [
+            self._next_allowed[domain] - now
+            for domain in self._pending
+            if self._active[domain] < self.max_per_domain
+        ]
+        return max(0.0, min(waits)) if waits else None
+
+    async def next(self):
+        """
+        Wait for the next URL that may be loaded without breaking any domain limit
+
+        Returns:
+            tuple: (index, url), or None once every URL has been handed out
+        """
+        async with self._condition:
+            while True:
+                if not self._pending:
+                    return None
+                now = time.monotonic()
+                item = self._pick(now)
+                if item:
+                    return item
+                timeout = self._seconds_until_eligible(now)
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def wait_for_interval(self, url):
+        """
+        Wait for the next moment another page load from this URL's domain
+        keeps the minimum interval, and claim it
+
+        For extra loads made while a page already holds its domain slot, such
+        as the pages opened for parallel breakpoints: they are rate limited
+        with the domain's other loads but do not take slots of their own.
+        """
+        domain = get_domain(url)
+        async with self._condition:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(domain, 0.0))
+            self._next_allowed[domain] = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def release(self, url):
+        """Mark a page from this URL's domain as finished"""
+        domain = get_domain(url)
+        async with self._condition:
+            self._active[domain] = max(0, self._active.get(domain, 0) - 1)
+            self._condition.notify_all()
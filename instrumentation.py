@@ -0,0 +1,189 @@
+"""
+Timing and resource instrumentation of page processing.
+
+PageTimings measures the steps of processing one page: navigation, the
+screenshot, each test and the database writes. For every step it records
+the wall time, the page.evaluate round trips made and the bytes they
+exchanged (script, arguments and returned JSON), and for steps that use the
+page the JS heap size page.metrics() reports when the step ends. The result
+is stored as the page result's timings subdocument:
+
+    {'wall_ms': ..., 'navigation': {...}, 'screenshot': {...},
+     'db_write': {...}, 'tests': {'page_structure': {...}, ...}}
+
+Steps can run concurrently (see test_pipeline) and nest, e.g. a test inside
+'accessibility_tests'. The steps a page.evaluate runs under are tracked
+with a context variable, and the round trip is counted for each of them.
+The extra pages opened for parallel breakpoints are attached as well, so
+their round trips count towards the step that opened them; the JS heap is
+only sampled on the page passed to measure().
+
+summarize_timings turns the timings of every page of a run into the
+percentiles stored in the test run summary.
+"""
+import contextvars
+import json
+import time
+from contextlib import asynccontextmanager
+
+# The steps the current task is running in, innermost last
+_active_steps = contextvars.ContextVar('active_steps', default=())
+
+PERCENTILES = (50, 90, 99)
+
+
+def _payload_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    try:
+        return len(json.dumps(value, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def get_js_heap_used(page):
+    """JS heap in use on the page in bytes, or None if metrics are unavailable"""
+    try:
+        metrics = await page.metrics()
+    except Exception:
+        return None
+    heap_used = metrics.get('JSHeapUsedSize')
+    return int(heap_used) if heap_used is not None else None
+
+
+class PageTimings:
+    """
+    Collect the timings of one page.
+
+    Usage:
+        timings = PageTimings()
+        timings.attach(page)
+        async with timings.measure('navigation', page):
+            await page.goto(url)
+        page_result['timings'] = timings.to_document()
+        timings.detach(page)
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.steps = {}
+        self.tests = {}
+
+    def _step(self, name, group=None):
+        steps = self.tests if group == 'tests' else self.steps
+        step = steps.get(name)
+        if step is None:
+            step = steps[name] = {'wall_ms': 0.0, 'count': 0, 'evaluate_calls': 0, 'evaluate_bytes': 0}
+        return step
+
+    @asynccontextmanager
+    async def measure(self, name, page=None, group=None):
+        """
+        Time a step; repeated steps with the same name accumulate
+
+        Args:
+            name: Step name, e.g. 'navigation' or a test name
+            page: The page the step uses; its JS heap is sampled when the step ends
+            group: 'tests' to store the step under timings.tests
+        """
+        step = self._step(name, group)
+        token = _active_steps.set(_active_steps.get() + (step,))
+        start = time.perf_counter()
+        try:
+            yield step
+        finally:
+            step['wall_ms'] += (time.perf_counter() - start) * 1000
+            step['count'] += 1
+            _active_steps.reset(token)
+            if page is not None:
+                heap_used = await get_js_heap_used(page)
+                if heap_used is not None:
+                    step['js_heap_used_bytes'] = heap_used
+
+    def record_evaluate(self, script, args, result):
+        """Count one page.evaluate round trip for the steps it ran under"""
+        steps = _active_steps.get() or (self._step('other'),)
+        payload = _payload_size(script) + sum(_payload_size(arg) for arg in args) + _payload_size(result)
+        for step in steps:
+            step['evaluate_calls'] += 1
+            step['evaluate_bytes'] += payload
+
+    def attach(self, page):
+        """Count the page's evaluate calls until detach()"""
+        evaluate = page.evaluate
+
+        async def counted_evaluate(script, *args, **kwargs):
+            result = await evaluate(script, *args, **kwargs)
+            self.record_evaluate(script, args, result)
+            return result
+
+        page.evaluate = counted_evaluate
+
+    @staticmethod
+    def detach(page):
+        """Restore the page's own evaluate, e.g. before the pool reuses it"""
+        page.__dict__.pop('evaluate', None)
+
+    def to_document(self):
+        """The timings subdocument stored with the page result"""
+        document = {'wall_ms': (time.perf_counter() - self._start) * 1000}
+        document.update((name, dict(step)) for name, step in self.steps.items())
+        if self.tests:
+            document['tests'] = {name: dict(step) for name, step in self.tests.items()}
+        return document
+
+
+def _percentile(sorted_values, percentile):
+    # Nearest-rank percentile
+    rank = max(1, -(-percentile * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _summarize_steps(steps):
+    wall_times = sorted(step['wall_ms'] for step in steps)
+    summary = {'pages': len(wall_times)}
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}_ms'] = round(_percentile(wall_times, percentile), 3)
+    summary['max_ms'] = round(wall_times[-1], 3)
+    summary['evaluate_calls'] = sum(step.get('evaluate_calls', 0) for step in steps)
+    summary['evaluate_bytes'] = sum(step.get('evaluate_bytes', 0) for step in steps)
+    heap_sizes = sorted(step['js_heap_used_bytes'] for step in steps if step.get('js_heap_used_bytes') is not None)
+    if heap_sizes:
+        summary['p90_js_heap_used_bytes'] = _percentile(heap_sizes, 90)
+    return summary
+
+
+def summarize_timings(page_timings):
+    """
+    Summarize the timings of a run's pages
+
+    Args:
+        page_timings: Iterable of timings subdocuments, one per page
+
+    Returns:
+        dict: Wall time percentiles and evaluate totals per step, with
+            tests under 'tests' and whole pages under 'page'
+    """
+    page_wall_times = []
+    steps = {}
+    tests = {}
+    for timings in page_timings:
+        if not isinstance(timings, dict):
+            continue
+        for name, step in timings.items():
+            if name == 'wall_ms':
+                page_wall_times.append({'wall_ms': step})
+            elif name == 'tests':
+                for test_name, test_step in step.items():
+                    tests.setdefault(test_name, []).append(test_step)
+            elif isinstance(step, dict):
+                steps.setdefault(name, []).append(step)
+
+    summary = {name: _summarize_steps(values) for name, values in sorted(steps.items())}
+    if page_wall_times:
+        summary['page'] = _summarize_steps(page_wall_times)
+    if tests:
+        summary['tests'] = {name: _summarize_steps(values) for name, values in sorted(tests.items())}
+    return summary
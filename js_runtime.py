@@ -0,0 +1,150 @@
+"""
+Shared in-page JavaScript helpers for the test modules.
+
+Most test modules used to paste their own copy of getFullXPath (and several
+copies of the colour and visibility helpers) into every page.evaluate, so the
+same code was parsed again for each test, page and breakpoint, and the copies
+had drifted into slightly different XPath formats. The runtime defined here
+is injected once per page as window.__a11y and the test scripts pull the
+helpers they need from it:
+
+    const { getFullXPath, isVisible } = window.__a11y;
+
+getFullXPath results are memoized per element and the cache is dropped as
+soon as the document's element tree changes, so repeated lookups for the
+same element (or its ancestors) are cheap without ever going stale.
+"""
+
+JS_RUNTIME_SCRIPT = '''
+    () => {
+        if (window.__a11y) {
+            return;
+        }
+
+        let xpathCache = new WeakMap();
+        let colorCache = new Map();
+        let observer = null;
+
+        // XPath indexes shift whenever elements are added or removed
+        function checkMutations() {
+            if (observer === null) {
+                if (!document.documentElement || typeof MutationObserver === 'undefined') {
+                    return;
+                }
+                observer = new MutationObserver(() => {
+                    xpathCache = new WeakMap();
+                });
+                observer.observe(document, {childList: true, subtree: true});
+            }
+            if (observer.takeRecords().length > 0) {
+                xpathCache = new WeakMap();
+            }
+        }
+
+        function getElementIdx(el) {
+            let count = 1;
+            for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
+                if (sib.nodeType === 1 && sib.tagName === el.tagName) {
+                    count++;
+                }
+            }
+            return count;
+        }
+
+        function xpathOf(element) {
+            if (!element || element.nodeType !== 1) return '';
+            let path = xpathCache.get(element);
+            if (path === undefined) {
+                const tagName = element.tagName.toLowerCase();
+                path = `${xpathOf(element.parentNode)}/${tagName}[${getElementIdx(element)}]`;
+                xpathCache.set(element, path);
+            }
+            return path;
+        }
+
+        // Full positional XPath, e.g. /html[1]/body[1]/div[2]
+        function getFullXPath(element) {
+            if (!element) return '';
+            checkMutations();
+            return xpathOf(element);
+        }
+
+        function isVisible(element) {
+            const style = window.getComputedStyle(element);
+            return style.display !== 'none' &&
+                   style.visibility !== 'hidden' &&
+                   style.opacity !== '0';
+        }
+
+        // Any CSS colour to an array of its numeric rgb(a) components
+        function parseColor(color) {
+            let rgb = colorCache.get(color);
+            if (rgb === undefined) {
+                // Flush real mutations first, then drop the records of the
+                // probe element so it does not invalidate the XPath cache
+                checkMutations();
+                const temp = document.createElement('div');
+                temp.style.color = color;
+                temp.style.display = 'none';
+                document.body.appendChild(temp);
+                rgb = window.getComputedStyle(temp).color.match(/\\d+/g).map(Number);
+                document.body.removeChild(temp);
+                if (observer !== null) {
+                    observer.takeRecords();
+                }
+                colorCache.set(color, rgb);
+            }
+            return rgb;
+        }
+
+        function getLuminance(r, g, b) {
+            const [rs, gs, bs] = [r, g, b].map(c => {
+                c = c / 255;
+                return c <= 0.03928 ? c / 12.92 : Math.pow((c + 0.055) / 1.055, 2.4);
+            });
+            return 0.2126 * rs + 0.7152 * gs + 0.0722 * bs;
+        }
+
+        function getContrastRatio(l1, l2) {
+            const lighter = Math.max(l1, l2);
+            const darker = Math.min(l1, l2);
+            return (lighter + 0.05) / (darker + 0.05);
+        }
+
+        Object.defineProperty(window, '__a11y', {
+            value: Object.freeze({
+                getFullXPath,
+                isVisible,
+                parseColor,
+                getLuminance,
+                getContrastRatio
+            }),
+            configurable: false,
+            enumerable: false,
+            writable: false
+        });
+    }
+'''
+
+
+async def install_js_runtime(page):
+    """
+    Register the runtime so it is defined in every document the page loads.
+    Call before navigating.
+
+    Args:
+        page: The Puppeteer page object
+    """
+    await page.evaluateOnNewDocument(JS_RUNTIME_SCRIPT)
+
+
+async def ensure_js_runtime(page):
+    """
+    Define the runtime in the current document if it is missing, e.g. on a
+    page that was not set up with install_js_runtime.
+
+    Args:
+        page: The Puppeteer page object
+    """
+    if not await page.evaluate('() => !!window.__a11y'):
+        await page.evaluate(JS_RUNTIME_SCRIPT)
@@ -0,0 +1,117 @@
+"""
+Wait for a page's layout to settle, e.g. after page.setViewport.
+
+The tests used to sleep a fixed 500ms after every viewport change. That is
+dead time on simple pages and not always enough on heavy ones. Here the page
+itself reports when layout has stopped changing: a ResizeObserver on the
+root elements, layout-shift performance entries, pending web fonts and the
+document's scroll size all count as changes, and the wait ends after a
+number of consecutive animation frames without any. A timeout caps the wait
+on pages that never settle.
+"""
+
+DEFAULT_LAYOUT_TIMEOUT_MS = 1000
+DEFAULT_QUIET_FRAMES = 2
+
+LAYOUT_STABLE_SCRIPT = '''
+    (timeoutMs, quietFrames) => new Promise(resolve => {
+        const root = document.documentElement;
+        if (!root) {
+            resolve(true);
+            return;
+        }
+
+        let changed = true;
+        let quiet = 0;
+        let done = false;
+        const observers = [];
+
+        function markChanged() {
+            changed = true;
+        }
+
+        if (typeof ResizeObserver !== 'undefined') {
+            const resizeObserver = new ResizeObserver(markChanged);
+            resizeObserver.observe(root);
+            if (document.body) {
+                resizeObserver.observe(document.body);
+            }
+            observers.push(resizeObserver);
+        }
+
+        if (typeof PerformanceObserver !== 'undefined' &&
+            (PerformanceObserver.supportedEntryTypes || []).includes('layout-shift')) {
+            const shiftObserver = new PerformanceObserver(markChanged);
+            shiftObserver.observe({type: 'layout-shift'});
+            observers.push(shiftObserver);
+        }
+
+        function layoutSize() {
+            const body = document.body;
+            return [
+                window.innerWidth,
+                root.scrollWidth,
+                root.scrollHeight,
+                body ? body.scrollWidth : 0,
+                body ? body.scrollHeight : 0
+            ].join(',');
+        }
+
+        function finish(stable) {
+            if (done) return;
+            done = true;
+            observers.forEach(observer => observer.disconnect());
+            clearTimeout(timer);
+            resolve(stable);
+        }
+
+        // Animation frames are paused in hidden tabs, so fall back to timers there
+        function nextFrame(callback) {
+            if (document.hidden) {
+                setTimeout(callback, 16);
+            } else {
+                requestAnimationFrame(callback);
+            }
+        }
+
+        let lastSize = layoutSize();
+        function tick() {
+            if (done) return;
+            const size = layoutSize();
+            const fontsLoading = document.fonts && document.fonts.status === 'loading';
+            if (changed || fontsLoading || size !== lastSize) {
+                changed = false;
+                quiet = 0;
+                lastSize = size;
+            } else if (++quiet >= quietFrames) {
+                finish(true);
+                return;
+            }
+            nextFrame(tick);
+        }
+
+        const timer = setTimeout(() => finish(false), timeoutMs);
+        nextFrame(tick);
+    })
+'''
+
+
+async def wait_for_layout_stable(page, timeout_ms=DEFAULT_LAYOUT_TIMEOUT_MS, quiet_frames=DEFAULT_QUIET_FRAMES):
+    """
+    Wait until the page's layout has stopped changing
+
+    Args:
+        page: The Puppeteer page object
+        timeout_ms: Maximum time to wait in milliseconds
+        quiet_frames: Number of consecutive frames without layout changes
+            required before the layout counts as stable
+
+    Returns:
+        bool: True if the layout settled, False if the wait timed out or the
+            page could not be evaluated
+    """
+    try:
+        return await page.evaluate(LAYOUT_STABLE_SCRIPT, timeout_ms, quiet_frames)
+    except Exception as e:
+        print(f"Warning: Could not wait for layout to settle: {str(e)}")
+        return False
@@ -0,0 +1,81 @@
+"""
+Level-controlled logging for the crawler and the test modules.
+
+Each module logs through its own logger from get_logger(__name__), placed
+under the 'a11y' logger (e.g. 'a11y.test_responsive_accessibility') whether
+the module was imported from the package or directly. Nothing is output
+until configure_logging() is called, and the CLI only shows warnings and
+errors unless --log-level or --log-module ask for more, so the detailed
+output of hot paths such as the per-breakpoint tests costs a level check
+when it is off. Expensive messages, like the keys of large result dicts,
+should be built under logger.isEnabledFor(logging.DEBUG).
+"""
+import logging
+import sys
+
+LOGGER_NAME = 'a11y'
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
+DEFAULT_LOG_LEVEL = 'warning'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Silent when imported as a library and logging is never configured
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def get_logger(name):
+    """
+    Get the logger of a module
+
+    Args:
+        name: The module's __name__; 'src.test_with_mongo.test_fonts' and
+            'test_fonts' both map to the 'a11y.test_fonts' logger
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{name.rsplit('.', 1)[-1]}")
+
+
+def _level(name):
+    if name.lower() not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level: {name}. Available levels: {', '.join(LOG_LEVELS)}")
+    return getattr(logging, name.upper())
+
+
+def parse_module_levels(values):
+    """
+    Parse --log-module values of the form MODULE=LEVEL
+
+    Returns:
+        dict: Module name to level name
+
+    Raises:
+        ValueError: If a value is malformed or names an unknown level
+    """
+    module_levels = {}
+    for value in values or ():
+        module, separator, level = value.partition('=')
+        if not separator or not module.strip():
+            raise ValueError(f"Invalid log module setting '{value}', expected MODULE=LEVEL")
+        _level(level.strip())
+        module_levels[module.strip()] = level.strip().lower()
+    return module_levels
+
+
+def configure_logging(level=DEFAULT_LOG_LEVEL, module_levels=None):
+    """
+    Send the crawler's log records to stderr
+
+    Safe to call more than once, e.g. again in each shard worker process.
+
+    Args:
+        level: Level name for all modules
+        module_levels: Optional module name to level name overrides
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(_level(level))
+    logger.propagate = False
+    if not any(getattr(handler, '_a11y_handler', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._a11y_handler = True
+        logger.addHandler(handler)
+    for module, module_level in (module_levels or {}).items():
+        get_logger(module).setLevel(_level(module_level))
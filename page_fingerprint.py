@@ -0,0 +1,55 @@
+"""
+Cheap fingerprint of a loaded page for incremental test runs.
+
+The fingerprint hashes the serialized DOM together with the page's styles:
+the href of every linked stylesheet and the rules of inline and constructed
+stylesheets (which also covers rules inserted through the CSSOM). When a
+page's fingerprint matches that of a completed result from an earlier run,
+the full test suite would produce the same result, so the earlier result can
+be reused instead.
+"""
+import hashlib
+
+# Bump when the fingerprint script changes, so older fingerprints never match
+FINGERPRINT_VERSION = 1
+
+FINGERPRINT_SCRIPT = '''
+    () => {
+        const root = document.documentElement;
+        const parts = [root ? root.outerHTML : ''];
+        const sheets = [...document.styleSheets, ...(document.adoptedStyleSheets || [])];
+        for (const sheet of sheets) {
+            if (sheet.href) {
+                parts.push('href:' + sheet.href);
+                continue;
+            }
+            try {
+                parts.push('css:' + Array.from(sheet.cssRules, rule => rule.cssText).join('\\n'));
+            } catch (e) {
+                parts.push('css:' + (sheet.ownerNode ? sheet.ownerNode.textContent : ''));
+            }
+        }
+        return parts.join('\\u0000');
+    }
+'''
+
+
+async def get_page_fingerprint(page):
+    """
+    Fingerprint the page's DOM and CSS
+
+    Args:
+        page: The Puppeteer page object, after navigation
+
+    Returns:
+        str: Hex SHA-256 fingerprint, or None if the page could not be evaluated
+    """
+    try:
+        serialized = await page.evaluate(FINGERPRINT_SCRIPT)
+    except Exception as e:
+        print(f"Warning: Could not fingerprint page: {str(e)}")
+        return None
+
+    digest = hashlib.sha256(f'v{FINGERPRINT_VERSION}\0'.encode('utf-8'))
+    digest.update(serialized.encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,123 @@
+"""
+Streaming export of a test run's results.
+
+The backends feed pages to ResultExportWriter one at a time while iterating
+the page_results cursor in batches, so memory use does not grow with the
+size of the run. Two formats are supported:
+
+    json    The original layout, {"test_run": ..., "pages": {url: results}},
+            written incrementally with the same indentation as json.dump
+    ndjson  One JSON object per line: the test run first, then one
+            {"url": ..., "results": ...} line per page
+
+Either can be compressed with gzip or zstd (zstd requires the zstandard
+package). Both are inferred from the file name when not given, e.g.
+results.ndjson.zst.
+"""
+import gzip
+import io
+import json
+
+# zstandard is only needed for zstd compressed exports
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXPORT_FORMATS = ('json', 'ndjson')
+EXPORT_COMPRESSIONS = ('gzip', 'zstd')
+DEFAULT_EXPORT_BATCH_SIZE = 100
+
+_COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+_NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+
+def infer_export_options(filename, export_format=None, compression=None):
+    """
+    Fill in the export format and compression from the file name
+
+    Returns:
+        tuple: (export_format, compression); compression is None for plain files
+    """
+    name = filename.lower()
+    for suffix, suffix_compression in _COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            compression = compression or suffix_compression
+            break
+
+    if export_format is None:
+        export_format = 'ndjson' if name.endswith(_NDJSON_SUFFIXES) else 'json'
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if compression is not None and compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {', '.join(EXPORT_COMPRESSIONS)}")
+    return export_format, compression
+
+
+def _open_text(filename, compression):
+    if compression == 'gzip':
+        return gzip.open(filename, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd compressed exports require zstandard (pip install zstandard)")
+        writer = zstandard.ZstdCompressor().stream_writer(open(filename, 'wb'))
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8')
+
+
+class ResultExportWriter:
+    """
+    Write a test run and its pages to a file one page at a time.
+
+    Usage:
+        with ResultExportWriter('results.ndjson.gz') as writer:
+            writer.write_test_run(test_run)
+            for url, results in pages:
+                writer.write_page(url, results)
+    """
+
+    def __init__(self, filename, export_format=None, compression=None):
+        self.export_format, self.compression = infer_export_options(filename, export_format, compression)
+        self.filename = filename
+        self._file = _open_text(filename, self.compression)
+        self._pages_written = 0
+
+    def write_test_run(self, test_run):
+        """Write the test run document; must be called before any page"""
+        if self.export_format == 'ndjson':
+            self._file.write(json.dumps({'test_run': test_run}, default=str) + '\n')
+        else:
+            test_run_json = json.dumps(test_run, indent=2, default=str).replace('\n', '\n  ')
+            self._file.write('{\n  "test_run": ' + test_run_json + ',\n  "pages": {')
+
+    def write_page(self, url, results):
+        """Write one page's results"""
+        if self.export_format == 'ndjson':
+            self._file.write(json.dumps({'url': url, 'results': results}, default=str) + '\n')
+        else:
+            separator = ',\n    ' if self._pages_written else '\n    '
+            results_json = json.dumps(results, indent=2, default=str).replace('\n', '\n    ')
+            self._file.write(separator + json.dumps(url) + ': ' + results_json)
+        self._pages_written += 1
+
+    @property
+    def pages_written(self):
+        return self._pages_written
+
+    def close(self):
+        """Finish the document and close the file"""
+        if self._file is None:
+            return
+        if self.export_format == 'json':
+            self._file.write('\n  }\n}' if self._pages_written else '}\n}')
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,507 @@
+"""
+Per-test storage layout for page results.
+
+A completed page result nests every module's output under
+results.accessibility.tests, plus one entry per breakpoint under
+results.accessibility.responsive_testing. Stored as one document, that can
+reach hundreds of KB on heavy pages (close to the BSON limit), and every
+status update rewrites all of it.
+
+With the split layout, each test's result is stored as its own document in
+the test_results collection, keyed by (test_run_id, url, test_name,
+breakpoint). The page_results document keeps only the envelope: status,
+errors, timestamps, and the list of split parts under
+accessibility.split_tests. assemble_page_result puts the original nested
+structure back together from the envelope and whichever parts were loaded.
+
+With deduplication, parts are not stored per page at all. Each result is
+hashed over its canonical JSON and stored once in result_blobs under that
+hash; the envelope's split_tests entries carry the hash as a third element.
+Test modules stamp their output with the time it was produced, so the
+'timestamp' keys are taken out of a result before it is hashed and stored:
+they are kept in the envelope, as a fourth element listing each removed
+timestamp's path and value, and put back when the result is loaded.
+Re-crawling an unchanged site then writes little more than the envelopes.
+
+AccessibilityDB and AsyncAccessibilityDB share this module's document and
+query builders (page_result_writes, parts_query, collect_batch_refs, ...)
+and only differ in how they send them to Mongo, so the storage format is
+defined in one place.
+"""
+import copy
+import hashlib
+import json
+from datetime import datetime
+
+# Handle import errors gracefully - allows both package and direct imports
+try:
+    from src.test_with_mongo.domain_scheduler import get_domain
+except ImportError:
+    from domain_scheduler import get_domain
+
+TEST_RUNS_COLLECTION = 'test_runs'
+PAGE_RESULTS_COLLECTION = 'page_results'
+TEST_RESULTS_COLLECTION = 'test_results'
+RESULT_BLOBS_COLLECTION = 'result_blobs'
+RESPONSIVE_TEST_NAME = 'responsive_testing'
+CONSOLIDATED_TEST_NAME = 'responsive_testing.consolidated'
+TIMESTAMP_KEY = 'timestamp'
+
+
+def split_page_result(page_result):
+    """
+    Split a page result into its envelope and per-test parts
+
+    Args:
+        page_result: The page result as built by process_page
+
+    Returns:
+        tuple: (envelope, parts) where parts is a list of
+            (test_name, breakpoint, result) tuples; breakpoint is None for
+            results that are not per breakpoint
+    """
+    accessibility = page_result.get('accessibility')
+    if not isinstance(accessibility, dict):
+        return page_result, []
+
+    accessibility = dict(accessibility)
+    parts = []
+    for test_name, result in (accessibility.pop('tests', None) or {}).items():
+        parts.append((test_name, None, result))
+
+    responsive = accessibility.get('responsive_testing')
+    if isinstance(responsive, dict):
+        responsive = dict(responsive)
+        for breakpoint, result in (responsive.pop('breakpoint_results', None) or {}).items():
+            parts.append((RESPONSIVE_TEST_NAME, str(breakpoint), result))
+        if 'consolidated' in responsive:
+            parts.append((CONSOLIDATED_TEST_NAME, None, responsive.pop('consolidated')))
+        accessibility['responsive_testing'] = responsive
+
+    accessibility['split_tests'] = [[test_name, breakpoint] for test_name, breakpoint, _ in parts]
+    envelope = dict(page_result)
+    envelope['accessibility'] = accessibility
+    return envelope, parts
+
+
+def strip_timestamps(result):
+    """
+    Copy a result without its 'timestamp' keys, at any depth
+
+    Returns:
+        tuple: (stripped, timestamps) where timestamps is a list of
+            [path, value] pairs for restore_timestamps
+    """
+    timestamps = []
+
+    def strip(value, path):
+        if isinstance(value, dict):
+            stripped = {}
+            for key, item in value.items():
+                if key == TIMESTAMP_KEY:
+                    timestamps.append([path + [key], item])
+                else:
+                    stripped[key] = strip(item, path + [key])
+            return stripped
+        if isinstance(value, (list, tuple)):
+            return [strip(item, path + [index]) for index, item in enumerate(value)]
+        return value
+
+    return strip(result, []), timestamps
+
+
+def restore_timestamps(result, timestamps):
+    """Put the timestamps removed by strip_timestamps back into a copy of the result"""
+    if not timestamps:
+        return result
+    result = copy.deepcopy(result)
+    for path, value in timestamps:
+        target = result
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+    return result
+
+
+def _canonical_hash(value):
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def result_hash(result):
+    """
+    SHA-256 of a result's canonical JSON without its timestamps, so equal
+    results hash equally regardless of key order and of when they were produced
+
+    >>> result_hash({'a': [{'b': 1, 'timestamp': '2025-01-01'}], 'timestamp': '2025-01-01'}) == \\
+    ...     result_hash({'timestamp': '2025-06-30', 'a': [{'timestamp': '2025-06-30', 'b': 1}]})
+    True
+    >>> result_hash({'a': 1, 'timestamp': 'x'}) == result_hash({'a': 2, 'timestamp': 'x'})
+    False
+    """
+    return _canonical_hash(strip_timestamps(result)[0])
+
+
+def dedup_page_result(page_result):
+    """
+    Split a page result into its envelope and content-addressed blobs
+
+    Returns:
+        tuple: (envelope, blobs) where blobs maps each result hash to the
+            result without its timestamps; the envelope lists
+            (test_name, breakpoint, hash[, timestamps]) entries
+    """
+    envelope, parts = split_page_result(page_result)
+    blobs = {}
+    if parts:
+        listed = []
+        for test_name, breakpoint, result in parts:
+            stripped, timestamps = strip_timestamps(result)
+            digest = _canonical_hash(stripped)
+            blobs[digest] = stripped
+            entry = [test_name, breakpoint, digest]
+            if timestamps:
+                entry.append(timestamps)
+            listed.append(entry)
+        envelope['accessibility']['split_tests'] = listed
+    return envelope, blobs
+
+
+def is_split(page_result):
+    """True if the page result is an envelope whose tests are stored separately"""
+    accessibility = (page_result or {}).get('accessibility')
+    return isinstance(accessibility, dict) and 'split_tests' in accessibility
+
+
+def _blob_entries(envelope, tests=None):
+    if not is_split(envelope):
+        return []
+    return [
+        item for item in envelope['accessibility']['split_tests']
+        if len(item) >= 3 and (tests is None or item[0] in tests)
+    ]
+
+
+def blob_refs(envelope, tests=None):
+    """
+    The (test_name, breakpoint, hash) entries of a deduplicated envelope,
+    optionally only those of the given tests
+    """
+    return [tuple(item[:3]) for item in _blob_entries(envelope, tests)]
+
+
+def blob_parts(envelope, blobs, tests=None):
+    """
+    Turn loaded blobs ({hash: result}) into parts for assemble_page_result,
+    with the envelope's timestamps put back into each result
+    """
+    return [
+        {'test_name': item[0], 'breakpoint': item[1],
+         'result': restore_timestamps(blobs[item[2]], item[3] if len(item) > 3 else None)}
+        for item in _blob_entries(envelope, tests)
+        if item[2] in blobs
+    ]
+
+
+def part_filter(test_run_id, url, test_name, breakpoint=None):
+    return {
+        'test_run_id': test_run_id,
+        'url': url,
+        'test_name': test_name,
+        'breakpoint': breakpoint
+    }
+
+
+def page_filter(test_run_id, url):
+    return {
+        'test_run_id': test_run_id,
+        'url': url
+    }
+
+
+def parts_query(test_run_id, url=None, test_names=None, urls=None):
+    """Query for the split test results of a run, optionally of one URL, several URLs or some tests"""
+    query = {'test_run_id': test_run_id}
+    if url is not None:
+        query['url'] = url
+    elif urls is not None:
+        query['url'] = {'$in': list(urls)}
+    if test_names is not None:
+        query['test_name'] = {'$in': list(test_names)}
+    return query
+
+
+def group_parts(parts):
+    """Group loaded test_results documents by URL"""
+    grouped = {}
+    for part in parts:
+        grouped.setdefault(part['url'], []).append(part)
+    return grouped
+
+
+def page_result_writes(test_run_id, url, page_result, split_results=False, dedup_results=False):
+    """
+    Build the upserts that store a page result in the chosen layout
+
+    Returns:
+        tuple: (blobs, writes) where blobs maps each result hash to the
+            result to store in result_blobs (see blob_writes), and writes is
+            a list of (collection, query, update) upserts; the page_results
+            envelope comes last, so it is never written before its parts
+    """
+    timestamp = datetime.now().isoformat()
+    parts = []
+    blobs = {}
+    if dedup_results:
+        page_result, blobs = dedup_page_result(page_result)
+    elif split_results:
+        page_result, parts = split_page_result(page_result)
+
+    writes = []
+    for test_name, breakpoint, result in parts:
+        part_query = part_filter(test_run_id, url, test_name, breakpoint)
+        writes.append((TEST_RESULTS_COLLECTION, part_query,
+                       {'$set': dict(part_query, timestamp=timestamp, result=result)}))
+
+    query = page_filter(test_run_id, url)
+    document = {
+        'test_run_id': test_run_id,
+        'url': url,
+        'domain': get_domain(url),
+        'timestamp': timestamp,
+        'results': page_result
+    }
+    writes.append((PAGE_RESULTS_COLLECTION, query, {'$set': document}))
+    return blobs, writes
+
+
+def blob_writes(blobs):
+    """(collection, query, update) upserts that store blobs without overwriting stored ones"""
+    return [
+        (RESULT_BLOBS_COLLECTION, {'_id': digest}, {'$setOnInsert': {'result': result}})
+        for digest, result in blobs.items()
+    ]
+
+
+def collect_batch_refs(page_results):
+    """
+    What must be loaded to assemble a batch of page_results documents
+
+    Returns:
+        tuple: (part_urls, digests) - the URLs whose parts are in
+            test_results, and the hashes of the results in result_blobs
+    """
+    split = [result for result in page_results if is_split(result.get('results'))]
+    part_urls = [result['url'] for result in split if not blob_refs(result['results'])]
+    digests = list({digest for result in split for _, _, digest in blob_refs(result['results'])})
+    return part_urls, digests
+
+
+def assemble_batch(page_results, parts, blobs):
+    """
+    Nest split or deduplicated test results back into a batch of
+    page_results documents, in place
+
+    Args:
+        page_results: page_results documents
+        parts: Loaded test_results documents grouped by URL
+        blobs: Loaded results by hash
+    """
+    for result in page_results:
+        envelope = result.get('results')
+        if is_split(envelope):
+            result['results'] = assemble_page_result(
+                envelope, parts.get(result['url'], []) + blob_parts(envelope, blobs)
+            )
+    return page_results
+
+
+def part_digests(envelope, test_name, breakpoint=None):
+    """Hashes of the deduplicated results of one test (and breakpoint) of an envelope"""
+    return [digest for _, part_breakpoint, digest in blob_refs(envelope, [test_name])
+            if part_breakpoint == breakpoint]
+
+
+def blob_test_result(envelope, blobs, test_name, breakpoint=None):
+    """One test's result from loaded blobs, with its timestamps put back, or None"""
+    for part in blob_parts(envelope, blobs, [test_name]):
+        if part['breakpoint'] == breakpoint:
+            return part['result']
+    return None
+
+
+def reusable_result_query(url, fingerprint, exclude_test_run_id=None, tests=None):
+    """
+    Query for completed results of a URL with the same DOM/CSS fingerprint,
+    from another test run and, when tests is given, that ran all of them
+    """
+    query = {
+        'url': url,
+        'results.fingerprint': fingerprint,
+        'results.status': 'completed'
+    }
+    if exclude_test_run_id:
+        query['test_run_id'] = {'$ne': exclude_test_run_id}
+    if tests is not None:
+        query['results.tests'] = {'$all': list(tests)}
+    return query
+
+
+def assemble_page_result(envelope, parts):
+    """
+    Rebuild the nested page result from its envelope and loaded parts
+
+    Args:
+        envelope: The page result stored in page_results
+        parts: test_results documents (or dicts with test_name, breakpoint
+            and result) for this page; parts not listed in the envelope,
+            e.g. left over from an earlier attempt, are ignored
+
+    Returns:
+        dict: The page result with the loaded tests nested back in place
+    """
+    if not is_split(envelope):
+        return envelope
+
+    accessibility = dict(envelope['accessibility'])
+    listed = [tuple(item[:2]) for item in accessibility.pop('split_tests')]
+    by_key = {(part['test_name'], part.get('breakpoint')): part['result'] for part in parts}
+
+    tests = {}
+    responsive = dict(accessibility.get('responsive_testing') or {})
+    breakpoint_results = {}
+    for test_name, breakpoint in listed:
+        if (test_name, breakpoint) not in by_key:
+            continue
+        result = by_key[(test_name, breakpoint)]
+        if test_name == RESPONSIVE_TEST_NAME and breakpoint is not None:
+            breakpoint_results[breakpoint] = result
+        elif test_name == CONSOLIDATED_TEST_NAME:
+            responsive['consolidated'] = result
+        else:
+            tests[test_name] = result
+
+    accessibility['tests'] = tests
+    if 'responsive_testing' in accessibility:
+        responsive['breakpoint_results'] = breakpoint_results
+        accessibility['responsive_testing'] = responsive
+
+    page_result = dict(envelope)
+    page_result['accessibility'] = accessibility
+    return page_result
+
+
+def _object_keys(path):
+    # Keys of an embedded document, or [] if it is missing or not a document
+    return {
+        '$cond': [
+            {'$eq': [{'$type': path}, 'object']},
+            {'$map': {'input': {'$objectToArray': path}, 'in': '$$this.k'}},
+            []
+        ]
+    }
+
+
+def result_summary_pipeline(test_run_id):
+    """
+    Aggregation pipeline that reduces each page result of a test run to what
+    the post-run verification reports, on the server, so the nested test
+    results never cross the wire
+    """
+    responsive = '$results.accessibility.responsive_testing'
+    return [
+        {'$match': {'test_run_id': test_run_id}},
+        {'$project': {
+            '_id': 0,
+            'url': 1,
+            'status': '$results.status',
+            'errors': {'$size': {'$ifNull': ['$results.errors', []]}},
+            'tests': _object_keys('$results.accessibility.tests'),
+            'breakpoints': f'{responsive}.breakpoints',
+            'breakpoint_results': {'$size': _object_keys(f'{responsive}.breakpoint_results')},
+            'consolidated': f'{responsive}.consolidated.summary',
+            'split_tests': '$results.accessibility.split_tests'
+        }}
+    ]
+
+
+def stored_result_summary(summary):
+    """
+    Resolve a result_summary_pipeline document for any storage layout
+
+    Returns:
+        dict: url, status, errors, tests, breakpoints, breakpoint_results and
+            consolidated; consolidated is the consolidated summary, True when
+            it is stored separately, or None when there is none
+    """
+    summary = dict(summary)
+    split_tests = summary.pop('split_tests', None)
+    if split_tests is not None:
+        summary['tests'] = [
+            item[0] for item in split_tests
+            if item[0] not in (RESPONSIVE_TEST_NAME, CONSOLIDATED_TEST_NAME)
+        ]
+        summary['breakpoint_results'] = sum(1 for item in split_tests if item[0] == RESPONSIVE_TEST_NAME)
+        if any(item[0] == CONSOLIDATED_TEST_NAME for item in split_tests):
+            summary['consolidated'] = True
+    summary.setdefault('consolidated', None)
+    return summary
+
+
+# Indexes of each collection, as (collection, keys, options)
+INDEXES = [
+    (PAGE_RESULTS_COLLECTION, [('url', 1), ('test_run_id', 1)], {}),
+    (PAGE_RESULTS_COLLECTION, [('test_run_id', 1), ('results.status', 1), ('url', 1)], {}),
+    (PAGE_RESULTS_COLLECTION, 'timestamp', {}),
+    (PAGE_RESULTS_COLLECTION, [('test_run_id', 1), ('domain', 1), ('url', 1)], {}),
+    (PAGE_RESULTS_COLLECTION, [('url', 1), ('results.fingerprint', 1), ('timestamp', -1)], {}),
+    (TEST_RUNS_COLLECTION, 'timestamp', {}),
+    (TEST_RESULTS_COLLECTION, [('test_run_id', 1), ('url', 1), ('test_name', 1), ('breakpoint', 1)],
+     {'unique': True})
+]
+
+
+def test_run_document(settings, documentation=None):
+    """The test_runs document of a new test run"""
+    test_run = {
+        'timestamp_start': datetime.now().isoformat(),
+        'status': 'in_progress',
+        'settings': settings
+    }
+    if documentation:
+        test_run['documentation'] = documentation
+    return test_run
+
+
+def reopen_update(settings=None):
+    """Update that reopens a test run, recording the resume in its history"""
+    resume_entry = {'timestamp': datetime.now().isoformat()}
+    if settings:
+        resume_entry['settings'] = settings
+    return {
+        '$set': {'status': 'in_progress'},
+        '$unset': {'timestamp_end': ''},
+        '$push': {'resumes': resume_entry}
+    }
+
+
+def completion_update(summary=None):
+    """Update that marks a test run complete, with its summary"""
+    update_data = {
+        'status': 'completed',
+        'timestamp_end': datetime.now().isoformat()
+    }
+    if summary:
+        update_data['summary'] = summary
+    return {'$set': update_data}
+
+
+def finished_urls_query(test_run_id, statuses=('completed',)):
+    return {
+        'test_run_id': test_run_id,
+        'results.status': {'$in': list(statuses)}
+    }
+
+
+def page_timings_query(test_run_id):
+    return {'test_run_id': test_run_id, 'results.timings': {'$exists': True}}
@@ -1,18 +1,24 @@
 """
 Template for adding section reporting to test modules
 """
+import logging
 from datetime import datetime
 # Handle import errors gracefully - allows both package and direct imports
 try:
     # Try direct import first (for when run as a script)
     from src.test_with_mongo.page_section_util import enrich_violations_with_section_info
+    from src.test_with_mongo.log_config import get_logger
 except ImportError:
     try:
         # Then try relative import (for when imported as a module)
         from .page_section_util import enrich_violations_with_section_info
+        from .log_config import get_logger
     except ImportError:
         # Fallback to non-relative import 
         from page_section_util import enrich_violations_with_section_info
+        from log_config import get_logger
+
+logger = get_logger(__name__)
 
 
 def add_section_info_to_test_results(page, test_results):
@@ -68,30 +74,26 @@ def calculate_section_statistics(violations):
 
 def print_violations_with_sections(violations):
     """
-    Print violations with section information for debugging
+    Log violations with section information for debugging
+    
+    Only does any work when debug logging is enabled for this module.
     
     Args:
         violations: List of violations with section information
     """
-    if not violations:
+    if not violations or not logger.isEnabledFor(logging.DEBUG):
         return
         
-    print("\nViolations by Page Section:")
     for violation in violations:
         section_info = violation.get('section', {})
-        section_name = section_info.get('section_name', 'Unknown Section')
-        
-        print(f"\nElement: {violation.get('element', 'Unknown Element')}")
-        if 'issue' in violation:
-            print(f"Issue: {violation['issue']}")
-        if 'description' in violation:
-            print(f"Description: {violation['description']}")
-        if 'role' in violation:
-            print(f"Role: {violation['role']}")
-        print(f"Section: {section_name}")
+        details = [f"Element: {violation.get('element', 'Unknown Element')}"]
+        for key in ('issue', 'description', 'role'):
+            if key in violation:
+                details.append(f"{key.capitalize()}: {violation[key]}")
+        details.append(f"Section: {section_info.get('section_name', 'Unknown Section')}")
         if 'xpath' in violation:
-            print(f"XPath: {violation['xpath']}")
-        print("-" * 50)
+            details.append(f"XPath: {violation['xpath']}")
+        logger.debug("Violation by page section: %s", '; '.join(details))
 
 """
 Example usage in a test module:
@@ -0,0 +1,252 @@
+"""
+Multi-process crawling for large URL files.
+
+A single event loop becomes CPU bound once it is deserializing large result
+dicts and consolidating responsive results for many concurrent pages. The
+ShardCoordinator splits the URL list into per-domain shards and runs each in its
+own OS process. All workers write into the same test run; the coordinator
+merges their progress, re-queues the unfinished URLs of any worker that
+crashes, and leaves completing the test run to its caller so that
+complete_test_run is called exactly once.
+"""
+import asyncio
+import multiprocessing
+import platform
+import queue
+from datetime import datetime
+
+# Handle import errors gracefully - allows both package and direct imports
+try:
+    from src.test_with_mongo.domain_scheduler import group_by_domain
+except ImportError:
+    from domain_scheduler import group_by_domain
+
+DEFAULT_MAX_ATTEMPTS = 2
+
+
+def run_shard_worker(worker_id, shard, total, crawl_options, test_run_id, progress_queue):
+    """
+    Entry point of a worker process. Tests every URL in its shard and reports
+    each page's progress to the coordinator.
+
+    Args:
+        worker_id: Identifier of this worker, used in progress messages
+        shard: List of (index, url) tuples to process
+        total: Total number of URLs in the whole run
+        crawl_options: Crawl settings shared with the single-process mode
+        test_run_id: ID of the shared test run
+        progress_queue: multiprocessing queue for progress messages
+    """
+    # Imported here so each process builds its own Mongo client and browsers
+    from src.test_with_mongo.database import AccessibilityDB
+    from src.test_with_mongo.async_database import AsyncAccessibilityDB
+    from src.test_with_mongo.a11yTestMongo import crawl_urls
+    from src.test_with_mongo.log_config import configure_logging
+
+    # Spawned workers start without the parent's logging configuration
+    if crawl_options.get('log_level'):
+        configure_logging(crawl_options['log_level'], crawl_options.get('log_modules'))
+
+    if platform.system() == 'Windows':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    def report(index, url, status):
+        progress_queue.put(('page', worker_id, index, url, status))
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if crawl_options.get('async_db'):
+        db = loop.run_until_complete(
+            AsyncAccessibilityDB.connect(db_name=crawl_options['db_name'], create_if_not_exists=True,
+                                         split_results=crawl_options.get('split_results', False),
+                                         dedup_results=crawl_options.get('dedup_results', False))
+        )
+    else:
+        db = AccessibilityDB(db_name=crawl_options['db_name'], create_if_not_exists=True,
+                             write_buffer_size=crawl_options.get('write_buffer_size', 0),
+                             flush_interval=crawl_options.get('flush_interval'),
+                             split_results=crawl_options.get('split_results', False),
+                             dedup_results=crawl_options.get('dedup_results', False))
+    try:
+        loop.run_until_complete(crawl_urls(db, test_run_id, shard, total, crawl_options, report))
+    finally:
+        loop.close()
+        # Write out any buffered page results before the process exits
+        db.close()
+    progress_queue.put(('finished', worker_id))
+
+
+class ShardCoordinator:
+    """
+    Runs shards of a URL list in separate processes under one test run.
+
+    Usage:
+        coordinator = ShardCoordinator(db, test_run_id, indexed_urls, 4, crawl_options)
+        progress = coordinator.run()
+    """
+
+    def __init__(self, db, test_run_id, indexed_urls, workers, crawl_options,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            db: AccessibilityDB of the coordinating process
+            test_run_id: ID of the shared test run
+            indexed_urls: List of (index, url) tuples to process
+            workers: Maximum number of worker processes running at once
+            crawl_options: Crawl settings passed to every worker
+            max_attempts: How many times a URL is handed to a worker before it
+                is recorded as an error
+        """
+        self.db = db
+        self.test_run_id = test_run_id
+        self.indexed_urls = list(indexed_urls)
+        self.total = len(self.indexed_urls)
+        self.workers = max(1, workers)
+        self.crawl_options = crawl_options
+        self.max_attempts = max_attempts
+
+        # spawn gives every worker a clean interpreter without inherited
+        # Mongo sockets or event loop state
+        self._context = multiprocessing.get_context('spawn')
+        self._progress_queue = self._context.Queue()
+        self._pending_shards = []
+        self._running = {}
+        self._next_worker_id = 1
+        self._attempts = {}
+        self.progress = {
+            'total': self.total,
+            'finished': 0,
+            'by_status': {},
+            'requeued': 0,
+            'worker_crashes': 0
+        }
+
+    def _split_shards(self, indexed_urls, count):
+        """
+        Split URLs into shards by domain so each site's politeness limits are
+        enforced by a single process. Domains are assigned largest first to the
+        currently smallest shard to keep the shards balanced.
+        """
+        groups = group_by_domain(indexed_urls)
+        count = max(1, min(count, len(groups)))
+        shards = [[] for _ in range(count)]
+        for domain_urls in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(domain_urls)
+        return [sorted(shard) for shard in shards if shard]
+
+    def _start_worker(self, shard):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        for index, url in shard:
+            self._attempts[index] = self._attempts.get(index, 0) + 1
+
+        process = self._context.Process(
+            target=run_shard_worker,
+            args=(worker_id, shard, self.total, self.crawl_options, self.test_run_id, self._progress_queue),
+            name=f"a11y-shard-{worker_id}"
+        )
+        process.start()
+        self._running[worker_id] = {
+            'process': process,
+            'remaining': {index: url for index, url in shard},
+            'finished': False
+        }
+        print(f"Started worker {worker_id} (pid {process.pid}) with {len(shard)} URLs")
+
+    def _handle_message(self, message):
+        kind, worker_id = message[0], message[1]
+        worker = self._running.get(worker_id)
+        if worker is None:
+            return
+
+        if kind == 'finished':
+            worker['finished'] = True
+            return
+
+        _, _, index, url, status = message
+        if status == 'started':
+            return
+
+        if worker['remaining'].pop(index, None) is not None:
+            self.progress['finished'] += 1
+            self.progress['by_status'][status] = self.progress['by_status'].get(status, 0) + 1
+            print(f"Progress: {self.progress['finished']}/{self.total} pages "
+                  f"(worker {worker_id}: {url} -> {status})")
+
+    def _drain_messages(self, timeout):
+        try:
+            self._handle_message(self._progress_queue.get(timeout=timeout))
+        except queue.Empty:
+            return
+        while True:
+            try:
+                self._handle_message(self._progress_queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _record_abandoned(self, index, url):
+        """Record a URL that kept crashing its worker as an error"""
+        error_message = f"Worker process crashed {self._attempts.get(index, 0)} times while testing {url}"
+        print(error_message)
+        self.db.save_page_result(self.test_run_id, url, {
+            'status': 'error',
+            'screenshot': None,
+            'errors': [error_message],
+            'timestamp_start': datetime.now().isoformat(),
+            'index': index
+        })
+        self.progress['finished'] += 1
+        self.progress['by_status']['error'] = self.progress['by_status'].get('error', 0) + 1
+
+    def _reap_workers(self):
+        for worker_id, worker in list(self._running.items()):
+            process = worker['process']
+            if process.is_alive():
+                continue
+            process.join()
+            # Pick up any progress the worker sent right before exiting
+            self._drain_messages(timeout=0)
+            del self._running[worker_id]
+
+            remaining = sorted(worker['remaining'].items())
+            if worker['finished'] and process.exitcode == 0 and not remaining:
+                continue
+
+            self.progress['worker_crashes'] += 1
+            print(f"Worker {worker_id} exited with code {process.exitcode}; "
+                  f"{len(remaining)} URLs unfinished")
+
+            retry = []
+            for index, url in remaining:
+                if self._attempts.get(index, 0) >= self.max_attempts:
+                    self._record_abandoned(index, url)
+                else:
+                    retry.append((index, url))
+            if retry:
+                self.progress['requeued'] += len(retry)
+                self._pending_shards.append(retry)
+
+    def run(self):
+        """
+        Run all shards to completion
+
+        Returns:
+            dict: Merged progress counters for the run
+        """
+        self._pending_shards = self._split_shards(self.indexed_urls, self.workers)
+        self.progress['workers'] = len(self._pending_shards)
+        print(f"Sharding {self.total} URLs across {len(self._pending_shards)} worker processes")
+        if len(self._pending_shards) < self.workers:
+            print(f"Warning: only {len(self._pending_shards)} of {self.workers} workers are used; each domain is "
+                  f"tested by a single worker so its politeness limits hold. Use --concurrency and "
+                  f"--max-per-domain to test more pages of a site at once.")
+
+        while self._pending_shards or self._running:
+            while self._pending_shards and len(self._running) < self.workers:
+                self._start_worker(self._pending_shards.pop(0))
+            self._drain_messages(timeout=1.0)
+            self._reap_workers()
+
+        print(f"All workers finished: {self.progress['finished']}/{self.total} pages, "
+              f"{self.progress['requeued']} re-queued, {self.progress['worker_crashes']} worker crashes")
+        return self.progress
@@ -1,4 +1,5 @@
 from datetime import datetime
+import re
 
 
 
@@ -13,6 +14,14 @@ except ImportError:
     except ImportError:
         # Fallback to non-relative import 
         from section_reporting_template import add_section_info_to_test_results, print_violations_with_sections
+
+try:
+    from src.test_with_mongo.dom_snapshot import get_dom_snapshot
+except ImportError:
+    try:
+        from .dom_snapshot import get_dom_snapshot
+    except ImportError:
+        from dom_snapshot import get_dom_snapshot
 # Test metadata for documentation and reporting
 TEST_DOCUMENTATION = {
     "testName": "CSS Animations Analysis",
@@ -67,37 +76,41 @@ TEST_DOCUMENTATION = {
     ]
 }
 
+def parse_duration_ms(duration):
+    """Convert the first value of a computed animation-duration to milliseconds"""
+    match = re.match(r'\s*(-?[\d.]+)(ms|s)?', duration or '')
+    if not match:
+        return 0
+    value = float(match.group(1))
+    return value if match.group(2) == 'ms' else value * 1000
+
+def find_animated_elements(snapshot):
+    """Elements inside <body> with a computed animation, read from the DOM snapshot"""
+    elements = []
+    for index in snapshot:
+        if not snapshot.in_body(index) or snapshot.style(index, 'animationName') == 'none':
+            continue
+        elements.append({
+            'tag': snapshot.tag(index),
+            'id': snapshot.element_id(index),
+            'class': snapshot.class_name(index),
+            'xpath': snapshot.xpath(index),
+            'animation': {
+                'name': snapshot.style(index, 'animationName'),
+                'duration': snapshot.style(index, 'animationDuration'),
+                'iterationCount': snapshot.style(index, 'animationIterationCount'),
+                'playState': snapshot.style(index, 'animationPlayState')
+            }
+        })
+    return elements
+
 async def test_animations(page):
     """
     Test CSS animations for accessibility requirements
     """
     try:
-        animation_data = await page.evaluate('''
+        results = await page.evaluate('''
             () => {
-                // Function to generate XPath for elements
-                function getFullXPath(element) {
-                    if (!element) return '';
-                    
-                    function getElementIdx(el) {
-                        let count = 1;
-                        for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                            if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                                count++;
-                            }
-                        }
-                        return count;
-                    }
-
-                    let path = '';
-                    while (element && element.nodeType === 1) {
-                        let idx = getElementIdx(element);
-                        let tagName = element.tagName.toLowerCase();
-                        path = `/${tagName}[${idx}]${path}`;
-                        element = element.parentNode;
-                    }
-                    return path;
-                }
-                
                 function getAnimationDetails(styleSheet) {
                     const animations = [];
                     try {
@@ -169,32 +182,6 @@ async def test_animations(page):
                     return animations;
                 }
 
-                function findAnimatedElements() {
-                    const elements = [];
-                    // Only look for elements within the body
-                    const all = document.body.querySelectorAll('*');
-                    
-                    all.forEach(element => {
-                        const style = window.getComputedStyle(element);
-                        if (style.animation || style.animationName !== 'none') {
-                            elements.push({
-                                tag: element.tagName.toLowerCase(),
-                                id: element.id || null,
-                                class: element.className || null,
-                                xpath: getFullXPath(element),
-                                animation: {
-                                    name: style.animationName,
-                                    duration: style.animationDuration,
-                                    iterationCount: style.animationIterationCount,
-                                    playState: style.animationPlayState
-                                }
-                            });
-                        }
-                    });
-                    
-                    return elements;
-                }
-                                         
                 const results = {
                     styleSheets: Array.from(document.styleSheets).map(sheet => sheet.href || 'inline'),
                     animations: [],
@@ -218,77 +205,73 @@ async def test_animations(page):
                         a.type === 'media-query'));
                 });
 
-                // Find elements with computed animations
-                results.animatedElements = findAnimatedElements();
-
                 // Check for reduced motion support
                 results.summary.hasReducedMotionSupport = results.mediaQueries.some(
                     mq => mq.condition.includes('prefers-reduced-motion')
                 );
 
-                // Update summary and check for violations
                 results.summary.totalAnimations = results.animations.filter(
                     a => a.type === 'keyframes' || a.type === 'style'
                 ).length;
 
-                if (results.summary.totalAnimations > 0 && !results.summary.hasReducedMotionSupport) {
-                    results.violations.push({
-                        type: 'no-reduced-motion-support',
-                        issue: 'Animations present without prefers-reduced-motion media query',
-                        details: 'Animations present without prefers-reduced-motion media query'
-                    });
-                }
+                return results;
+            }
+        ''')
 
-                results.animatedElements.forEach(element => {
-                    const iterationCount = element.animation.iterationCount;
-                    if (iterationCount === 'infinite') {
-                        results.summary.infiniteAnimations++;
-                        results.violations.push({
-                            type: 'infinite-animation',
-                            element: element.tag,
-                            id: element.id,
-                            class: element.class,
-                            xpath: element.xpath,
-                            issue: 'Infinite animation can cause accessibility issues',
-                            description: `Element has an infinite animation (animation-iteration-count: infinite) which can cause issues for users with vestibular disorders`
-                        });
-                    }
+        # Animated elements come from the shared DOM snapshot instead of a second DOM walk
+        snapshot = await get_dom_snapshot(page)
+        results['animatedElements'] = find_animated_elements(snapshot)
 
-                    const duration = parseFloat(element.animation.duration) * 
-                        (element.animation.duration.includes('ms') ? 1 : 1000);
-                    if (duration > 5000) {
-                        results.summary.longDurationAnimations++;
-                        results.violations.push({
-                            type: 'long-duration-animation',
-                            element: element.tag,
-                            id: element.id,
-                            class: element.class,
-                            xpath: element.xpath,
-                            issue: 'Animation duration exceeds 5 seconds',
-                            description: `Long animation duration (${element.animation.duration}) which can be distracting or disorienting`,
-                            duration: element.animation.duration
-                        });
-                    }
-                });
+        if results['summary']['totalAnimations'] > 0 and not results['summary']['hasReducedMotionSupport']:
+            results['violations'].append({
+                'type': 'no-reduced-motion-support',
+                'issue': 'Animations present without prefers-reduced-motion media query',
+                'details': 'Animations present without prefers-reduced-motion media query'
+            })
 
-                return {
-                    pageFlags: {
-                        hasAnimations: results.summary.totalAnimations > 0,
-                        lacksReducedMotionSupport: results.summary.totalAnimations > 0 && 
-                                                 !results.summary.hasReducedMotionSupport,
-                        hasInfiniteAnimations: results.summary.infiniteAnimations > 0,
-                        hasLongAnimations: results.summary.longDurationAnimations > 0,
-                        details: {
-                            totalAnimations: results.summary.totalAnimations,
-                            infiniteAnimations: results.summary.infiniteAnimations,
-                            longDurationAnimations: results.summary.longDurationAnimations,
-                            hasReducedMotionSupport: results.summary.hasReducedMotionSupport
-                         }
-                    },
-                    results: results
-                };
-            }
-        ''')
+        for element in results['animatedElements']:
+            if element['animation']['iterationCount'] == 'infinite':
+                results['summary']['infiniteAnimations'] += 1
+                results['violations'].append({
+                    'type': 'infinite-animation',
+                    'element': element['tag'],
+                    'id': element['id'],
+                    'class': element['class'],
+                    'xpath': element['xpath'],
+                    'issue': 'Infinite animation can cause accessibility issues',
+                    'description': 'Element has an infinite animation (animation-iteration-count: infinite) which can cause issues for users with vestibular disorders'
+                })
+
+            duration = parse_duration_ms(element['animation']['duration'])
+            if duration > 5000:
+                results['summary']['longDurationAnimations'] += 1
+                results['violations'].append({
+                    'type': 'long-duration-animation',
+                    'element': element['tag'],
+                    'id': element['id'],
+                    'class': element['class'],
+                    'xpath': element['xpath'],
+                    'issue': 'Animation duration exceeds 5 seconds',
+                    'description': f"Long animation duration ({element['animation']['duration']}) which can be distracting or disorienting",
+                    'duration': element['animation']['duration']
+                })
+
+        summary = results['summary']
+        animation_data = {
+            'pageFlags': {
+                'hasAnimations': summary['totalAnimations'] > 0,
+                'lacksReducedMotionSupport': summary['totalAnimations'] > 0 and not summary['hasReducedMotionSupport'],
+                'hasInfiniteAnimations': summary['infiniteAnimations'] > 0,
+                'hasLongAnimations': summary['longDurationAnimations'] > 0,
+                'details': {
+                    'totalAnimations': summary['totalAnimations'],
+                    'infiniteAnimations': summary['infiniteAnimations'],
+                    'longDurationAnimations': summary['longDurationAnimations'],
+                    'hasReducedMotionSupport': summary['hasReducedMotionSupport']
+                }
+            },
+            'results': results
+        }
 
         # Add section information to results
         animation_data['results'] = add_section_info_to_test_results(page, animation_data['results'])
@@ -71,29 +71,7 @@ async def test_document_links(page):
     try:
         documents = await page.evaluate('''
     () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
+        const { getFullXPath } = window.__a11y;
         
         {
                 const documentExtensions = [
@@ -116,33 +116,10 @@ async def test_event_handlers(page):
     Test event handlers and tab order accessibility requirements
     """
     try:
-        # Inject a helper function that always generates full Chrome-style XPath
-        await page.evaluate('''
-            window.getFullXPath = function(element) {
-                if (!element) return '';
-                
-                const path = [];
-                while (element && element.nodeType === 1) {
-                    let index = 0;
-                    for (let sibling = element.previousSibling; sibling; sibling = sibling.previousSibling) {
-                        if (sibling.nodeType === 1 && sibling.tagName === element.tagName) {
-                            index++;
-                        }
-                    }
-                    
-                    const tagName = element.tagName.toLowerCase();
-                    const pathIndex = index ? `[${index + 1}]` : '';
-                    path.unshift(tagName + pathIndex);
-                    
-                    element = element.parentNode;
-                }
-                
-                return '/' + path.join('/');
-            };
-        ''')
-        
         event_data = await page.evaluate('''
             () => {
+                const { getFullXPath } = window.__a11y;
+
                 function categorizeEvent(eventName) {
                     if (['click', 'mousedown', 'mouseup', 'mouseover', 'mouseout', 'mousemove', 'dblclick'].includes(eventName)) {
                         return 'mouse'
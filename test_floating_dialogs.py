@@ -15,6 +15,14 @@ except ImportError:
     except ImportError:
         # Fallback to non-relative import 
         from section_reporting_template import add_section_info_to_test_results, print_violations_with_sections
+
+try:
+    from src.test_with_mongo.layout_stability import wait_for_layout_stable
+except ImportError:
+    try:
+        from .layout_stability import wait_for_layout_stable
+    except ImportError:
+        from layout_stability import wait_for_layout_stable
 # Test metadata for documentation and reporting
 TEST_DOCUMENTATION = {
     "testName": "Floating Dialog Accessibility Analysis",
@@ -192,9 +200,9 @@ async def test_floating_dialogs(page):
                     'height': original_viewport['height'] 
                 })
                 
-                # Wait for layout to stabilize - using asyncio.sleep for asynchronous waiting
+                # Wait for layout to stabilize
                 print("  Waiting for layout to stabilize")
-                await asyncio.sleep(0.5)  # 500ms - increased for better reliability
+                await wait_for_layout_stable(page)
                 
                 # Run the dialog evaluation at this breakpoint
                 # FIXED: using function parameter instead of f-string
@@ -203,47 +211,7 @@ async def test_floating_dialogs(page):
                     (currentBreakpoint) => {
                         console.log("Evaluating at width " + currentBreakpoint + "px");
                         
-                        function isVisible(element) {
-                            const style = window.getComputedStyle(element);
-                            return style.display !== 'none' && 
-                                   style.visibility !== 'hidden' && 
-                                   style.opacity !== '0';
-                        }
-
-                        function getFullXPath(element) {
-                            if (!element) return '';
-                            if (element === document.body) return '/html/body';
-                            
-                            let path = '';
-                            let current = element;
-                            
-                            while (current && current.nodeType === Node.ELEMENT_NODE) {
-                                let index = 1;
-                                let sibling = current.previousElementSibling;
-                                
-                                while (sibling) {
-                                    if (sibling.tagName === current.tagName) {
-                                        index++;
-                                    }
-                                    sibling = sibling.previousElementSibling;
-                                }
-                                
-                                const tagName = current.tagName.toLowerCase();
-                                const pathSegment = index === 1 ? 
-                                    `/${tagName}` : 
-                                    `/${tagName}[${index}]`;
-                                    
-                                path = pathSegment + path;
-                                current = current.parentElement;
-                                
-                                if (current === document.body) {
-                                    path = '/html/body' + path;
-                                    break;
-                                }
-                            }
-                            
-                            return path;
-                        }
+                        const { getFullXPath, isVisible } = window.__a11y;
 
                         function isInteractiveElement(element) {
                             // Check for naturally interactive elements
@@ -826,7 +794,7 @@ async def test_floating_dialogs(page):
         print(f"Viewport restored to: {original_viewport}")
         
         # Wait for the layout to stabilize after returning to original size
-        await asyncio.sleep(0.5)
+        await wait_for_layout_stable(page)
         
         # Check that all_breakpoint_results is valid
         print(f"\nStep 6: Checking all_breakpoint_results (length: {len(all_breakpoint_results)})")
@@ -1,6 +1,5 @@
 from datetime import datetime
 
-import asyncio  # Import asyncio for asynchronous sleep
 
 
 # Handle import errors gracefully - allows both package and direct imports
@@ -14,6 +13,14 @@ except ImportError:
     except ImportError:
         # Fallback to non-relative import 
         from section_reporting_template import add_section_info_to_test_results, print_violations_with_sections
+
+try:
+    from src.test_with_mongo.layout_stability import wait_for_layout_stable
+except ImportError:
+    try:
+        from .layout_stability import wait_for_layout_stable
+    except ImportError:
+        from layout_stability import wait_for_layout_stable
 # Test metadata for documentation and reporting
 TEST_DOCUMENTATION = {
     "testName": "Focus Management Analysis",
@@ -460,9 +467,9 @@ async def test_focus_management(page):
             'height': original_viewport['height'] 
         })
         
-        # Add a pause to allow the viewport to adjust
-        print("  Pausing for 0.5 seconds for viewport to adjust")
-        await asyncio.sleep(0.5)  # Pause for 0.5 seconds
+        # Wait for the layout to settle at the new viewport size
+        print("  Waiting for layout to stabilize")
+        await wait_for_layout_stable(page)
         
         try:
             # Run the focus management test at this breakpoint
@@ -471,41 +478,7 @@ async def test_focus_management(page):
                 (currentBreakpoint, cssAnalysis) => {
                     console.log("Evaluating at width " + currentBreakpoint + "px");
                     
-                    // Function to get full XPath for an element
-                    function getFullXPath(element) {
-                        if (!element) return '';
-                        if (element === document.body) return '/html/body';
-                        
-                        let path = '';
-                        let current = element;
-                        
-                        while (current && current.nodeType === Node.ELEMENT_NODE) {
-                            let index = 1;
-                            let sibling = current.previousElementSibling;
-                            
-                            while (sibling) {
-                                if (sibling.tagName === current.tagName) {
-                                    index++;
-                                }
-                                sibling = sibling.previousElementSibling;
-                            }
-                            
-                            const tagName = current.tagName.toLowerCase();
-                            const pathSegment = index === 1 ? 
-                                `/${tagName}` : 
-                                `/${tagName}[${index}]`;
-                                
-                            path = pathSegment + path;
-                            current = current.parentElement;
-                            
-                            if (current === document.body) {
-                                path = '/html/body' + path;
-                                break;
-                            }
-                        }
-                        
-                        return path;
-                    }
+                    const { getFullXPath } = window.__a11y;
                     
                     // Color and contrast calculation helper functions
                     function getRGBFromComputedStyle(color) {
@@ -529,19 +502,7 @@ async def test_focus_management(page):
                         };
                     }
 
-                    function getLuminance(r, g, b) {
-                        const [rs, gs, bs] = [r, g, b].map(c => {
-                            c = c / 255;
-                            return c <= 0.03928 ? c / 12.92 : Math.pow((c + 0.055) / 1.055, 2.4);
-                        });
-                        return 0.2126 * rs + 0.7152 * gs + 0.0722 * bs;
-                    }
-
-                    function getContrastRatio(l1, l2) {
-                        const lighter = Math.max(l1, l2);
-                        const darker = Math.min(l1, l2);
-                        return (lighter + 0.05) / (darker + 0.05);
-                    }
+                    const { getLuminance, getContrastRatio } = window.__a11y;
                     
                     // Determine if an element has a CSS-based focus indicator based on selectors
                     function hasCSSFocusIndicator(element) {
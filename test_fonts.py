@@ -97,29 +97,6 @@ async def test_fonts(page):
     try:
         font_data = await page.evaluate('''
     () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
         
         {
                 // Helper function to extract units from CSS values
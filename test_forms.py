@@ -118,56 +118,9 @@ async def test_forms(page):
     try:
         forms_data = await page.evaluate('''
     () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
+        const { getFullXPath, getLuminance, getContrastRatio, isVisible, parseColor: getRGBFromColor } = window.__a11y;
         
         {
-                function getLuminance(r, g, b) {
-                    const [rs, gs, bs] = [r, g, b].map(c => {
-                        c = c / 255;
-                        return c <= 0.03928 ? c / 12.92 : Math.pow((c + 0.055) / 1.055, 2.4);
-                    });
-                    return 0.2126 * rs + 0.7152 * gs + 0.0722 * bs;
-                }
-
-                function getContrastRatio(l1, l2) {
-                    const lighter = Math.max(l1, l2);
-                    const darker = Math.min(l1, l2);
-                    return (lighter + 0.05) / (darker + 0.05);
-                }
-
-                function getRGBFromColor(color) {
-                    const temp = document.createElement('div');
-                    temp.style.color = color;
-                    temp.style.display = 'none';
-                    document.body.appendChild(temp);
-                    const style = window.getComputedStyle(temp);
-                    const rgb = style.color.match(/\\d+/g).map(Number);
-                    document.body.removeChild(temp);
-                    return rgb;
-                }
-
                 function isInLandmark(element, landmarkRole) {
                     let current = element;
                     while (current && current !== document.body) {
@@ -191,13 +144,6 @@ async def test_forms(page):
                      };
                 }
 
-                function isVisible(element) {
-                    const style = window.getComputedStyle(element);
-                    return style.display !== 'none' && 
-                           style.visibility !== 'hidden' && 
-                           style.opacity !== '0';
-                }
-
                 function checkFieldsOnSameLine(input1, input2) {
                     const rect1 = input1.getBoundingClientRect();
                     const rect2 = input2.getBoundingClientRect();
@@ -164,6 +164,32 @@ TEST_DOCUMENTATION = {
 import json
 from datetime import datetime
 
+try:
+    from src.test_with_mongo.dom_snapshot import get_dom_snapshot
+except ImportError:
+    try:
+        from .dom_snapshot import get_dom_snapshot
+    except ImportError:
+        from dom_snapshot import get_dom_snapshot
+
+# Fixed or sticky elements starting this close to the top may be headers
+FIXED_HEADER_MAX_TOP = 100
+
+
+def find_fixed_top_elements(snapshot):
+    """
+    XPath and width of the fixed or sticky elements near the top of the
+    viewport, read from the DOM snapshot instead of a getComputedStyle sweep
+    """
+    candidates = []
+    for index in snapshot:
+        if snapshot.style(index, 'position') not in ('fixed', 'sticky'):
+            continue
+        rect = snapshot.rect(index)
+        if rect['top'] < FIXED_HEADER_MAX_TOP:
+            candidates.append([snapshot.xpath(index), rect['width']])
+    return candidates
+
 
 async def test_page_structure(page):
     """
@@ -178,32 +204,12 @@ async def test_page_structure(page):
     """
     print("Analyzing page structure...")
     
+    snapshot = await get_dom_snapshot(page)
+    fixed_top_elements = find_fixed_top_elements(snapshot)
+
     # Get the page structure using client-side JS
     structure_data = await page.evaluate('''
-    () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
+    (fixedTopElements) => {
         
         {
         function analyzePageStructure() {
@@ -403,31 +409,7 @@ async def test_page_structure(page):
             
             // XPath generation function
             function getXPath(element) {
-                if (!element) return null;
-                
-                try {
-                    // Special case for HTML
-                    if (element.tagName === 'HTML') return '/HTML[1]';
-                    
-                    // Use the document evaluate API to get an XPath
-                    const getElementXPath = function(element) {
-                        if (!element) return null;
-                        if (element === document.body) return '/HTML[1]/BODY[1]';
-                        
-                        let ix = 0;
-                        const siblings = element.parentNode.childNodes;
-                        
-                        for (let i = 0; i < siblings.length; i++) {
-                            const sibling = siblings[i];
-                            if (sibling === element) return getElementXPath(element.parentNode) + '/' + element.tagName + '[' + (ix + 1) + ']';
-                            if (sibling.nodeType === 1 && sibling.tagName === element.tagName) ix++;
-                        }
-                    };
-                    
-                    return getElementXPath(element);
-                } catch (e) {
-                    return null;
-                }
+                return element ? window.__a11y.getFullXPath(element) : null;
             }
             
             // Count interactive elements within a container
@@ -562,14 +544,13 @@ async def test_page_structure(page):
                         }
                     });
                 
-                // By sticky/fixed position
-                Array.from(document.querySelectorAll('*'))
-                    .filter(element => {
-                        const position = getComputedStyleSafe(element, 'position');
-                        const rect = element.getBoundingClientRect();
-                        return (position === 'fixed' || position === 'sticky') && 
-                                rect.top < 100 && rect.width > viewportWidth * 0.5;
-                    })
+                // By sticky/fixed position, as found in the DOM snapshot
+                fixedTopElements
+                    .filter(([xpath, width]) => width > viewportWidth * 0.5)
+                    .map(([xpath]) => document.evaluate(
+                        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+                    ).singleNodeValue)
+                    .filter(element => element)
                     .forEach(element => {
                         const isNew = !candidates.some(candidate => 
                             candidate.element === element || element.contains(candidate.element) || candidate.element.contains(element)
@@ -1746,7 +1727,7 @@ async def test_page_structure(page):
         }
         
         return analyzePageStructure();
-    }''')
+    }''', fixed_top_elements)
     
     # Process the data for summary information
     
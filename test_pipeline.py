@@ -0,0 +1,111 @@
+"""
+Dependency-aware scheduling of the enabled tests on one page.
+
+Every test in TEST_MODULES declares the inputs it reads, the inputs it
+produces for later tests and whether it mutates the page. A test becomes
+ready once the enabled tests producing its inputs, and the tests it
+requires, have finished. The ready read-only tests then run together, up to
+a concurrency limit, over one DOM snapshot collected for all of them. Tests
+that mutate the page (focus, timers, injected elements, viewport or text
+size) only run when no read-only test is ready, one at a time, and drop the
+shared snapshot afterwards so later tests see the page as it is.
+
+'dom_snapshot' is provided by the pipeline itself rather than by a test.
+"""
+import asyncio
+
+try:
+    from src.test_with_mongo.test_registry import TEST_MODULES
+    from src.test_with_mongo.dom_snapshot import get_dom_snapshot, invalidate_dom_snapshot
+    from src.test_with_mongo.log_config import get_logger
+except ImportError:
+    from test_registry import TEST_MODULES
+    from dom_snapshot import get_dom_snapshot, invalidate_dom_snapshot
+    from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def test_dependencies(tests):
+    """
+    Map each enabled test to the enabled tests it has to wait for: the
+    producers of its inputs and the tests it requires
+    """
+    producers = {}
+    for test_name in tests:
+        for produced in TEST_MODULES[test_name].get('produces', ()):
+            producers.setdefault(produced, []).append(test_name)
+
+    enabled = set(tests)
+    dependencies = {}
+    for test_name in tests:
+        spec = TEST_MODULES[test_name]
+        waits_for = {
+            producer for needed in spec.get('inputs', ())
+            for producer in producers.get(needed, ()) if producer != test_name
+        }
+        waits_for.update(required for required in spec.get('requires', ()) if required in enabled)
+        dependencies[test_name] = waits_for
+    return dependencies
+
+
+def plan_test_stages(tests):
+    """
+    Order the enabled tests into stages that run one after another
+
+    Returns:
+        list: (mutates, test_names) tuples; the tests of a read-only stage may
+            run concurrently, a mutating stage holds a single test
+
+    Raises:
+        ValueError: If the declared dependencies form a cycle
+    """
+    dependencies = test_dependencies(tests)
+    finished = set()
+    remaining = list(tests)
+    stages = []
+    while remaining:
+        ready = [test_name for test_name in remaining if dependencies[test_name] <= finished]
+        if not ready:
+            raise ValueError(f"Circular test dependencies between: {', '.join(remaining)}")
+        read_only = [test_name for test_name in ready if not TEST_MODULES[test_name].get('mutates')]
+        stage = (False, read_only) if read_only else (True, ready[:1])
+        stages.append(stage)
+        finished.update(stage[1])
+        remaining = [test_name for test_name in remaining if test_name not in finished]
+    return stages
+
+
+async def run_test_pipeline(page, tests, run_test, concurrency=1):
+    """
+    Run the enabled tests on a page in dependency order
+
+    Args:
+        page: The Puppeteer page object
+        tests: Names of the enabled tests
+        run_test: Coroutine function called with each test name; it runs the
+            test and stores its results
+        concurrency: Number of read-only tests to run at the same time
+    """
+    concurrency = max(1, concurrency or 1)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(test_name):
+        async with semaphore:
+            await run_test(test_name)
+
+    for mutates, stage in plan_test_stages(tests):
+        if mutates:
+            await run(stage[0])
+            invalidate_dom_snapshot(page)
+            continue
+
+        if any('dom_snapshot' in TEST_MODULES[test_name].get('inputs', ()) for test_name in stage):
+            # Collect the snapshot once, before the tests sharing it start
+            try:
+                await get_dom_snapshot(page)
+            except Exception as e:
+                logger.warning("Could not collect the shared DOM snapshot: %s", e)
+        if len(stage) > 1 and concurrency > 1:
+            logger.info("Running %d read-only tests, %d at a time: %s", len(stage), concurrency, ', '.join(stage))
+        await asyncio.gather(*(run(test_name) for test_name in stage))
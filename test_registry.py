@@ -0,0 +1,240 @@
+"""
+Registry of the accessibility test modules.
+
+Tests are registered by the name their results are stored under, together
+with the module and function that implement them. Nothing is imported until
+a test is enabled and first used, so a run that selects a few tests only
+pays for loading those modules and their TEST_DOCUMENTATION, which matters
+for the many short-lived shard worker processes.
+"""
+import importlib
+
+# Result name -> module, test function and progress message, in the order tests run.
+# 'requires' lists tests whose results the test depends on; 'arguments' lists
+# values passed after the page. For the test pipeline each test also declares
+# the 'inputs' it reads, the inputs it 'produces' for later tests, and whether
+# it 'mutates' the page (focus, timers, injected elements, viewport or text size).
+TEST_MODULES = {
+    'media_queries': {
+        'module': 'test_media_queries', 'function': 'test_media_queries',
+        'description': 'CSS media queries and responsive breakpoints',
+        'produces': ('breakpoints',)
+    },
+    'documents': {
+        'module': 'test_document_links', 'function': 'test_document_links',
+        'description': 'electronic documents',
+        'inputs': ('page_structure',)
+    },
+    'fonts': {
+        'module': 'test_fonts', 'function': 'test_fonts',
+        'description': 'fonts and text styles',
+        'mutates': True
+    },
+    'page_structure': {
+        'module': 'test_page_structure', 'function': 'test_page_structure',
+        'description': 'page structure for common elements',
+        'inputs': ('dom_snapshot',), 'produces': ('page_structure',)
+    },
+    'html_structure': {
+        'module': 'test_html_structure', 'function': 'test_html_structure',
+        'description': 'HTML structure', 'arguments': ('is_homepage',),
+        'inputs': ('page_structure',)
+    },
+    'focus_management': {
+        'module': 'test_focus_management', 'function': 'test_focus_management',
+        'description': 'focus management',
+        'mutates': True
+    },
+    'accessible_names': {
+        'module': 'test_accessible_names', 'function': 'test_accessible_names',
+        'description': 'accessible names',
+        'inputs': ('page_structure',)
+    },
+    'images': {
+        'module': 'test_images', 'function': 'test_images',
+        'description': 'images',
+        'inputs': ('page_structure',)
+    },
+    'videos': {
+        'module': 'test_videos', 'function': 'test_videos',
+        'description': 'videos',
+        'inputs': ('page_structure',)
+    },
+    'landmarks': {
+        'module': 'test_landmarks', 'function': 'test_landmarks',
+        'description': 'landmarks',
+        'inputs': ('page_structure',)
+    },
+    'forms': {
+        'module': 'test_forms', 'function': 'test_forms',
+        'description': 'forms',
+        'inputs': ('page_structure',)
+    },
+    'headings': {
+        'module': 'test_headings', 'function': 'test_headings',
+        'description': 'headings',
+        'inputs': ('page_structure',)
+    },
+    'read_more_links': {
+        'module': 'test_read_more_links', 'function': 'test_read_more_links',
+        'description': 'read more links',
+        'inputs': ('page_structure',)
+    },
+    'tabindex': {
+        'module': 'test_tabindex', 'function': 'test_tabindex',
+        'description': 'tabindex attributes',
+        'inputs': ('page_structure',)
+    },
+    'timers': {
+        'module': 'test_timers', 'function': 'test_timers',
+        'description': 'timers',
+        'inputs': ('page_structure',), 'mutates': True
+    },
+    'animations': {
+        'module': 'test_animations', 'function': 'test_animations',
+        'description': 'CSS animations',
+        'inputs': ('dom_snapshot', 'page_structure')
+    },
+    'maps': {
+        'module': 'test_maps', 'function': 'test_maps',
+        'description': 'digital maps',
+        'inputs': ('page_structure',)
+    },
+    'colors': {
+        'module': 'test_colors', 'function': 'test_colors',
+        'description': 'colors',
+        'inputs': ('page_structure',)
+    },
+    'tables': {
+        'module': 'test_tables', 'function': 'test_tables',
+        'description': 'tables',
+        'inputs': ('page_structure',)
+    },
+    'modals': {
+        'module': 'test_modals', 'function': 'test_modals',
+        'description': 'modal dialogs',
+        'inputs': ('page_structure',)
+    },
+    'events': {
+        'module': 'test_event_handlers', 'function': 'test_event_handlers',
+        'description': 'event handlers',
+        'inputs': ('page_structure',)
+    },
+    'title': {
+        'module': 'test_title_attribute', 'function': 'test_title_attribute',
+        'description': 'title attribute',
+        'inputs': ('page_structure',)
+    },
+    'lists': {
+        'module': 'test_lists', 'function': 'test_lists',
+        'description': 'lists',
+        'inputs': ('page_structure',)
+    },
+    'menus': {
+        'module': 'test_menus', 'function': 'test_menus',
+        'description': 'menus',
+        'inputs': ('page_structure',)
+    },
+    'floating_dialogs': {
+        'module': 'test_floating_dialogs', 'function': 'test_floating_dialogs',
+        'description': 'floating dialogs',
+        'mutates': True
+    },
+    'text_resize': {
+        'module': 'test_text_resize', 'function': 'test_text_resize',
+        'description': 'text resize',
+        'inputs': ('page_structure',), 'mutates': True
+    },
+    'responsive_accessibility': {
+        'module': 'test_responsive_accessibility', 'function': 'test_responsive_accessibility',
+        'description': 'responsive accessibility at each breakpoint', 'requires': ('media_queries',),
+        'inputs': ('breakpoints', 'dom_snapshot', 'page_structure'), 'mutates': True
+    }
+}
+
+# The tests run when none are selected
+DEFAULT_TESTS = ('media_queries', 'responsive_accessibility')
+
+_loaded_modules = {}
+
+
+def available_tests():
+    """Names of all registered tests, in the order they run"""
+    return list(TEST_MODULES)
+
+
+def parse_test_selection(selection):
+    """
+    Parse a comma separated --tests value
+
+    'all' selects every registered test and 'default' the DEFAULT_TESTS;
+    an empty selection means the defaults.
+    """
+    if not selection:
+        return list(DEFAULT_TESTS)
+    names = []
+    for name in (part.strip() for part in selection.split(',')):
+        if name == 'all':
+            names.extend(TEST_MODULES)
+        elif name == 'default':
+            names.extend(DEFAULT_TESTS)
+        elif name:
+            names.append(name)
+    return resolve_tests(names)
+
+
+def resolve_tests(names):
+    """
+    Validate test names and add the tests they require
+
+    Returns:
+        list: The enabled test names, in registry order
+
+    Raises:
+        ValueError: If a name is not a registered test
+    """
+    unknown = [name for name in names if name not in TEST_MODULES]
+    if unknown:
+        raise ValueError(f"Unknown test(s): {', '.join(unknown)}. Available tests: {', '.join(TEST_MODULES)}")
+
+    enabled = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in enabled:
+            enabled.add(name)
+            pending.extend(TEST_MODULES[name].get('requires', ()))
+    return [name for name in TEST_MODULES if name in enabled]
+
+
+def load_test_module(test_name):
+    """Import the module of a registered test on first use"""
+    module = _loaded_modules.get(test_name)
+    if module is None:
+        module_name = TEST_MODULES[test_name]['module']
+        try:
+            module = importlib.import_module(f'src.test_with_mongo.{module_name}')
+        except ImportError:
+            module = importlib.import_module(module_name)
+        _loaded_modules[test_name] = module
+    return module
+
+
+def load_test(test_name):
+    """Get the test function of a registered test, importing its module if needed"""
+    return getattr(load_test_module(test_name), TEST_MODULES[test_name]['function'])
+
+
+def collect_test_documentation(test_names):
+    """
+    Collect the TEST_DOCUMENTATION of the given tests
+
+    Returns:
+        dict: Test name to documentation, for the tests whose module has any
+    """
+    documentation = {}
+    for test_name in test_names:
+        test_documentation = getattr(load_test_module(test_name), 'TEST_DOCUMENTATION', None)
+        if test_documentation is not None:
+            documentation[test_name] = test_documentation
+    return documentation
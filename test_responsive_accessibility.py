@@ -12,6 +12,20 @@ except ImportError:
         # Fallback to non-relative import 
         from section_reporting_template import add_section_info_to_test_results, print_violations_with_sections
 import asyncio  # For sleep operations
+import logging
+
+try:
+    from src.test_with_mongo.dom_snapshot import get_dom_snapshot
+    from src.test_with_mongo.log_config import get_logger
+except ImportError:
+    try:
+        from .dom_snapshot import get_dom_snapshot
+        from .log_config import get_logger
+    except ImportError:
+        from dom_snapshot import get_dom_snapshot
+        from log_config import get_logger
+
+logger = get_logger(__name__)
 
 # Test metadata for documentation and reporting
 TEST_DOCUMENTATION = {
@@ -107,7 +121,7 @@ async def test_responsive_accessibility(page, breakpoint):
         dict: Results of responsive accessibility tests at this breakpoint
     """
     try:
-        print(f"Running responsive accessibility tests at {breakpoint}px breakpoint")
+        logger.debug("Running responsive accessibility tests at %spx breakpoint", breakpoint)
         
         # Initialize results for this breakpoint
         results = {
@@ -117,34 +131,34 @@ async def test_responsive_accessibility(page, breakpoint):
         }
         
         # 1. Test for content overflow issues
-        print("  Testing for content overflow issues...")
+        logger.debug("Testing for content overflow issues...")
         overflow_results = await test_content_overflow(page, breakpoint)
         results['tests']['overflow'] = overflow_results
         
         # 2. Test for touch target size issues (especially important at mobile breakpoints)
-        print("  Testing for touch target size issues...")
+        logger.debug("Testing for touch target size issues...")
         touch_target_results = await test_touch_targets(page, breakpoint)
         results['tests']['touchTargets'] = touch_target_results
         
         # 3. Test for font scaling issues
-        print("  Testing for font scaling issues...")
+        logger.debug("Testing for font scaling issues...")
         font_scaling_results = await test_font_scaling(page, breakpoint)
         results['tests']['fontScaling'] = font_scaling_results
         
         # 4. Test for fixed position elements that might cause issues
-        print("  Testing for fixed position element issues...")
+        logger.debug("Testing for fixed position element issues...")
         fixed_position_results = await test_fixed_position(page, breakpoint)
         results['tests']['fixedPosition'] = fixed_position_results
         
         # 5. Test for content stacking order issues
-        print("  Testing for content stacking order issues...")
+        logger.debug("Testing for content stacking order issues...")
         stacking_order_results = await test_content_stacking(page, breakpoint)
         results['tests']['contentStacking'] = stacking_order_results
         
         return results
         
     except Exception as e:
-        print(f"Error in responsive accessibility testing at {breakpoint}px: {str(e)}")
+        logger.error("Error in responsive accessibility testing at %spx: %s", breakpoint, e)
 
         return {
             'breakpoint': breakpoint,
@@ -152,6 +166,120 @@ async def test_responsive_accessibility(page, breakpoint):
             'timestamp': datetime.now().isoformat()
         }
 
+INTERACTIVE_TAGS = ['a', 'button', 'input', 'select', 'textarea', 'details']
+INTERACTIVE_ROLES = ['button', 'link', 'checkbox', 'menuitem', 'tab', 'radio']
+CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'article', 'section', 'main']
+CONTENT_ROLES = ['main', 'article', 'heading']
+
+def _is_interactive_in_snapshot(snapshot, index):
+    """Check if a snapshot element is interactive by tag, tabindex or role"""
+    if snapshot.tag(index) in INTERACTIVE_TAGS:
+        return True
+    tabindex = snapshot.attribute(index, 'tabindex')
+    if tabindex is not None:
+        try:
+            # An empty tabindex compares as 0 in the browser
+            if float(tabindex or 0) >= 0:
+                return True
+        except ValueError:
+            pass
+    return snapshot.attribute(index, 'role') in INTERACTIVE_ROLES
+
+def _is_content_in_snapshot(snapshot, index):
+    """Check if a snapshot element is a main content element by tag or role"""
+    if snapshot.tag(index) in CONTENT_TAGS:
+        return True
+    return snapshot.attribute(index, 'role') in CONTENT_ROLES
+
+def find_overflowing_elements(snapshot):
+    """
+    Find elements that overflow the viewport horizontally, and overflow-hidden
+    containers whose children are wider than themselves, using the DOM snapshot
+    """
+    viewport_width = snapshot.viewport.get('width', 0)
+    body_width = snapshot.body.get('scrollWidth', 0)
+    
+    results = {
+        'viewportDimensions': {
+            'width': viewport_width,
+            'height': snapshot.viewport.get('height', 0)
+        },
+        'bodyDimensions': {
+            'width': body_width,
+            'height': snapshot.body.get('scrollHeight', 0)
+        },
+        'hasHorizontalOverflow': body_width > viewport_width,
+        'horizontalOverflowAmount': max(0, body_width - viewport_width),
+        'overflowingElements': []
+    }
+    
+    for index in snapshot:
+        # Skip invisible elements
+        if snapshot.is_hidden(index):
+            continue
+        
+        rect = snapshot.rect(index)
+        
+        # Check if element extends beyond viewport width
+        if rect['width'] > 0 and (rect['right'] > viewport_width or rect['left'] < 0):
+            results['overflowingElements'].append({
+                'element': snapshot.tag(index),
+                'id': snapshot.element_id(index),
+                'className': snapshot.class_name(index),
+                'text': snapshot.text(index),
+                'dimensions': {
+                    'width': rect['width'],
+                    'height': rect['height']
+                },
+                'position': {
+                    'left': rect['left'],
+                    'right': rect['right']
+                },
+                'overflowAmount': {
+                    'left': max(0, -rect['left']),
+                    'right': max(0, rect['right'] - viewport_width)
+                },
+                'isInteractive': _is_interactive_in_snapshot(snapshot, index),
+                'isContentElement': _is_content_in_snapshot(snapshot, index)
+            })
+        
+        # Check elements with overflow set to hidden for potential clipped content
+        overflow_styles = {
+            'overflow': snapshot.style(index, 'overflow'),
+            'overflowX': snapshot.style(index, 'overflowX'),
+            'overflowY': snapshot.style(index, 'overflowY')
+        }
+        if 'hidden' in overflow_styles.values():
+            # Check if it has children larger than itself
+            has_overflowing_children = False
+            child_width = 0
+            
+            for child in snapshot.children(index):
+                child_rect_width = snapshot.rect(child)['width']
+                child_width = max(child_width, child_rect_width)
+                
+                if child_rect_width > rect['width']:
+                    has_overflowing_children = True
+                    break
+            
+            if has_overflowing_children:
+                results['overflowingElements'].append({
+                    'element': snapshot.tag(index),
+                    'id': snapshot.element_id(index),
+                    'className': snapshot.class_name(index),
+                    'text': snapshot.text(index),
+                    'dimensions': {
+                        'width': rect['width'],
+                        'height': rect['height']
+                    },
+                    'childWidth': child_width,
+                    'overflowStyle': overflow_styles,
+                    'isContainer': True,
+                    'hasClippedContent': True
+                })
+    
+    return results
+
 async def test_content_overflow(page, breakpoint):
     """Test for elements that overflow the viewport or their container"""
     try:
@@ -163,151 +291,9 @@ async def test_content_overflow(page, breakpoint):
             }
         }
         
-        overflow_data = await page.evaluate('''
-            (breakpoint) => {
-                // Find elements that overflow the viewport horizontally
-                function findOverflowingElements() {
-                    const viewportWidth = window.innerWidth;
-                    const viewportHeight = window.innerHeight;
-                    const bodyWidth = document.body.scrollWidth;
-                    
-                    const results = {
-                        viewportDimensions: {
-                            width: viewportWidth,
-                            height: viewportHeight
-                        },
-                        bodyDimensions: {
-                            width: bodyWidth,
-                            height: document.body.scrollHeight
-                        },
-                        hasHorizontalOverflow: bodyWidth > viewportWidth,
-                        horizontalOverflowAmount: Math.max(0, bodyWidth - viewportWidth),
-                        overflowingElements: []
-                    };
-                    
-                    // Check all elements for overflow
-                    const allElements = document.querySelectorAll('*');
-                    for (const element of allElements) {
-                        // Skip invisible elements
-                        const style = window.getComputedStyle(element);
-                        if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
-                            continue;
-                        }
-                        
-                        const rect = element.getBoundingClientRect();
-                        
-                        // Check if element extends beyond viewport width
-                        if (rect.width > 0 && (rect.right > viewportWidth || rect.left < 0)) {
-                            results.overflowingElements.push({
-                                element: element.tagName.toLowerCase(),
-                                id: element.id || null,
-                                className: element.className || null,
-                                text: element.textContent?.substring(0, 50)?.trim() || null,
-                                dimensions: {
-                                    width: rect.width,
-                                    height: rect.height
-                                },
-                                position: {
-                                    left: rect.left,
-                                    right: rect.right
-                                },
-                                overflowAmount: {
-                                    left: Math.max(0, -rect.left),
-                                    right: Math.max(0, rect.right - viewportWidth)
-                                },
-                                isInteractive: isInteractiveElement(element),
-                                isContentElement: isContentElement(element)
-                            });
-                        }
-                        
-                        // Check elements with overflow set to hidden for potential clipped content
-                        if (style.overflow === 'hidden' || 
-                            style.overflowX === 'hidden' || 
-                            style.overflowY === 'hidden') {
-                            
-                            // Check if it has children larger than itself
-                            let hasOverflowingChildren = false;
-                            let childWidth = 0;
-                            
-                            for (const child of element.children) {
-                                const childRect = child.getBoundingClientRect();
-                                childWidth = Math.max(childWidth, childRect.width);
-                                
-                                if (childRect.width > rect.width) {
-                                    hasOverflowingChildren = true;
-                                    break;
-                                }
-                            }
-                            
-                            if (hasOverflowingChildren) {
-                                results.overflowingElements.push({
-                                    element: element.tagName.toLowerCase(),
-                                    id: element.id || null,
-                                    className: element.className || null,
-                                    text: element.textContent?.substring(0, 50)?.trim() || null,
-                                    dimensions: {
-                                        width: rect.width,
-                                        height: rect.height
-                                    },
-                                    childWidth: childWidth,
-                                    overflowStyle: {
-                                        overflow: style.overflow,
-                                        overflowX: style.overflowX,
-                                        overflowY: style.overflowY
-                                    },
-                                    isContainer: true,
-                                    hasClippedContent: true
-                                });
-                            }
-                        }
-                    }
-                    
-                    return results;
-                }
-                
-                // Helper function to check if element is interactive
-                function isInteractiveElement(element) {
-                    const interactiveTags = ['a', 'button', 'input', 'select', 'textarea', 'details'];
-                    
-                    if (interactiveTags.includes(element.tagName.toLowerCase())) {
-                        return true;
-                    }
-                    
-                    if (element.hasAttribute('tabindex') && element.getAttribute('tabindex') >= 0) {
-                        return true;
-                    }
-                    
-                    if (element.hasAttribute('role')) {
-                        const interactiveRoles = ['button', 'link', 'checkbox', 'menuitem', 'tab', 'radio'];
-                        if (interactiveRoles.includes(element.getAttribute('role'))) {
-                            return true;
-                        }
-                    }
-                    
-                    return false;
-                }
-                
-                // Helper function to identify main content elements
-                function isContentElement(element) {
-                    const contentTags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'article', 'section', 'main'];
-                    
-                    if (contentTags.includes(element.tagName.toLowerCase())) {
-                        return true;
-                    }
-                    
-                    if (element.hasAttribute('role')) {
-                        const contentRoles = ['main', 'article', 'heading'];
-                        if (contentRoles.includes(element.getAttribute('role'))) {
-                            return true;
-                        }
-                    }
-                    
-                    return false;
-                }
-                
-                return findOverflowingElements();
-            }
-        ''', breakpoint)
+        # Read element styles and boxes from the shared DOM snapshot instead of walking the DOM again
+        snapshot = await get_dom_snapshot(page)
+        overflow_data = find_overflowing_elements(snapshot)
         
         # Process findings and determine severity
         issues = []
@@ -361,7 +347,7 @@ async def test_content_overflow(page, breakpoint):
         }
         
     except Exception as e:
-        print(f"Error testing content overflow: {str(e)}")
+        logger.error("Error testing content overflow: %s", e)
 
         # Initialize test data structure for section-aware reporting if it doesn't exist
         test_data = {
@@ -602,7 +588,7 @@ async def test_touch_targets(page, breakpoint):
         }
         
     except Exception as e:
-        print(f"Error testing touch targets: {str(e)}")
+        logger.error("Error testing touch targets: %s", e)
 
         # Initialize test data structure for section-aware reporting if it doesn't exist
         test_data = {
@@ -817,7 +803,7 @@ async def test_font_scaling(page, breakpoint):
         }
         
     except Exception as e:
-        print(f"Error testing font scaling: {str(e)}")
+        logger.error("Error testing font scaling: %s", e)
 
         # Initialize test data structure for section-aware reporting if it doesn't exist
         test_data = {
@@ -1096,7 +1082,7 @@ async def test_fixed_position(page, breakpoint):
         }
         
     except Exception as e:
-        print(f"Error testing fixed position elements: {str(e)}")
+        logger.error("Error testing fixed position elements: %s", e)
 
         # Initialize test data structure for section-aware reporting if it doesn't exist
         test_data = {
@@ -1332,7 +1318,7 @@ async def test_content_stacking(page, breakpoint):
         }
         
     except Exception as e:
-        print(f"Error testing content stacking: {str(e)}")
+        logger.error("Error testing content stacking: %s", e)
 
         # Initialize test data structure for section-aware reporting if it doesn't exist
         test_data = {
@@ -1368,8 +1354,9 @@ def consolidate_responsive_results(breakpoint_results, page=None):
         dict: Consolidated summary of issues across breakpoints
     """
     try:
-        print("Consolidating responsive test results...")
-        print(f"DEBUG: breakpoint_results keys: {list(breakpoint_results.keys())}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Consolidating responsive test results for breakpoints %s", list(breakpoint_results))
         
         # Initialize test data structure for section-aware reporting
         test_data = {
@@ -1380,7 +1367,7 @@ def consolidate_responsive_results(breakpoint_results, page=None):
         }
         
         if not breakpoint_results:
-            print("ERROR: No breakpoint results to consolidate")
+            logger.error("No breakpoint results to consolidate")
             # Add section information to results if page is provided
             if page:
                 test_data['results'] = add_section_info_to_test_results(page, test_data['results'])
@@ -1433,7 +1420,6 @@ def consolidate_responsive_results(breakpoint_results, page=None):
         
         # Process each breakpoint
         for breakpoint, results in breakpoint_results.items():
-            print(f"DEBUG: Processing breakpoint {breakpoint}")
             
             # Get nested test data structure
             # In a11yTestMongo.py, we store the responsive results as:
@@ -1442,22 +1428,19 @@ def consolidate_responsive_results(breakpoint_results, page=None):
             
             # First, check if this is already the tests structure or if we need to go deeper
             if 'tests' in results:
-                print(f"DEBUG: Found 'tests' key in breakpoint results with keys: {list(results['tests'].keys())}")
                 if 'responsive' in results['tests']:
                     responsive_data = results['tests']['responsive']
-                    print(f"DEBUG: Found 'responsive' key with keys: {list(responsive_data.keys()) if isinstance(responsive_data, dict) else 'Not a dict'}")
                 else:
                     # Direct test structure - the structure used in test_responsive_accessibility
                     responsive_data = results['tests']
             else:
                 # It might be the direct data structure from test_responsive_accessibility function
                 # where each test result is stored directly
-                print(f"DEBUG: No 'tests' key found, using direct breakpoint results with keys: {list(results.keys())}")
                 responsive_data = results
             
             # Skip this breakpoint if no responsive data was found
             if not responsive_data:
-                print(f"DEBUG: No responsive data found for breakpoint {breakpoint}")
+                logger.debug("No responsive data found for breakpoint %s", breakpoint)
                 continue
                 
             # Handle different data structures - extract the actual test results
@@ -1466,17 +1449,14 @@ def consolidate_responsive_results(breakpoint_results, page=None):
             # Check if we have a tests dict inside responsive_data
             if isinstance(responsive_data, dict) and 'tests' in responsive_data:
                 tests = responsive_data['tests']
-                print(f"DEBUG: Found 'tests' inside responsive_data with keys: {list(tests.keys()) if isinstance(tests, dict) else 'Not a dict'}")
             elif isinstance(responsive_data, dict):
                 # Maybe the test results are directly in responsive_data
                 for test_name in ['overflow', 'touchTargets', 'fontScaling', 'fixedPosition', 'contentStacking']:
                     if test_name in responsive_data:
                         tests[test_name] = responsive_data[test_name]
-                        print(f"DEBUG: Found test '{test_name}' directly in responsive_data")
             
             # Add fallback structure detection - check if this is a direct result from test_responsive_accessibility
             if not tests and isinstance(responsive_data, dict) and 'pageFlags' in responsive_data:
-                print(f"DEBUG: This appears to be a direct test result with 'pageFlags'")
                 # This is a direct test result, extract its test name from the data
                 test_name = None
                 for possible_name in ['overflow', 'touchTargets', 'fontScaling', 'fixedPosition', 'contentStacking']:
@@ -1486,11 +1466,11 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                 
                 if test_name:
                     tests[test_name] = responsive_data
-                    print(f"DEBUG: Created test entry for '{test_name}' from direct result")
+                    logger.debug("Created test entry for '%s' from direct result at breakpoint %s", test_name, breakpoint)
             
             # If we found nothing, log and continue to next breakpoint
             if not tests:
-                print(f"WARNING: Could not extract any tests from breakpoint {breakpoint} data")
+                logger.warning("Could not extract any tests from breakpoint %s data", breakpoint)
                 continue
                 
             # Process each test type
@@ -1502,7 +1482,7 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                 
                 # Ensure test_data is a dictionary
                 if not isinstance(test_data, dict):
-                    print(f"Warning: {test_name} test data is not a dictionary (value: {test_data})")
+                    logger.warning("%s test data is not a dictionary at breakpoint %s", test_name, breakpoint)
                     continue  # Skip this test
                 
                 # We need to handle different data structures:
@@ -1512,7 +1492,6 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                 
                 if 'issues' in test_data and test_data['issues']:
                     issues = test_data['issues']
-                    print(f"DEBUG: Found {len(issues)} issues directly in {test_name}")
                 elif 'pageFlags' in test_data:
                     # Extract issues from pageFlags data
                     for flag_key, flag_value in test_data['pageFlags'].items():
@@ -1525,11 +1504,9 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                                 'issueType': issue_type,
                                 'details': f"Page has {issue_type} issues at {breakpoint}px breakpoint"
                             })
-                            print(f"DEBUG: Created synthetic issue for '{issue_type}' from pageFlags")
                 
                 # If we found no issues from any source, skip this test
                 if not issues:
-                    print(f"DEBUG: No issues found for {test_name} at breakpoint {breakpoint}")
                     continue
                 
                 # Update test summary
@@ -1627,8 +1604,8 @@ def consolidate_responsive_results(breakpoint_results, page=None):
             'contentStackingIssues': consolidated['testsSummary']['contentStacking']['issueCount']
         }
         
-        # Print summary for debugging
-        print(f"Consolidated summary: {consolidated['summary']}")
+        if debug:
+            logger.debug("Consolidated summary: %s", consolidated['summary'])
         
         # Add section information to results if page is provided
         if page and hasattr(page, '_accessibility_context'):
@@ -1648,15 +1625,13 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                 elif 'details' in test_data['results'] and 'violations' in test_data['results']['details']:
                     print_violations_with_sections(test_data['results']['details']['violations'])
             except Exception as e:
-                print(f"Error adding section information: {str(e)}")
+                logger.warning("Error adding section information: %s", e)
                 # Don't let this error prevent returning the consolidated results
         
         return consolidated
         
     except Exception as e:
-        print(f"Error consolidating responsive results: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error consolidating responsive results: %s", e)
 
         # Create a minimal valid result structure
         result = {
@@ -1689,7 +1664,7 @@ def consolidate_responsive_results(breakpoint_results, page=None):
                 elif 'details' in test_data['results'] and 'violations' in test_data['results']['details']:
                     print_violations_with_sections(test_data['results']['details']['violations'])
             except Exception as section_error:
-                print(f"Error adding section information: {str(section_error)}")
+                logger.warning("Error adding section information: %s", section_error)
                 # Don't let this error prevent returning a result
         
         return result
\ No newline at end of file
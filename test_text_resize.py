@@ -1,5 +1,13 @@
 from datetime import datetime
 
+try:
+    from src.test_with_mongo.layout_stability import wait_for_layout_stable
+except ImportError:
+    try:
+        from .layout_stability import wait_for_layout_stable
+    except ImportError:
+        from layout_stability import wait_for_layout_stable
+
 
 # Test documentation with information about the text resize test
 TEST_DOCUMENTATION = {
@@ -80,29 +88,6 @@ async def test_text_resize(page):
         # First get the media query breakpoints
         breakpoints = await page.evaluate('''
     () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
         
         {
                 const breakpoints = [];
@@ -143,57 +128,15 @@ async def test_text_resize(page):
             await page.setViewport(viewport)
             
             # Allow page to settle
-            await page.waitFor(500)
+            await wait_for_layout_stable(page)
 
             # Analyze text elements and test resizing
             viewport_result = await page.evaluate('''
     () => {
-        // Function to generate XPath for elements
-        function getFullXPath(element) {
-            if (!element) return '';
-            
-            function getElementIdx(el) {
-                let count = 1;
-                for (let sib = el.previousSibling; sib; sib = sib.previousSibling) {
-                    if (sib.nodeType === 1 && sib.tagName === el.tagName) {
-                        count++;
-                    }
-                }
-                return count;
-            }
-
-            let path = '';
-            while (element && element.nodeType === 1) {
-                let idx = getElementIdx(element);
-                let tagName = element.tagName.toLowerCase();
-                path = `/${tagName}[${idx}]${path}`;
-                element = element.parentNode;
-            }
-            return path;
-        }
         
         {
                     function getXPath(element) {
-                        if (element.id !== '') {
-                            return `//*[@id="${element.id}"]`;
-                        }
-                        if (element === document.body) {
-                            return '/html/body';
-                        }
-                        let ix = 0;
-                        const siblings = element.parentNode.childNodes;
-                        for (let i = 0; i < siblings.length; i++) {
-                            const sibling = siblings[i];
-                            if (sibling === element) {
-                                return getXPath(element.parentNode) + 
-                                       '/' + element.tagName.toLowerCase() + 
-                                       '[' + (ix + 1) + ']';
-                            }
-                            if (sibling.nodeType === 1 && 
-                                sibling.tagName === element.tagName) {
-                                ix++;
-                            }
-                        }
+                        return window.__a11y.getFullXPath(element);
                     }
 
                     function checkOverlap(element) {
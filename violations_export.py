@@ -0,0 +1,284 @@
+"""
+Columnar export of a test run's violations.
+
+Every test module reports violations somewhere inside its own nested result:
+directly under details.violations, grouped by kind in a violations dict, or
+once per breakpoint. The responsive suite reports its findings as issues of
+each check instead, e.g. breakpoint_results.<width>.tests.responsive.tests
+.overflow.issues, and those are exported with the breakpoint width set. Walking those structures in Python for every query is
+slow, so this module flattens them into one typed row per violation and
+writes the rows as Parquet, partitioned by test:
+
+    <output_dir>/test=<test name>/run-<test_run_id>.parquet
+
+Each run gets its own file, so several runs can share one dataset. Read it
+back with pyarrow.dataset.dataset(output_dir, partitioning='hive'), or with
+any engine that understands Hive partitioning (DuckDB, Spark, pandas).
+
+pyarrow is an optional dependency needed only by this export (pip install
+pyarrow); without it the crawl and the JSON export work as before and
+violation_schema() raises ImportError.
+"""
+import os
+import re
+
+# pyarrow is only needed for the Parquet export
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+
+# Fields that name a violation's issue, and that describe it, in order of preference
+_ISSUE_FIELDS = ('issue', 'type', 'violationType', 'issueType', 'message')
+_DETAIL_FIELDS = ('description', 'details', 'message')
+
+_BREAKPOINT_CONTAINERS = ('breakpoint_results', 'breakpointResults')
+# Containers too generic to name the check their violations belong to
+_GENERIC_CONTAINERS = ('details', 'results')
+
+
+def violation_schema():
+    """The Arrow schema of the exported rows"""
+    if pa is None:
+        raise ImportError("The violations export requires pyarrow (pip install pyarrow)")
+    return pa.schema([
+        ('test_run_id', pa.string()),
+        ('url', pa.string()),
+        ('breakpoint', pa.int32()),
+        ('check', pa.string()),
+        ('issue', pa.string()),
+        ('details', pa.string()),
+        ('element', pa.string()),
+        ('xpath', pa.string()),
+        ('section_type', pa.string()),
+        ('section_name', pa.string()),
+        ('wcag_criteria', pa.list_(pa.string()))
+    ])
+
+
+def _breakpoint_width(value):
+    """Breakpoints appear as 375, '375', '375px' or {'width': 375}"""
+    if isinstance(value, dict):
+        value = value.get('width')
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        match = re.match(r'\s*(\d+)', value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _first_text(violation, fields, exclude=None):
+    for field in fields:
+        value = violation.get(field)
+        if isinstance(value, str) and value and value != exclude:
+            return value
+    return None
+
+
+def _documented_criteria(documentation):
+    """All WCAG criteria listed in a test module's TEST_DOCUMENTATION"""
+    criteria = []
+    for test in documentation.get('tests') or []:
+        if isinstance(test, dict):
+            for criterion in test.get('wcagCriteria') or []:
+                if criterion not in criteria:
+                    criteria.append(criterion)
+    return criteria
+
+
+def _violation_criteria(violation, documented):
+    """The violation's own WCAG criteria, else those its test module covers"""
+    criteria = violation.get('wcagCriteria')
+    if criteria is None:
+        criteria = violation.get('wcag')
+    if isinstance(criteria, str):
+        return [criteria]
+    if isinstance(criteria, list):
+        return [str(criterion) for criterion in criteria]
+    return list(documented)
+
+
+def _violation_row(violation, breakpoint, check, documented):
+    issue = _first_text(violation, _ISSUE_FIELDS)
+    section = violation.get('section') if isinstance(violation.get('section'), dict) else {}
+    element = violation.get('element')
+    xpath = violation.get('xpath')
+    return {
+        'breakpoint': breakpoint,
+        'check': check,
+        'issue': issue,
+        'details': _first_text(violation, _DETAIL_FIELDS, exclude=issue),
+        'element': element if isinstance(element, str) else None,
+        'xpath': xpath if isinstance(xpath, str) else None,
+        'section_type': section.get('section_type'),
+        'section_name': section.get('section_name'),
+        'wcag_criteria': _violation_criteria(violation, documented)
+    }
+
+
+def _walk(node, breakpoint, check, documented, parent_key=None, depth=0):
+    """
+    Yield a row for every violation found anywhere below node, a test's
+    result. depth counts the dicts above node; depth 1 is the module's
+    wrapper object, e.g. {'headings': {...}}. The issues list of a check in
+    a tests container, e.g. tests.overflow.issues, is read as violations.
+    """
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item, breakpoint, check, documented, parent_key, depth)
+        return
+    if not isinstance(node, dict):
+        return
+
+    documentation = node.get('documentation')
+    if isinstance(documentation, dict):
+        documented = _documented_criteria(documentation) or documented
+    if 'breakpoint' in node:
+        breakpoint = _breakpoint_width(node['breakpoint']) or breakpoint
+
+    for key, value in node.items():
+        if key == 'documentation':
+            continue
+        if key == 'issues' and check is not None and parent_key == check:
+            # The responsive suite's findings, e.g. tests.touchTargets.issues
+            for issue in value if isinstance(value, list) else []:
+                if isinstance(issue, dict):
+                    yield _violation_row(issue, breakpoint, check, documented)
+            continue
+        if key == 'violations':
+            if isinstance(value, list):
+                # e.g. details.tabOrder.violations belong to the tabOrder check
+                named = depth > 1 and parent_key not in _GENERIC_CONTAINERS
+                groups = [(check or (parent_key if named else None), value)]
+            elif isinstance(value, dict):
+                # Violations grouped by kind, e.g. {'textContrast': [...], 'links': [...]}
+                groups = [(kind, items) for kind, items in value.items() if isinstance(items, list)]
+            else:
+                groups = []
+            for group_check, items in groups:
+                for violation in items:
+                    if isinstance(violation, dict):
+                        yield _violation_row(violation, breakpoint, group_check, documented)
+            continue
+
+        child_breakpoint = breakpoint
+        if parent_key in _BREAKPOINT_CONTAINERS:
+            child_breakpoint = _breakpoint_width(key) or breakpoint
+        child_check = key if parent_key == 'tests' else check
+        yield from _walk(value, child_breakpoint, child_check, documented, key, depth + 1)
+
+
+def iter_violation_rows(test_run_id, url, page_result, documentation=None):
+    """
+    Flatten the violations of one page result
+
+    Args:
+        test_run_id: The ID of the test run
+        url: The page URL
+        page_result: The nested page result
+        documentation: Optional test run documentation by test name, used for
+            the WCAG criteria of tests whose results do not embed their own
+
+    Yields:
+        tuple: (test_name, row) where row matches violation_schema()
+
+    >>> page_result = {'accessibility': {'tests': {}, 'responsive_testing': {
+    ...     'breakpoint_results': {'375': {'tests': {'responsive': {
+    ...         'breakpoint': 375,
+    ...         'tests': {'touchTargets': {'issues': [{
+    ...             'element': 'a', 'issueType': 'smallTouchTarget',
+    ...             'details': 'Touch target size (20.0x20.0px) is too small.'}]}}}}}}}}}
+    >>> [(test, row['breakpoint'], row['check'], row['issue'], row['element'])
+    ...  for test, row in iter_violation_rows('run', 'https://example.com', page_result)]
+    [('responsive', 375, 'touchTargets', 'smallTouchTarget', 'a')]
+    """
+    accessibility = (page_result or {}).get('accessibility')
+    if not isinstance(accessibility, dict):
+        return
+
+    sources = [(None, accessibility.get('tests') or {})]
+    responsive = accessibility.get('responsive_testing')
+    if isinstance(responsive, dict):
+        for breakpoint, breakpoint_result in (responsive.get('breakpoint_results') or {}).items():
+            if isinstance(breakpoint_result, dict):
+                sources.append((_breakpoint_width(breakpoint), breakpoint_result.get('tests') or {}))
+
+    for breakpoint, tests in sources:
+        for test_name, result in tests.items():
+            test_documentation = (documentation or {}).get(test_name)
+            documented = _documented_criteria(test_documentation) if isinstance(test_documentation, dict) else []
+            for row in _walk(result, breakpoint, None, documented):
+                row['test_run_id'] = test_run_id
+                row['url'] = url
+                yield test_name, row
+
+
+def _partition_name(test_name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(test_name))
+
+
+class ViolationsParquetWriter:
+    """
+    Write violation rows as Parquet files partitioned by test, flushing a
+    row group whenever a test has row_group_size rows pending so memory use
+    stays bounded.
+
+    Usage:
+        with ViolationsParquetWriter('violations', test_run_id) as writer:
+            for result in db.iter_page_results(test_run_id):
+                writer.add_page(result['url'], result['results'])
+    """
+
+    def __init__(self, output_dir, test_run_id, documentation=None, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        self.schema = violation_schema()
+        self.output_dir = output_dir
+        self.test_run_id = test_run_id
+        self.documentation = documentation
+        self.row_group_size = row_group_size
+        self._pending = {}
+        self._writers = {}
+        self.rows_written = 0
+
+    def add_page(self, url, page_result):
+        """Flatten and queue the violations of one page"""
+        for test_name, row in iter_violation_rows(self.test_run_id, url, page_result, self.documentation):
+            rows = self._pending.setdefault(test_name, [])
+            rows.append(row)
+            if len(rows) >= self.row_group_size:
+                self._write(test_name)
+
+    def _write(self, test_name):
+        rows = self._pending.pop(test_name, None)
+        if not rows:
+            return
+        writer = self._writers.get(test_name)
+        if writer is None:
+            partition_dir = os.path.join(self.output_dir, f"test={_partition_name(test_name)}")
+            os.makedirs(partition_dir, exist_ok=True)
+            path = os.path.join(partition_dir, f"run-{self.test_run_id}.parquet")
+            writer = self._writers[test_name] = pq.ParquetWriter(path, self.schema)
+        writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows_written += len(rows)
+
+    def close(self):
+        """Write the remaining rows and close every partition file"""
+        for test_name in list(self._pending):
+            self._write(test_name)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False